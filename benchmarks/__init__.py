@@ -0,0 +1,27 @@
+"""Micro-benchmarks for restcli.
+
+Each module can be run on its own, e.g. ``python -m benchmarks.lexer``, or
+all at once with ``invoke bench``.
+"""
+import timeit
+
+__all__ = ["report"]
+
+
+def report(name, stmt, number=None, repeat=5, **namespace):
+    """Time ``stmt`` and print the best time per loop.
+
+    Args:
+        name: Label for the result.
+        stmt: A callable or statement string to time.
+        number (optional): Loops per measurement. Chosen automatically if not
+            given.
+        repeat (optional): Number of measurements to take the best of.
+        **namespace: Globals for ``stmt`` if it's a string.
+    """
+    timer = timeit.Timer(stmt, globals=namespace)
+    if number is None:
+        number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    print(f"{name:<48} {best * 1e6:>12.1f} us")
+    return best
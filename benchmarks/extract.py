@@ -0,0 +1,43 @@
+"""Benchmark extracting a value from a large JSON response body."""
+import io
+import json
+
+from benchmarks import report
+from restcli.jsonpath import compile_path, resolve
+from restcli.jsonstream import find_paths
+
+FIRST = compile_path("$.meta.token")
+LAST = compile_path("$.next")
+
+
+def make_body():
+    return json.dumps(
+        {
+            "meta": {"token": "abc123"},
+            "items": [
+                {"id": i, "name": f"item {i}", "tags": ["a", "b", "c"]}
+                for i in range(100000)
+            ],
+            "next": "/items?page=2",
+        }
+    ).encode()
+
+
+def main():
+    body = make_body()
+    print(f"body: {len(body) / 1e6:.1f} MB")
+
+    def parse_and_resolve(path):
+        return resolve(json.loads(body), path)
+
+    def stream(path):
+        handle = io.TextIOWrapper(io.BytesIO(body), encoding="utf-8")
+        return find_paths(handle, [path])[path]
+
+    report("json.loads + resolve", lambda: parse_and_resolve(FIRST), 3)
+    report("find_paths, value near the start", lambda: stream(FIRST), 3)
+    report("find_paths, value at the end", lambda: stream(LAST), 3)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Benchmark JSON encoding and decoding of MB-sized payloads through
+``json_utils``, against the stdlib."""
+import json
+from collections import OrderedDict
+
+from benchmarks import report
+from restcli import json_utils
+
+
+def make_payload():
+    return [
+        OrderedDict(
+            [
+                ("id", i),
+                ("name", f"item {i}"),
+                ("price", i * 1.25),
+                ("tags", ["a", "b", "c"]),
+                ("meta", {"active": i % 2 == 0, "parent": None}),
+            ]
+        )
+        for i in range(40000)
+    ]
+
+
+def main():
+    payload = make_payload()
+    text = json.dumps(payload)
+    print(f"payload: {len(text) / 1e6:.1f} MB, backend: {json_utils.BACKEND}")
+
+    cases = [
+        ("dumps", json.dumps, json_utils.dumps, payload),
+        (
+            "dumps, indent=2",
+            lambda obj: json.dumps(obj, indent=2),
+            lambda obj: json_utils.dumps(obj, indent=2),
+            payload,
+        ),
+        ("loads", json.loads, json_utils.loads, text),
+    ]
+    for name, stdlib, codec, arg in cases:
+        report(f"{name} (stdlib)", lambda: stdlib(arg), number=1, repeat=3)
+        report(f"{name} (json_utils)", lambda: codec(arg), number=1, repeat=3)
+
+
+if __name__ == "__main__":
+    main()
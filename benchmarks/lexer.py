@@ -0,0 +1,31 @@
+"""Benchmark the reqmod lexer on modifiers with long quoted values."""
+import json
+
+from benchmarks import report
+from restcli.reqmod import lexer
+
+SIZES_KB = (1, 4, 16, 64)
+
+
+def json_modifier(size_kb):
+    """Build an inline JSON body modifier of roughly ``size_kb`` KiB."""
+    items = []
+    while len(json.dumps(items)) < size_kb * 1024:
+        items.append({"id": len(items), "name": f"item {len(items)}"})
+    return f"items:='{json.dumps(items)}'"
+
+
+def main():
+    for size_kb in SIZES_KB:
+        modifier = json_modifier(size_kb)
+        line = f"-a tags:='[1, 2]' -d old: {modifier} X-Foo:\\ bar"
+        report(
+            f"tokenize ({size_kb} KiB)",
+            lambda line=line: lexer.tokenize(line),
+        )
+        argv = lexer.tokenize(line)
+        report(f"lex ({size_kb} KiB)", lambda argv=argv: lexer.lex(argv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Benchmark preparing the same Request over and over, as ``exec`` and the
+REPL do, with and without the render cache."""
+from benchmarks import report
+from restcli.reqmod.parser import compile_modifiers
+from restcli.requestor import Requestor
+from restcli.utils import LRUCache
+from restcli.workspace import Environment
+
+REQUEST = {
+    "method": "post",
+    "url": "{{ server }}/users/{{ user_id }}/orders",
+    "headers": {
+        "Authorization": "Bearer {{ token }}",
+        "X-Request-Id": "{{ user_id }}-orders",
+    },
+    "query": "expand: items\nlimit: {{ limit }}\n",
+    "body": "".join(
+        f"item_{i}:\n  sku: SKU-{{{{ user_id }}}}-{i}\n  quantity: {i}\n"
+        for i in range(50)
+    ),
+}
+
+
+def main():
+    env = Environment(None)
+    env.update(
+        server="http://localhost:8000",
+        user_id=42,
+        token="abc123",
+        limit=10,
+    )
+    updater = compile_modifiers(("X-Trace:on",))
+
+    report(
+        "uncached",
+        lambda: Requestor.prepare_request(REQUEST, env, updater),
+        number=100,
+    )
+    cache = LRUCache()
+    report(
+        "cached",
+        lambda: Requestor.prepare_request(
+            REQUEST, env, updater, cache=cache
+        ),
+        number=100,
+    )
+
+
+if __name__ == "__main__":
+    main()
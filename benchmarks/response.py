@@ -0,0 +1,53 @@
+"""Benchmark reading a large JSON response body the way a single ``run``
+does: formatting it for output, then running an ``expect`` block and a
+script that each need the parsed body."""
+import json
+
+import requests
+
+from benchmarks import report
+from restcli.response import Response
+
+
+def make_response(body):
+    raw = requests.Response()
+    raw._content = body  # pylint: disable=protected-access
+    raw.status_code = 200
+    raw.headers["Content-Type"] = "application/json"
+    return raw
+
+
+def consume(response):
+    """Read the body as App.show_response, an expect block and a script
+    would."""
+    response.json()
+    _ = response.text
+    response.json()
+    response.json()
+
+
+def main():
+    body = json.dumps(
+        [
+            {"id": i, "name": f"item {i}", "tags": ["a", "b"]}
+            for i in range(50000)
+        ]
+    ).encode()
+    print(f"body: {len(body) / 1e6:.1f} MB")
+
+    report(
+        "requests.Response",
+        lambda: consume(make_response(body)),
+        number=1,
+        repeat=3,
+    )
+    report(
+        "restcli Response",
+        lambda: consume(Response(make_response(body))),
+        number=1,
+        repeat=3,
+    )
+
+
+if __name__ == "__main__":
+    main()
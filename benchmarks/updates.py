@@ -0,0 +1,53 @@
+"""Benchmark applying modifiers to a Request, as ``exec`` does per line."""
+import copy
+
+from benchmarks import report
+from restcli.reqmod import lexer, parser
+
+MODIFIERS = (
+    "X-Request-Id:abc123",
+    "-d",
+    "X-Debug:",
+    "page==2",
+    ".user.name=Frank",
+    ".user.address.city=Springfield",
+    ".user.address.zip:=12345",
+    "-a",
+    ".user.tags:=[\"new\"]",
+    ".items[0].qty:=3",
+)
+
+
+def make_request():
+    return {
+        "headers": {"X-Debug": "1", "Accept": "application/json"},
+        "query": {"page": "1"},
+        "body": {
+            "user": {
+                "name": "Bob",
+                "address": {"city": "Shelbyville", "zip": 54321},
+                "tags": ["old"],
+            },
+            "items": [{"id": i, "qty": 1} for i in range(100)],
+        },
+    }
+
+
+def main():
+    request = make_request()
+
+    def parse_and_apply():
+        updates = parser.parse(lexer.lex(MODIFIERS))
+        updates.apply(copy.deepcopy(request))
+
+    def compiled_apply():
+        updates = parser.compile_modifiers(MODIFIERS)
+        updates.apply(copy.deepcopy(request))
+
+    report("deepcopy (baseline)", lambda: copy.deepcopy(request))
+    report("parse + apply", parse_and_apply)
+    report("compiled apply", compiled_apply)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,29 @@
 import json
+import shlex
+import sys
+import time
+from contextlib import contextmanager
 from string import Template
 
+import click
 from pygments import highlight
 from pygments.formatters.terminal256 import Terminal256Formatter
 from pygments.lexers.data import JsonLexer
 from pygments.lexers.python import Python3Lexer
 from pygments.lexers.textfmts import HttpLexer
 
-from restcli import utils
+from restcli import cluster, json_utils, load, sharding, sweep, utils
+from restcli.cassette import MODES, Cassette
+from restcli.resolver import DNSCache
 from restcli.exceptions import (
     GroupNotFoundError,
+    InputError,
     ParameterNotFoundError,
     RequestNotFoundError,
 )
-from restcli.reqmod import lexer, parser
+from restcli.reqmod import parser
 from restcli.requestor import Requestor
+from restcli.workspace import open_env
 
 __all__ = ["App"]
 
@@ -26,11 +35,17 @@ class App:
         collection_file: Path to a Collection file.
         env_file: Path to an Environment file.
         autosave: Whether to automatically save Env changes.
+        stats: Whether to report transfer statistics on stderr.
         style: Pygments style to use for rendering.
+        record: Directory of a cassette store to record exchanges into.
+        replay: Directory of a cassette store to replay responses from,
+            instead of sending Requests over the network.
 
     Attributes:
         r (:class:`Requestor`): The Requestor object. Handles almost all I/O.
         autosave (bool): Whether to automatically save Env changes.
+        jobs (:class:`JobManager`): Runs Requests in the background, if
+            set. Only the REPL sets this.
     """
 
     HTTP_TPL = Template(
@@ -50,12 +65,30 @@ class App:
         autosave: bool = False,
         quiet: bool = False,
         raw_output: bool = False,
+        stats: bool = False,
         style: str = "fruity",
+        record: str = None,
+        replay: str = None,
+        dns_cache: bool = False,
+        prefetch_dns: bool = False,
     ):
         self.r = Requestor(collection_file, env_file)
+        self.record = record
+        self.replay = replay
+        if record:
+            self.r.cassette = Cassette(record, MODES.record)
+        elif replay:
+            self.r.cassette = Cassette(replay, MODES.replay)
+        self.dns_cache = dns_cache or prefetch_dns
+        if self.dns_cache:
+            self.r.dns_cache = DNSCache()
+        if prefetch_dns:
+            self.prefetch_dns()
         self.autosave = autosave
         self.quiet = quiet
         self.raw_output = raw_output
+        self.stats = stats
+        self.jobs = None
 
         self.http_lexer = HttpLexer()
         self.json_lexer = JsonLexer()
@@ -70,6 +103,8 @@ class App:
         env_args: list = None,
         save: bool = None,
         quiet: bool = None,
+        output_file: str = None,
+        progress: bool = True,
     ) -> str:
         """Run a Request.
 
@@ -80,6 +115,8 @@ class App:
             env_args (optional): List of :class:`Environment` overrides.
             save (optional): Whether to save Env changes to disk.
             quiet (optional): Whether to suppress output.
+            output_file (optional): Stream the response body to this file.
+            progress (optional): Whether to report download progress.
 
         Returns:
             The command output.
@@ -89,10 +126,30 @@ class App:
         self.get_request(group, group_name, request_name, action="run")
 
         # Parse modifiers.
-        lexemes = lexer.lex(modifiers)
-        updater = parser.parse(lexemes)
-
-        response = self.r.request(group_name, request_name, updater, *env_args)
+        updater = parser.compile_modifiers(tuple(modifiers or ()))
+
+        quiet = utils.select_first(quiet, self.quiet)
+        progress = self.show_progress if progress and not quiet else None
+        response = self.r.request(
+            group_name,
+            request_name,
+            updater,
+            *env_args,
+            output_file=output_file,
+            progress=progress,
+        )
+        if progress and getattr(response, "download", None):
+            # Clear the progress line.
+            self.show_progress(None, None)
+        if self.stats:
+            self.log(
+                self.fmt_stats(
+                    response, self.r.render_cache, self.r.dns_cache
+                )
+            )
+        results = getattr(response, "expectations", None)
+        if results:
+            self.log(self.fmt_expectations(results))
 
         if utils.select_first(save, self.autosave):
             self.r.env.save()
@@ -100,6 +157,224 @@ class App:
         output = self.show_response(response, quiet=quiet)
         return output
 
+    def run_background(
+        self,
+        group_name: str,
+        request_name: str,
+        modifiers: list = None,
+        env_args: list = None,
+        output_file: str = None,
+    ) -> str:
+        """Run a Request as a background Job.
+
+        Takes the same arguments as :meth:`run`. Download progress isn't
+        reported, since it would draw over the prompt.
+
+        Returns:
+            A line identifying the new Job.
+        """
+        if self.jobs is None:
+            raise InputError(
+                value="&", msg="background jobs are only available in the REPL"
+            )
+        # Report missing Requests and bad modifiers right away.
+        group = self.get_group(group_name, action="run")
+        self.get_request(group, group_name, request_name, action="run")
+        modifiers = tuple(modifiers or ())
+        parser.compile_modifiers(modifiers)
+
+        description = shlex.join(
+            (
+                group_name,
+                request_name,
+                *(f"-o{arg}" for arg in env_args or ()),
+                *modifiers,
+            )
+        )
+        job = self.jobs.submit(
+            description,
+            self.run,
+            group_name,
+            request_name,
+            modifiers=modifiers,
+            env_args=env_args,
+            output_file=output_file,
+            progress=False,
+        )
+        return self.fmt_job(job)
+
+    def show_jobs(self, clear: bool = False) -> str:
+        """List background Jobs with their state and timing.
+
+        Args:
+            clear (optional): Forget finished Jobs after listing them.
+        """
+        if not self.jobs or not self.jobs.jobs:
+            return "No jobs."
+        output = "\n".join(
+            self.fmt_job(job) for job in list(self.jobs.jobs.values())
+        )
+        if clear:
+            self.jobs.clear()
+        return output
+
+    def wait_job(self, job_id: int = None) -> str:
+        """Wait for a background Job to finish and return its output.
+
+        Args:
+            job_id (optional): The Job number. Defaults to the most recently
+                started Job.
+
+        Raises:
+            Whatever exception the Job raised.
+        """
+        if self.jobs is None:
+            return "No jobs."
+        if job_id is None:
+            job = self.jobs.latest()
+            if job is None:
+                return "No jobs."
+        else:
+            job = self.jobs.get(job_id)
+        return job.result()
+
+    def jobs_toolbar(self) -> str:
+        """Summarize background Jobs in a single line for the prompt."""
+        if not self.jobs:
+            return ""
+        counts = self.jobs.counts()
+        if not counts:
+            return ""
+        return "jobs: " + ", ".join(
+            f"{count} {state}" for state, count in counts.items()
+        )
+
+    @staticmethod
+    def fmt_job(job):
+        """Format a one-line summary of a background Job."""
+        return (
+            f"[{job.id}] {job.state:<9} {job.elapsed:7.3f}s  {job.description}"
+        )
+
+    def sweep(
+        self,
+        group_name: str,
+        request_name: str,
+        data,
+        data_format: str = None,
+        modifiers: list = None,
+        workers: int = 1,
+        quiet: bool = None,
+    ):
+        """Run a Request once for each row of a data file.
+
+        Args:
+            group_name: A :class:`Group` name in the Collection.
+            request_name: A :class:`Request` name in the Collection.
+            data: A file object with one set of :class:`Environment`
+                overrides per row.
+            data_format (optional): The format of ``data``, one of
+                ``sweep.FORMATS``. Guessed from its name if not given.
+            modifiers (optional): List of :class:`Request` modifiers.
+            workers (optional): Number of Requests to run concurrently.
+            quiet (optional): Whether to leave response bodies out of the
+                results.
+
+        Returns:
+            An iterator over the results, one JSON string per row.
+        """
+        group = self.get_group(group_name, action="sweep")
+        self.get_request(group, group_name, request_name, action="sweep")
+        updater = parser.compile_modifiers(tuple(modifiers or ()))
+
+        data_format = data_format or sweep.guess_format(
+            getattr(data, "name", None)
+        )
+        runner = sweep.Sweep(
+            self.r,
+            group_name,
+            request_name,
+            updater,
+            workers=workers,
+            include_body=not utils.select_first(quiet, self.quiet),
+        )
+        results = runner.run(sweep.read_rows(data, data_format))
+        return (json_utils.dumps(result) for result in results)
+
+    def exec_sharded(self, jobs, workers: int):
+        """Run parsed ``exec`` lines in a pool of worker processes.
+
+        See :class:`sharding.ShardedExec` for how Environment changes are
+        merged.
+
+        Args:
+            jobs: An iterable of :class:`sharding.ExecJob` objects.
+            workers: Number of worker processes.
+
+        Returns:
+            An iterator over :class:`sharding.ExecResult` objects, in the
+            same order as ``jobs``.
+        """
+        runner = sharding.ShardedExec(self, workers)
+        return runner.run(jobs)
+
+    def load(
+        self,
+        group_name: str,
+        request_name: str,
+        modifiers: list = None,
+        requests: int = None,
+        duration: float = None,
+        concurrency: int = 1,
+        workers: list = None,
+        token: str = None,
+    ) -> str:
+        """Send a Request many times and report latencies and errors.
+
+        Args:
+            group_name: A :class:`Group` name in the Collection.
+            request_name: A :class:`Request` name in the Collection.
+            modifiers (optional): List of :class:`Request` modifiers.
+            requests (optional): Total number of Requests to send.
+            duration (optional): Number of seconds to send Requests for.
+            concurrency (optional): Requests in flight at once, per worker.
+            workers (optional): ``[HOST:]PORT`` addresses of workers started
+                with ``restcli worker``, to spread the load over. Without
+                workers, Requests are sent from this process.
+            token (optional): The workers' shared secret.
+
+        Returns:
+            The formatted report.
+
+        Raises:
+            WorkerError: If a worker fails.
+        """
+        group = self.get_group(group_name, action="load")
+        self.get_request(group, group_name, request_name, action="load")
+        if requests is None and not duration:
+            raise InputError(
+                value="-n/-d", msg="need a number of requests or a duration"
+            )
+        parser.compile_modifiers(tuple(modifiers or ()))
+
+        profile = load.LoadProfile(
+            group_name,
+            request_name,
+            modifiers=tuple(modifiers or ()),
+            requests=requests,
+            duration=duration,
+            concurrency=concurrency,
+        )
+        if not workers:
+            return self.fmt_load_report(load.run_load(self.r, profile))
+
+        addresses = [cluster.parse_address(worker) for worker in workers]
+        with open(self.r.collection.source) as handle:
+            collection = handle.read()
+        coordinator = cluster.Coordinator(addresses, token=token)
+        report = coordinator.run(collection, self.r.env.data, profile)
+        return self.fmt_load_report(report)
+
     def view(
         self,
         group_name: str,
@@ -203,8 +478,9 @@ class App:
     def load_env(self, source=None):
         """Reload the current Environment, changing it to `source` if given."""
         if source:
-            self.r.env.source = source
-        self.r.env.load()
+            self.r.env = open_env(source)
+        else:
+            self.r.env.load()
         return ""
 
     def set_env(self, *env_args, save=False):
@@ -212,6 +488,33 @@ class App:
         self.r.mod_env(env_args, save=save or self.autosave)
         return ""
 
+    def batch(self):
+        """Return a context manager that coalesces Environment saves until
+        it exits, e.g. while running many Requests in a row."""
+        return self.r.env.batch()
+
+    @contextmanager
+    def deadline(self, seconds=None):
+        """Return a context manager under which Requests fail with
+        :class:`DeadlineError`, instead of being sent, once ``seconds``
+        passed. Requests in flight time out by then. None sets no deadline.
+        """
+        previous = self.r.deadline
+        if seconds is not None:
+            self.r.deadline = time.time() + seconds
+        try:
+            yield
+        finally:
+            self.r.deadline = previous
+
+    def prefetch_dns(self):
+        """Resolve the hosts of the Collection's URLs into the DNS cache,
+        and report any that can't be resolved."""
+        errors = self.r.dns_cache.prefetch(self.r.collection_hosts())
+        for host, err in sorted(errors.items()):
+            self.log(f"Can't resolve {host}: {err}")
+        return ""
+
     def save_env(self):
         """Save the current Environment to disk."""
         self.r.env.save()
@@ -220,7 +523,7 @@ class App:
     def show_env(self):
         """Return a formatted representation of the current Environment."""
         if self.r.env:
-            output = self.fmt_json(self.r.env)
+            output = self.fmt_json(self.r.env.data)
             return self.highlight(output, self.json_lexer)
         return "No Environment loaded."
 
@@ -229,7 +532,10 @@ class App:
         if utils.select_first(quiet, self.quiet):
             return ""
 
-        if response.headers.get("Content-Type", None) == "application/json":
+        download = getattr(response, "download", None)
+        if download:
+            body = self.fmt_download(download)
+        elif response.headers.get("Content-Type", None) == "application/json":
             try:
                 body = self.fmt_json(response.json())
             except json.JSONDecodeError:
@@ -249,6 +555,119 @@ class App:
             )
         return self.highlight(http_txt, self.http_lexer)
 
+    def show_progress(self, received, total):
+        """Report the progress of a download on stderr.
+
+        If ``received`` is None, the progress line is cleared instead.
+        """
+        if not sys.stderr.isatty():
+            return
+        msg = ""
+        if received is not None:
+            msg = f"Downloading... {utils.fmt_size(received)}"
+            if total:
+                msg += f" / {utils.fmt_size(total)}"
+                msg += f" ({received * 100 // total}%)"
+        self.log(f"\r\033[K{msg}", nl=False)
+
+    @staticmethod
+    def fmt_download(download):
+        """Format a summary of a response body that was saved to a file."""
+        return (
+            f"Saved {utils.fmt_size(download.size)} to {download.path}"
+            f" in {download.elapsed:.2f}s"
+            f" ({utils.fmt_size(download.rate)}/s)"
+        )
+
+    @staticmethod
+    def fmt_stats(response, cache=None, dns_cache=None):
+        """Format transfer statistics for a Response, and hit counts for a
+        render ``cache`` and a ``dns_cache`` if given."""
+        transfer = response.transfer
+        elapsed = response.elapsed.total_seconds() + transfer.elapsed
+        stats = f"{response.status_code} {response.reason} in {elapsed:.3f}s"
+        if response.resolve_time:
+            stats += f" ({response.resolve_time * 1000:.1f}ms resolving)"
+        stats += f", {utils.fmt_size(transfer.wire_size)} received"
+        if transfer.size != transfer.wire_size:
+            stats += f", {utils.fmt_size(transfer.size)} decoded"
+            if transfer.size:
+                saved = 100 - transfer.wire_size * 100 // transfer.size
+                stats += f" ({saved}% saved)"
+        if response.attempts > 1:
+            stats += f" after {response.attempts} attempts"
+        if response.hedges:
+            stats += f", hedged {response.hedges}x"
+            if response.hedge_won:
+                stats += " (hedge won)"
+        if cache is not None:
+            stats += (
+                f"; render cache: {cache.hits} hits, {cache.misses} misses"
+            )
+        if dns_cache is not None:
+            stats += (
+                f"; dns cache: {dns_cache.hits} hits,"
+                f" {dns_cache.misses} misses"
+            )
+        return stats
+
+    @staticmethod
+    def fmt_load_report(report):
+        """Format the report of a load run."""
+        count = report.count
+        rate = count / report.elapsed if report.elapsed else 0
+        lines = [
+            f"{count} requests in {report.elapsed:.2f}s ({rate:.1f}/s)"
+            + (f" from {report.workers} workers" if report.workers > 1 else "")
+        ]
+        histogram = report.histogram
+        if histogram.count:
+            latencies = [("min", histogram.min)]
+            latencies.extend(
+                (f"p{p}", histogram.percentile(p)) for p in load.PERCENTILES
+            )
+            latencies.append(("max", histogram.max))
+            latencies.append(("mean", histogram.mean))
+            lines.append(
+                "latency: "
+                + ", ".join(f"{k} {v * 1000:.1f}ms" for k, v in latencies)
+            )
+        if report.statuses:
+            statuses = sorted(report.statuses.items())
+            lines.append(
+                "status: " + ", ".join(f"{k}: {v}" for k, v in statuses)
+            )
+        if report.resolves:
+            mean = report.resolve_time / report.resolves
+            lines.append(
+                f"resolving: {report.resolves} lookups,"
+                f" mean {mean * 1000:.1f}ms"
+            )
+        if report.hedges:
+            lines.append(
+                f"hedges: {report.hedges} sent, {report.hedge_wins} won"
+            )
+        if report.errors:
+            errors = report.errors.most_common()
+            lines.append(
+                "errors: " + ", ".join(f"{k}: {v}" for k, v in errors)
+            )
+        return "\n".join(lines)
+
+    @staticmethod
+    def fmt_expectations(results):
+        """Summarize the results of a Request's ``expect`` checks, listing
+        any that failed."""
+        failed = [result for result in results if not result.passed]
+        lines = [f"expect: {len(results) - len(failed)}/{len(results)} passed"]
+        lines.extend(f"  {result}" for result in failed)
+        return "\n".join(lines)
+
+    @staticmethod
+    def log(msg, nl=True):
+        """Write a diagnostic message to stderr."""
+        click.echo(msg, err=True, nl=nl)
+
     def highlight(self, code, pygments_lexer):
         """Highlight the given code.
 
@@ -260,8 +679,8 @@ class App:
 
     def fmt_json(self, data):
         if self.raw_output:
-            return json.dumps(data)
-        return json.dumps(data, indent=2)
+            return json_utils.dumps(data)
+        return json_utils.dumps(data, indent=2)
 
     @staticmethod
     def key_value_pairs(obj):
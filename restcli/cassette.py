@@ -0,0 +1,282 @@
+import hashlib
+import http.client
+import io
+import mmap
+import os
+import threading
+from collections import defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.cookies import MockRequest, MockResponse
+from urllib3 import HTTPResponse
+from urllib3._collections import HTTPHeaderDict
+
+from restcli import json_utils, streams
+from restcli.exceptions import CassetteError
+from restcli.utils import AttrSeq
+
+__all__ = ["MODES", "Cassette"]
+
+MODES = AttrSeq("record", "replay")
+
+
+class Cassette:
+    """A store of recorded HTTP exchanges, kept in a directory.
+
+    Response bodies are appended, exactly as they came off the wire, to a
+    data file. Each exchange then gets a line in an index file, with the
+    response's status and headers, and the offset and size of its body.
+    Both files are only ever appended to, in single writes, so several
+    processes can record into the same store at once.
+
+    Exchanges are keyed by a hash of the request's method, URL and body.
+    When a key was recorded more than once, replay serves the responses in
+    the order they were recorded, then keeps serving the last one. Bodies
+    are replayed straight from a memory map of the data file.
+
+    Args:
+        path: The directory of the store. It's created when recording.
+        mode: One of ``MODES``.
+    """
+
+    DATA_FILE = "bodies.dat"
+    INDEX_FILE = "index.jsonl"
+
+    def __init__(self, path, mode=MODES.replay):
+        if mode not in MODES:
+            raise ValueError(f"invalid mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.data_path = os.path.join(path, self.DATA_FILE)
+        self.index_path = os.path.join(path, self.INDEX_FILE)
+        self.lock = threading.Lock()
+        self._entries = None
+        self._served = None
+        self._data = None
+
+        if mode == MODES.record:
+            os.makedirs(path, exist_ok=True)
+        elif not os.path.isfile(self.index_path):
+            raise CassetteError(path, "no recorded exchanges")
+
+    def session(self):
+        """Return a ``requests.Session`` that records or replays through
+        this store."""
+        adapter_class = (
+            RecordAdapter if self.mode == MODES.record else ReplayAdapter
+        )
+        session = requests.Session()
+        adapter = adapter_class(self)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    @staticmethod
+    def key(request):
+        """Return the key of a ``requests.PreparedRequest``."""
+        digest = hashlib.sha256()
+        digest.update(request.method.upper().encode())
+        digest.update(b"\0")
+        digest.update(request.url.encode())
+        digest.update(b"\0")
+        body = request.body
+        if isinstance(body, str):
+            body = body.encode()
+        if isinstance(body, streams.FileBody):
+            # Multipart boundaries are random, so only the file's contents
+            # and how it's sent are hashed.
+            digest.update(f"{body.multipart}\0{body.encoding}\0".encode())
+            with open(body.path, "rb") as handle:
+                chunk = handle.read(streams.CHUNK_SIZE)
+                while chunk:
+                    digest.update(chunk)
+                    chunk = handle.read(streams.CHUNK_SIZE)
+        elif body:
+            digest.update(body)
+        return digest.hexdigest()
+
+    def record(self, key, request, response, body):
+        """Append an exchange to the store.
+
+        Args:
+            key: The request's key.
+            request: The ``requests.PreparedRequest`` that was sent.
+            response: The ``urllib3.HTTPResponse`` that came back.
+            body (bytes): The raw response body.
+
+        Returns:
+            The exchange's index entry.
+        """
+        entry = {
+            "key": key,
+            "method": request.method,
+            "url": request.url,
+            "status": response.status,
+            "reason": response.reason,
+            "version": response.version,
+            "headers": list(response.headers.items()),
+            "offset": None,
+            "size": len(body),
+        }
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        with self.lock:
+            fd = os.open(self.data_path, flags, 0o644)
+            try:
+                os.write(fd, body)
+                # With O_APPEND, the write lands at the end of the file,
+                # wherever other processes left it.
+                entry["offset"] = os.lseek(fd, 0, os.SEEK_CUR) - len(body)
+            finally:
+                os.close(fd)
+            fd = os.open(self.index_path, flags, 0o644)
+            try:
+                os.write(fd, json_utils.dumpb(entry) + b"\n")
+            finally:
+                os.close(fd)
+        return entry
+
+    def find(self, key):
+        """Return the index entry to replay for a key, or None if it wasn't
+        recorded."""
+        with self.lock:
+            if self._entries is None:
+                self._entries = self.load_index()
+                self._served = defaultdict(int)
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            served = self._served[key]
+            self._served[key] = served + 1
+            return entries[min(served, len(entries) - 1)]
+
+    def load_index(self):
+        """Read the index file.
+
+        Returns:
+            A dict mapping keys to lists of entries, in recorded order.
+        """
+        entries = defaultdict(list)
+        with open(self.index_path, "rb") as handle:
+            for number, line in enumerate(handle, 1):
+                try:
+                    entry = json_utils.loads(line)
+                    entries[entry["key"]].append(entry)
+                except (ValueError, TypeError, KeyError):
+                    raise CassetteError(
+                        self.path, f"invalid index entry on line {number}"
+                    )
+        return entries
+
+    def open_body(self, entry):
+        """Return a file object that reads an entry's body from the memory
+        map of the data file."""
+        with self.lock:
+            if self._data is None:
+                with open(self.data_path, "rb") as handle:
+                    size = os.fstat(handle.fileno()).st_size
+                    # Empty files can't be memory-mapped.
+                    self._data = (
+                        mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+                        if size
+                        else b""
+                    )
+        start = entry["offset"]
+        end = start + entry["size"]
+        if end > len(self._data):
+            raise CassetteError(self.path, "data file is truncated")
+        return _MappedBody(memoryview(self._data)[start:end])
+
+
+class RecordAdapter(HTTPAdapter):
+    """A transport adapter that sends requests over the network, and records
+    the exchanges in a :class:`Cassette`."""
+
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        key = self.cassette.key(request)
+        response = super().send(request, **kwargs)
+        raw = response.raw
+        try:
+            body = raw.read(decode_content=False)
+        finally:
+            raw.release_conn()
+        entry = self.cassette.record(key, request, raw, body)
+        response.raw = make_raw(entry, request, io.BytesIO(body))
+        return response
+
+
+class ReplayAdapter(HTTPAdapter):
+    """A transport adapter that serves responses from a :class:`Cassette`
+    instead of the network.
+
+    Raises:
+        CassetteError: If a request wasn't recorded.
+    """
+
+    def __init__(self, cassette, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        entry = self.cassette.find(self.cassette.key(request))
+        if entry is None:
+            raise CassetteError(
+                self.cassette.path,
+                f"no recorded response for {request.method} {request.url}",
+            )
+        raw = make_raw(entry, request, self.cassette.open_body(entry))
+        response = self.build_response(request, raw)
+
+        # There's no http.client response for requests to take cookies
+        # from, so they're taken from the recorded headers.
+        message = http.client.HTTPMessage()
+        for name, value in entry["headers"]:
+            message[name] = value
+        response.cookies.extract_cookies(
+            MockResponse(message), MockRequest(request)
+        )
+        return response
+
+
+def make_raw(entry, request, body):
+    """Build the ``urllib3.HTTPResponse`` of an index entry, reading its
+    body from a file object."""
+    raw = HTTPResponse(
+        body=body,
+        headers=HTTPHeaderDict(entry["headers"]),
+        status=entry["status"],
+        version=entry["version"],
+        reason=entry["reason"],
+        preload_content=False,
+        decode_content=False,
+        request_method=request.method,
+    )
+    # The body was recorded after any chunked framing was removed.
+    raw.chunked = False
+    return raw
+
+
+class _MappedBody(io.RawIOBase):
+    """A read-only file object over a memoryview."""
+
+    def __init__(self, view):
+        super().__init__()
+        self.view = view
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), len(self.view) - self.pos)
+        buffer[:size] = self.view[self.pos : self.pos + size]
+        self.pos += size
+        return size
+
+    def close(self):
+        self.view.release()
+        super().close()
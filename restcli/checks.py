@@ -0,0 +1,303 @@
+import re
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from restcli import json_utils
+from restcli.exceptions import InputError
+from restcli.jsonpath import MISSING, compile_path, fmt_path, resolve
+from restcli.utils import AttrMap
+
+__all__ = [
+    "EXPECT_PARAMS",
+    "JSON_TYPES",
+    "CheckResult",
+    "Expectations",
+    "compile_expect",
+]
+
+EXPECT_PARAMS = AttrMap(
+    ("status", (int, list)),
+    ("headers", dict),
+    ("json", dict),
+    ("max_latency", (int, float)),
+)
+
+JSON_TYPES = AttrMap(
+    ("object", dict),
+    ("array", list),
+    ("string", str),
+    ("number", (int, float)),
+    ("integer", int),
+    ("boolean", bool),
+    ("null", type(None)),
+)
+
+@dataclass
+class CheckResult:
+    """The outcome of a single check.
+
+    Args:
+        check (str): What was checked, e.g. ``status`` or ``$.id type``.
+        passed (bool): Whether the check passed.
+        expected: The expected value, as written in the Collection.
+        actual: The actual value, or None if it wasn't found.
+    """
+
+    check: str
+    passed: bool
+    expected: Any
+    actual: Any
+
+    def __str__(self):
+        return (
+            f"{'PASS' if self.passed else 'FAIL'} {self.check}:"
+            f" expected {self.expected!r}, got {self.actual!r}"
+        )
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class Check:
+    """Base class for checks against a Response.
+
+    Subclasses implement :meth:`actual` and :meth:`matches`.
+    """
+
+    name = NotImplemented
+    reads_body = False
+
+    def __init__(self, expected):
+        self.expected = expected
+
+    def __call__(self, response, body):
+        actual = self.actual(response, body)
+        passed = actual is not MISSING and self.matches(actual)
+        return CheckResult(
+            check=self.name,
+            passed=passed,
+            expected=self.expected,
+            actual=None if actual is MISSING else actual,
+        )
+
+    def actual(self, response, body):
+        raise NotImplementedError
+
+    def matches(self, actual):
+        raise NotImplementedError
+
+
+class StatusCheck(Check):
+
+    name = "status"
+
+    def __init__(self, expected):
+        super().__init__(expected)
+        self.allowed = frozenset(
+            expected if isinstance(expected, list) else [expected]
+        )
+
+    def actual(self, response, body):
+        return response.status_code
+
+    def matches(self, actual):
+        return actual in self.allowed
+
+
+class HeaderCheck(Check):
+    """Search a header's value for a regex."""
+
+    def __init__(self, header, expected):
+        super().__init__(expected)
+        self.header = header
+        self.name = f"header {header}"
+        self.pattern = re.compile(expected)
+
+    def actual(self, response, body):
+        return response.headers.get(self.header, MISSING)
+
+    def matches(self, actual):
+        return self.pattern.search(actual) is not None
+
+
+class LatencyCheck(Check):
+
+    name = "max_latency"
+
+    def actual(self, response, body):
+        elapsed = response.elapsed.total_seconds()
+        transfer = getattr(response, "transfer", None)
+        if transfer:
+            elapsed += transfer.elapsed
+        return round(elapsed, 6)
+
+    def matches(self, actual):
+        return actual <= self.expected
+
+
+class JsonCheck(Check):
+    """Check the value found at a path in a JSON body."""
+
+    reads_body = True
+    operator = NotImplemented
+
+    def __init__(self, path, expected):
+        super().__init__(expected)
+        self.path = compile_path(path)
+        self.name = f"{fmt_path(self.path)} {self.operator}"
+
+    def actual(self, response, body):
+        return resolve(body, self.path)
+
+
+class JsonEqualsCheck(JsonCheck):
+
+    operator = "equals"
+
+    def matches(self, actual):
+        # Keep booleans from comparing equal to 0 and 1.
+        if isinstance(actual, bool) != isinstance(self.expected, bool):
+            return False
+        return actual == self.expected
+
+
+class JsonRegexCheck(JsonCheck):
+
+    operator = "regex"
+
+    def __init__(self, path, expected):
+        super().__init__(path, expected)
+        self.pattern = re.compile(expected)
+
+    def matches(self, actual):
+        return (
+            isinstance(actual, str) and self.pattern.search(actual) is not None
+        )
+
+
+class JsonTypeCheck(JsonCheck):
+
+    operator = "type"
+
+    def __init__(self, path, expected):
+        if not isinstance(expected, str) or expected not in JSON_TYPES:
+            raise InputError(
+                value=expected,
+                msg=f"unknown type; expected one of: {', '.join(JSON_TYPES)}",
+            )
+        super().__init__(path, expected)
+        self.types = JSON_TYPES[expected]
+
+    def matches(self, actual):
+        if isinstance(actual, bool) and self.expected != "boolean":
+            return False
+        return isinstance(actual, self.types)
+
+
+JSON_CHECKS = AttrMap(
+    *(
+        (check.operator, check)
+        for check in (JsonEqualsCheck, JsonRegexCheck, JsonTypeCheck)
+    )
+)
+
+
+class Expectations:
+    """A compiled ``expect`` block: checks to run against a Response.
+
+    Args:
+        checks: A list of :class:`Check` objects.
+    """
+
+    def __init__(self, checks):
+        self.checks = checks
+        self.reads_body = any(check.reads_body for check in checks)
+
+    def __len__(self):
+        return len(self.checks)
+
+    def evaluate(self, response):
+        """Run every check against a Response.
+
+        The body is parsed at most once, and only if a check reads it. Bodies
+        that were saved to a file are read back from that file.
+
+        Returns:
+            A list of :class:`CheckResult` objects, in the order the checks
+            were written.
+        """
+        body = MISSING
+        if self.reads_body:
+            body = self.parse_body(response)
+        return [check(response, body) for check in self.checks]
+
+    @staticmethod
+    def parse_body(response):
+        download = getattr(response, "download", None)
+        try:
+            if download:
+                with open(download.path, "rb") as handle:
+                    return json_utils.loads(handle.read())
+            return response.json()
+        except ValueError:
+            return MISSING
+
+
+def compile_expect(spec):
+    """Validate an ``expect`` block and compile it into :class:`Expectations`.
+
+    Args:
+        spec (dict): The ``expect`` parameter of a Request.
+
+    Raises:
+        InputError: If the block is malformed.
+    """
+    checks = []
+    for key, value in spec.items():
+        if key not in EXPECT_PARAMS:
+            raise InputError(value=key, msg="unexpected key in expect")
+        if not isinstance(value, EXPECT_PARAMS[key]) or isinstance(
+            value, bool
+        ):
+            raise InputError(value=value, msg=f"invalid value for {key}")
+
+        if key == "status":
+            if isinstance(value, list) and not all(
+                isinstance(v, int) and not isinstance(v, bool) for v in value
+            ):
+                raise InputError(value=value, msg="status codes must be ints")
+            checks.append(StatusCheck(value))
+        elif key == "max_latency":
+            checks.append(LatencyCheck(value))
+        elif key == "headers":
+            for header, pattern in value.items():
+                checks.append(HeaderCheck(header, _compile_regex(pattern)))
+        else:
+            for path, condition in value.items():
+                checks.extend(_compile_json_checks(path, condition))
+    return Expectations(checks)
+
+
+def _compile_json_checks(path, condition):
+    # A bare value is shorthand for ``{equals: value}``.
+    if not isinstance(condition, dict):
+        condition = {"equals": condition}
+    for operator, expected in condition.items():
+        if operator not in JSON_CHECKS:
+            raise InputError(
+                value=operator,
+                msg="unknown operator; expected one of:"
+                f" {', '.join(JSON_CHECKS)}",
+            )
+        if operator == "regex":
+            expected = _compile_regex(expected)
+        yield JSON_CHECKS[operator](path, expected)
+
+
+def _compile_regex(pattern):
+    """Check that a regex compiles, returning it unchanged."""
+    try:
+        re.compile(pattern)
+    except (re.error, TypeError) as err:
+        raise InputError(value=pattern, msg=f"invalid regex - {err}")
+    return pattern
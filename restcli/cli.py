@@ -1,19 +1,33 @@
+import io
 import shlex
 import sys
+from contextlib import nullcontext
 
 import click
 from click_repl import repl as start_repl
+from prompt_toolkit.patch_stdout import patch_stdout
 
 import restcli
 from restcli.app import App
+from restcli.cluster import DEFAULT_PORT, WorkerServer, parse_address
 from restcli.exceptions import (
+    CassetteError,
+    CircuitOpenError,
     CollectionError,
+    DeadlineError,
     EnvError,
     InputError,
     LibError,
     NotFoundError,
+    RequestTimeoutError,
+    WorkerError,
     expect,
 )
+from restcli.jobs import JobManager
+from restcli.mock import DEFAULT_PORT as MOCK_PORT
+from restcli.mock import MockServer
+from restcli.sharding import ExecJob
+from restcli.sweep import FORMATS
 
 pass_app = click.make_pass_decorator(App)
 
@@ -64,22 +78,75 @@ pass_app = click.make_pass_decorator(App)
     default=False,
     help="Don't color or format output.",
 )
+@click.option(
+    "-t/-T",
+    "--stats/--no-stats",
+    envvar="RESTCLI_STATS",
+    default=False,
+    help="Report transfer statistics on stderr.",
+)
+@click.option(
+    "--record",
+    metavar="DIR",
+    type=click.Path(file_okay=False, writable=True),
+    help="Record every exchange into a cassette store.",
+)
+@click.option(
+    "--replay",
+    metavar="DIR",
+    type=click.Path(exists=True, file_okay=False),
+    help="Replay responses from a cassette store instead of the network.",
+)
+@click.option(
+    "--dns-cache/--no-dns-cache",
+    envvar="RESTCLI_DNS_CACHE",
+    default=False,
+    help="Cache resolved host addresses, and keep connections alive.",
+)
+@click.option(
+    "--prefetch-dns",
+    is_flag=True,
+    help="Resolve the hosts of the Collection's URLs up front. Implies"
+    " --dns-cache.",
+)
 @click.pass_context
-# pylint: disable=redefined-outer-name
-def cli(ctx, collection, env, save, quiet, raw_output):
+# pylint: disable=redefined-outer-name,too-many-arguments
+def cli(
+    ctx,
+    collection,
+    env,
+    save,
+    quiet,
+    raw_output,
+    stats,
+    record,
+    replay,
+    dns_cache,
+    prefetch_dns,
+):
+    if record and replay:
+        raise click.UsageError("--record and --replay can't be combined")
     if not ctx.obj:
-        with expect(CollectionError, EnvError, LibError):
+        with expect(CollectionError, EnvError, LibError, CassetteError):
             ctx.obj = App(
                 collection,
                 env,
                 autosave=save,
                 quiet=quiet,
                 raw_output=raw_output,
+                stats=stats,
+                record=record,
+                replay=replay,
+                dns_cache=dns_cache,
+                prefetch_dns=prefetch_dns,
             )
 
 
 @cli.command(
-    help="Run a Request.",
+    help="""Run a Request.
+
+In the REPL, end the command with '&' to run the Request in the background.
+""",
     context_settings=dict(
         ignore_unknown_options=True,
     ),
@@ -93,15 +160,117 @@ def cli(ctx, collection, env, save, quiet, raw_output):
     multiple=True,
     help="Override Environment variables.",
 )
+@click.option(
+    "-O",
+    "--output-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Stream the response body to a file.",
+)
 @pass_app
-def run(app, group, request, modifiers, override_env):
-    with expect(InputError, NotFoundError):
+def run(app, group, request, modifiers, override_env, output_file):
+    if modifiers and modifiers[-1] == "&":
+        with expect(InputError, NotFoundError):
+            output = app.run_background(
+                group,
+                request,
+                modifiers=modifiers[:-1],
+                env_args=override_env,
+                output_file=output_file,
+            )
+        click.echo(output)
+        return
+
+    with expect(
+        InputError,
+        NotFoundError,
+        CassetteError,
+        CircuitOpenError,
+        RequestTimeoutError,
+        DeadlineError,
+    ):
         output = app.run(
-            group, request, modifiers=modifiers, env_args=override_env
+            group,
+            request,
+            modifiers=modifiers,
+            env_args=override_env,
+            output_file=output_file,
         )
     click.echo(output)
 
 
+@cli.command(
+    help="""Run a Request once for each row of a data file.
+
+Each row overrides Environment variables for its own Request only. CSV files
+use their header row as variable names; JSON Lines files hold one JSON object
+per line. Results are written as JSON Lines, one object per row, keyed by row
+number.
+""",
+    context_settings=dict(
+        ignore_unknown_options=True,
+    ),
+)
+@click.argument("group")
+@click.argument("request")
+@click.argument("modifiers", nargs=-1, type=click.UNPROCESSED)
+@click.option(
+    "-D",
+    "--data",
+    type=click.File(),
+    required=True,
+    help="CSV or JSON Lines file of Environment overrides.",
+)
+@click.option(
+    "-F",
+    "--format",
+    "data_format",
+    type=click.Choice(FORMATS),
+    help="Format of the data file. Guessed from its extension by default.",
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of Requests to run concurrently.",
+)
+@click.option(
+    "--results",
+    type=click.File("w"),
+    default="-",
+    help="Write results to this file instead of stdout.",
+)
+@click.option(
+    "--deadline",
+    type=click.FloatRange(min=0),
+    help="Seconds after which to stop sending Requests. The remaining rows"
+    " are reported as skipped.",
+)
+@pass_app
+# pylint: disable=too-many-arguments
+def sweep(
+    app,
+    group,
+    request,
+    modifiers,
+    data,
+    data_format,
+    workers,
+    results,
+    deadline,
+):
+    with expect(InputError, NotFoundError), app.deadline(deadline):
+        for line in app.sweep(
+            group,
+            request,
+            data,
+            data_format=data_format,
+            modifiers=modifiers,
+            workers=workers,
+        ):
+            click.echo(line, file=results)
+
+
 @cli.command(
     help="""Run multiple Requests from a file.
 
@@ -109,23 +278,269 @@ If '-' is given, stdin will be used. Lines beginning with '#' are ignored. Each
 line in the file should specify args for a single "run" invocation:
 
     [OPTIONS] GROUP REQUEST [MODIFIERS]...
+
+With --workers, lines are run in that many processes. Each line then sees the
+Environment as it was before the batch, and the changes each line makes are
+merged in file order afterwards.
 """
 )
 @click.argument("file", type=click.File())
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of processes to run Requests in.",
+)
+@click.option(
+    "--deadline",
+    type=click.FloatRange(min=0),
+    help="Seconds after which to stop running lines. The lines that weren't"
+    " run are listed, and the exit status is 1.",
+)
 @click.pass_context
 # pylint: disable=unexpected-keyword-arg,no-value-for-parameter
 # pylint: disable=redefined-builtin
-def exec(ctx, file):
-    for line in file:
-        line = line.strip()
-        if line.startswith("#"):
-            continue
-        click.echo(f">>> run {line}")
-        args = shlex.split(line)
+def exec(ctx, file, workers, deadline):
+    lines = (line.strip() for line in file)
+    lines = (line for line in lines if not line.startswith("#"))
+    skipped = []
+    with ctx.obj.batch(), ctx.obj.deadline(deadline):
+        if workers > 1:
+            jobs = (parse_exec_line(ctx, line) for line in lines)
+            for result in ctx.obj.exec_sharded(jobs, workers):
+                if result.skipped:
+                    skipped.append(result.line)
+                    continue
+                click.echo(f">>> run {result.line}")
+                click.echo(result.log, err=True, nl=False)
+                if result.error:
+                    click.echo(result.error, err=True)
+                else:
+                    click.echo(result.output)
+        else:
+            for line in lines:
+                if skipped or deadline_passed(ctx.obj):
+                    skipped.append(line)
+                    continue
+                click.echo(f">>> run {line}")
+                args = shlex.split(line)
+                try:
+                    run(args, prog_name="restcli", parent=ctx)
+                except SystemExit:
+                    continue
+
+    if skipped:
+        click.echo(
+            f"Deadline of {deadline:g}s passed; {len(skipped)} line(s) not"
+            " run:",
+            err=True,
+        )
+        for line in skipped:
+            click.echo(f"    {line}", err=True)
+        ctx.exit(1)
+
+
+def deadline_passed(app):
+    try:
+        app.r.check_deadline()
+    except DeadlineError:
+        return True
+    return False
+
+
+def parse_exec_line(ctx, line):
+    """Parse a line of an ``exec`` file into an :class:`ExecJob`."""
+    try:
+        with run.make_context("restcli", shlex.split(line), parent=ctx) as sub:
+            params = sub.params
+    except click.ClickException as err:
+        output = io.StringIO()
+        err.show(file=output)
+        return ExecJob(line, error=output.getvalue().rstrip("\n"))
+    except click.exceptions.Exit:
+        return ExecJob(line, error="Error: --help isn't supported here")
+    except ValueError as err:
+        return ExecJob(line, error=f"Error: {err}")
+
+    modifiers = params["modifiers"]
+    if modifiers and modifiers[-1] == "&":
+        err = InputError(value="&", msg="not supported with --workers")
+        return ExecJob(line, error=f"Error: {err.show()}")
+    kwargs = dict(
+        group_name=params["group"],
+        request_name=params["request"],
+        modifiers=modifiers,
+        env_args=params["override_env"],
+        output_file=params["output_file"],
+    )
+    return ExecJob(line, kwargs)
+
+
+@cli.command(
+    help="""Send a Request many times and report latencies and errors.
+
+Runs until the given number of Requests were sent, or the given number of
+seconds passed. With --worker, the load is spread over workers started with
+'restcli worker', which get the Collection and Environment from here.
+""",
+    context_settings=dict(
+        ignore_unknown_options=True,
+    ),
+)
+@click.argument("group")
+@click.argument("request")
+@click.argument("modifiers", nargs=-1, type=click.UNPROCESSED)
+@click.option(
+    "-n",
+    "--requests",
+    type=click.IntRange(min=1),
+    help="Total number of Requests to send.",
+)
+@click.option(
+    "-d",
+    "--duration",
+    type=click.FloatRange(min=0),
+    help="Number of seconds to send Requests for.",
+)
+@click.option(
+    "-C",
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of Requests in flight at once, per worker.",
+)
+@click.option(
+    "-W",
+    "--worker",
+    "workers",
+    multiple=True,
+    help="[HOST:]PORT of a worker. May be given more than once.",
+)
+@click.option(
+    "--token",
+    envvar="RESTCLI_WORKER_TOKEN",
+    help="Shared secret of the workers.",
+)
+@pass_app
+# pylint: disable=too-many-arguments
+def load(
+    app,
+    group,
+    request,
+    modifiers,
+    requests,
+    duration,
+    concurrency,
+    workers,
+    token,
+):
+    with expect(InputError, NotFoundError, WorkerError):
+        output = app.load(
+            group,
+            request,
+            modifiers=modifiers,
+            requests=requests,
+            duration=duration,
+            concurrency=concurrency,
+            workers=workers,
+            token=token,
+        )
+    click.echo(output)
+
+
+@cli.command(
+    help="""Generate load on behalf of 'restcli load --worker'.
+
+Coordinators send their Collection, which may run scripts here, so only listen
+on trusted networks, and set a token.
+"""
+)
+@click.option(
+    "-l",
+    "--listen",
+    default=f"127.0.0.1:{DEFAULT_PORT}",
+    show_default=True,
+    help="[HOST:]PORT to listen on.",
+)
+@click.option(
+    "--token",
+    envvar="RESTCLI_WORKER_TOKEN",
+    help="Shared secret that coordinators must send.",
+)
+def worker(listen, token):
+    with expect(InputError):
+        address = parse_address(listen)
+    try:
+        server = WorkerServer(address, token=token)
+    except OSError as err:
+        raise click.ClickException(f"can't listen on {listen}: {err}")
+    host, port = server.server_address[:2]
+    click.echo(f"Listening on {host}:{port}", err=True)
+    with server:
         try:
-            run(args, prog_name="restcli", parent=ctx)
-        except SystemExit:
-            continue
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+@cli.command(
+    help="""Serve the Requests of the Collection from a local mock server.
+
+Each Request is answered at its method and URL path, with the response
+recorded for it in the --replay store, its 'mock' response, or an empty 200.
+"""
+)
+@click.option(
+    "-l",
+    "--listen",
+    default=f"127.0.0.1:{MOCK_PORT}",
+    show_default=True,
+    help="[HOST:]PORT to listen on.",
+)
+@click.option(
+    "--latency",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Seconds to wait before each response.",
+)
+@click.option(
+    "--error-rate",
+    type=click.FloatRange(min=0, max=1),
+    default=0.0,
+    help="Fraction of responses to replace with errors.",
+)
+@click.option(
+    "--error-status",
+    type=click.IntRange(min=100, max=599),
+    default=503,
+    show_default=True,
+    help="Status of injected errors.",
+)
+@pass_app
+def mock(app, listen, latency, error_rate, error_status):
+    with expect(InputError):
+        address = parse_address(listen)
+    with expect(CassetteError):
+        server = MockServer(
+            app.r.collection,
+            app.r.env,
+            cassette=app.r.cassette if app.replay else None,
+            latency=latency,
+            error_rate=error_rate,
+            error_status=error_status,
+        )
+
+    def ready(address):
+        host, port = address
+        click.echo(f"Listening on {host}:{port}", err=True)
+
+    try:
+        server.run(address, ready)
+    except OSError as err:
+        raise click.ClickException(f"can't listen on {listen}: {err}")
+    except KeyboardInterrupt:
+        pass
 
 
 @cli.command(help="View a Group, Request, or Request Parameter.")
@@ -196,7 +611,52 @@ def repl(ctx):
         output = app.load_env(path)
         click.echo(output)
 
+    @cli.command(
+        help="List background jobs started with 'run ... &'.",
+    )
+    @click.option(
+        "-c",
+        "--clear",
+        is_flag=True,
+        help="Forget finished jobs after listing them.",
+    )
+    @pass_app
+    def jobs(app, clear):
+        output = app.show_jobs(clear=clear)
+        click.echo(output)
+
+    @cli.command(
+        help="Wait for a background job and show its output."
+        " Defaults to the most recent job."
+    )
+    @click.argument("job", type=int, required=False)
+    @pass_app
+    def wait(app, job):
+        try:
+            with expect(InputError, NotFoundError):
+                output = app.wait_job(job)
+        except KeyboardInterrupt:
+            output = "Stopped waiting; the job is still running."
+        click.echo(output)
+
+    @cli.command(help="Same as 'wait'.")
+    @click.argument("job", type=int, required=False)
+    @click.pass_context
+    def fg(ctx, job):
+        ctx.invoke(wait, job=job)
+
     # Start REPL.
     # --------------------------------------------
 
-    start_repl(ctx)
+    app = ctx.obj
+    app.jobs = JobManager(notify=lambda job: app.log(app.fmt_job(job)))
+    prompt_kwargs = dict(
+        bottom_toolbar=app.jobs_toolbar,
+        # Redraw the toolbar while jobs run.
+        refresh_interval=0.5,
+    )
+    # Let jobs print above the prompt without garbling it. Without a
+    # terminal there's no prompt, and commands are read from stdin instead.
+    with patch_stdout() if sys.stdin.isatty() else nullcontext():
+        start_repl(ctx, prompt_kwargs=prompt_kwargs)
+    app.jobs.shutdown(wait=False)
@@ -0,0 +1,265 @@
+import hmac
+import os
+import socket
+import socketserver
+import tempfile
+
+from restcli import json_utils
+from restcli import yaml_utils as yaml
+from restcli.exceptions import Error, InputError, WorkerError
+from restcli.load import LoadProfile, LoadReport, run_load
+from restcli.requestor import Requestor
+from restcli.utils import AttrSeq
+
+__all__ = [
+    "DEFAULT_PORT",
+    "MESSAGES",
+    "Coordinator",
+    "WorkerServer",
+    "parse_address",
+]
+
+# Version of the protocol below; workers refuse coordinators of another one.
+PROTOCOL_VERSION = 1
+
+DEFAULT_PORT = 7405
+
+# Types of protocol messages. Each message is a JSON object on its own line,
+# with its type under "type":
+#
+#   coordinator -> worker  setup   Collection, Environment, profile, token
+#   worker -> coordinator  ready   (or error)
+#   coordinator -> worker  start
+#   worker -> coordinator  report  the worker's LoadReport
+MESSAGES = AttrSeq(
+    "setup",
+    "ready",
+    "start",
+    "report",
+    "error",
+)
+
+
+def parse_address(address, default_host="127.0.0.1"):
+    """Parse a ``[HOST:]PORT`` string into a ``(host, port)`` tuple."""
+    host, _, port = address.rpartition(":")
+    try:
+        port = int(port)
+    except ValueError:
+        raise InputError(value=address, msg="expected [HOST:]PORT")
+    return host.strip("[]") or default_host, port
+
+
+def fmt_address(address):
+    """Format a ``(host, port)`` tuple."""
+    host, port = address
+    return f"[{host}]:{port}" if ":" in host else f"{host}:{port}"
+
+
+def send_message(handle, message_type, **data):
+    """Write a message to a binary file object."""
+    handle.write(json_utils.dumpb({"type": message_type, **data}) + b"\n")
+    handle.flush()
+
+
+def read_message(handle, *expected):
+    """Read a message of one of the ``expected`` types from a binary file
+    object.
+
+    Raises:
+        ConnectionError: If the connection was closed, the message is
+            malformed, or it's an ``error`` message.
+    """
+    line = handle.readline()
+    if not line:
+        raise ConnectionError("connection closed")
+    try:
+        message = json_utils.loads(line)
+        message_type = message["type"]
+    except (ValueError, TypeError, KeyError):
+        raise ConnectionError("malformed message")
+    if message_type == MESSAGES.error:
+        raise ConnectionError(message.get("error", "unknown error"))
+    if message_type not in expected:
+        raise ConnectionError(f"unexpected message: {message_type}")
+    return message
+
+
+class WorkerHandler(socketserver.StreamRequestHandler):
+    """Run one load for a coordinator."""
+
+    def handle(self):
+        try:
+            self.run()
+        except ConnectionError:
+            pass
+
+    def run(self):
+        setup = read_message(self.rfile, MESSAGES.setup)
+        error = self.check_setup(setup)
+        if error:
+            send_message(self.wfile, MESSAGES.error, error=error)
+            return
+
+        with tempfile.TemporaryDirectory(prefix="restcli-worker-") as tmp:
+            collection = os.path.join(tmp, "collection.yaml")
+            env = os.path.join(tmp, "env.yaml")
+            with open(collection, "w") as handle:
+                handle.write(setup["collection"])
+            with open(env, "w") as handle:
+                handle.write(setup["env"])
+            try:
+                requestor = Requestor(collection, env)
+                profile = LoadProfile.from_dict(setup["profile"])
+            except Error as err:
+                send_message(self.wfile, MESSAGES.error, error=err.show())
+                return
+            except (KeyError, TypeError):
+                send_message(self.wfile, MESSAGES.error, error="bad profile")
+                return
+            if profile.request not in requestor.collection.get(
+                profile.group, {}
+            ):
+                error = f"no such request: {profile.group} {profile.request}"
+                send_message(self.wfile, MESSAGES.error, error=error)
+                return
+
+            send_message(self.wfile, MESSAGES.ready)
+            read_message(self.rfile, MESSAGES.start)
+            report = run_load(requestor, profile)
+            send_message(
+                self.wfile, MESSAGES.report, report=report.to_dict()
+            )
+
+    def check_setup(self, setup):
+        if setup.get("version") != PROTOCOL_VERSION:
+            return f"unsupported protocol version: {setup.get('version')}"
+        token = self.server.token
+        # compare_digest only takes ASCII strings, so compare bytes.
+        if token and not hmac.compare_digest(
+            str(setup.get("token") or "").encode(), token.encode()
+        ):
+            return "invalid token"
+        return None
+
+
+class WorkerServer(socketserver.TCPServer):
+    """A load worker, started with ``restcli worker --listen``.
+
+    Workers run one load at a time, for whichever coordinator connects. The
+    coordinator ships the Collection and Environment along with the load
+    profile, so workers need no files of their own. Since Collections can
+    hold scripts, anyone who can connect to a worker can run code on it:
+    only listen on trusted networks, and set a ``token``.
+
+    Args:
+        address: A ``(host, port)`` tuple to listen on. Port 0 picks a free
+            port.
+        token (optional): A shared secret that coordinators must send.
+    """
+
+    allow_reuse_address = True
+
+    def __init__(self, address, token=None):
+        self.token = token
+        super().__init__(address, WorkerHandler)
+
+
+class Coordinator:
+    """Run a load on several workers at once, and merge their reports.
+
+    Args:
+        addresses: ``(host, port)`` tuples of the workers.
+        token (optional): The workers' shared secret.
+        timeout (optional): Seconds to wait for a worker to connect and get
+            ready.
+    """
+
+    def __init__(self, addresses, token=None, timeout=30.0):
+        self.addresses = addresses
+        self.token = token
+        self.timeout = timeout
+
+    def run(self, collection, env, profile):
+        """Run a load on every worker.
+
+        The profile's ``requests`` are split between the workers; workers
+        that would get no Requests to send are left out. All workers get
+        ready first, then they are started together.
+
+        Args:
+            collection (str): The Collection file's contents.
+            env: The Environment's data.
+            profile: The :class:`LoadProfile` to run.
+
+        Returns:
+            The merged :class:`LoadReport`.
+
+        Raises:
+            WorkerError: If a worker can't be reached, rejects the load, or
+                drops out.
+        """
+        connections = []
+        try:
+            for address, share in zip(
+                self.addresses, profile.split(len(self.addresses))
+            ):
+                connection = self.connect(address)
+                connections.append(connection)
+                connection.send(
+                    MESSAGES.setup,
+                    version=PROTOCOL_VERSION,
+                    token=self.token,
+                    collection=collection,
+                    env=yaml.dump(env),
+                    profile=share.to_dict(),
+                )
+            for connection in connections:
+                connection.read(MESSAGES.ready)
+
+            # Loads can run for a long time.
+            for connection in connections:
+                connection.sock.settimeout(None)
+            for connection in connections:
+                connection.send(MESSAGES.start)
+
+            report = None
+            for connection in connections:
+                message = connection.read(MESSAGES.report)
+                other = LoadReport.from_dict(message["report"])
+                report = report.merge(other) if report else other
+            return report
+        finally:
+            for connection in connections:
+                connection.close()
+
+    def connect(self, address):
+        try:
+            sock = socket.create_connection(address, timeout=self.timeout)
+        except OSError as err:
+            raise WorkerError(fmt_address(address), str(err))
+        return _Connection(address, sock)
+
+
+class _Connection:
+    def __init__(self, address, sock):
+        self.address = address
+        self.sock = sock
+        self.handle = sock.makefile("rwb")
+
+    def send(self, message_type, **data):
+        try:
+            send_message(self.handle, message_type, **data)
+        except OSError as err:
+            raise WorkerError(fmt_address(self.address), str(err))
+
+    def read(self, *expected):
+        try:
+            return read_message(self.handle, *expected)
+        except (ConnectionError, socket.timeout) as err:
+            reason = str(err) or "timed out"
+            raise WorkerError(fmt_address(self.address), reason)
+
+    def close(self):
+        self.handle.close()
+        self.sock.close()
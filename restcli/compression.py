@@ -0,0 +1,190 @@
+import zlib
+
+from restcli.utils import AttrMap
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+__all__ = [
+    "CODECS",
+    "accept_encoding",
+    "compress",
+    "compressor",
+    "decoders",
+    "iter_compress",
+    "iter_decode",
+]
+
+
+class Codec:
+    """A content-coding, as used in Content-Encoding headers.
+
+    Args:
+        name: The name of the coding.
+        compressor: Factory for objects with ``compress(data)`` and
+            ``flush()`` methods.
+        decompressor: Factory for objects with a ``decompress(data)`` method
+            and, optionally, a ``flush()`` method.
+    """
+
+    def __init__(self, name, compressor, decompressor):
+        self.name = name
+        self.compressor = compressor
+        self.decompressor = decompressor
+
+
+class _BrotliCompressor:
+    """Adapt ``brotli.Compressor`` to the zlib compressor interface."""
+
+    def __init__(self):
+        self._compressor = brotli.Compressor()
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+class _BrotliDecompressor:
+    """Adapt ``brotli.Decompressor`` to the zlib decompressor interface."""
+
+    def __init__(self):
+        self._decompressor = brotli.Decompressor()
+
+    def decompress(self, data):
+        return self._decompressor.process(data)
+
+
+class _DeflateDecompressor:
+    """Decode "deflate", which servers send both with and without a zlib
+    header."""
+
+    def __init__(self):
+        self._decompressor = zlib.decompressobj()
+        self._first_try = True
+        self._data = b""
+
+    def decompress(self, data):
+        if not self._first_try:
+            return self._decompressor.decompress(data)
+
+        self._data += data
+        try:
+            decompressed = self._decompressor.decompress(data)
+        except zlib.error:
+            self._first_try = False
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._decompressor.decompress(self._data)
+        if decompressed:
+            self._first_try = False
+            self._data = None
+        return decompressed
+
+    def flush(self):
+        return self._decompressor.flush()
+
+
+def _codecs():
+    codecs = [
+        Codec(
+            "gzip",
+            lambda: zlib.compressobj(wbits=16 + zlib.MAX_WBITS),
+            lambda: zlib.decompressobj(16 + zlib.MAX_WBITS),
+        ),
+        Codec("deflate", zlib.compressobj, _DeflateDecompressor),
+    ]
+    if zstandard:
+        codecs.append(
+            Codec(
+                "zstd",
+                lambda: zstandard.ZstdCompressor().compressobj(),
+                lambda: zstandard.ZstdDecompressor().decompressobj(),
+            )
+        )
+    if brotli:
+        codecs.append(Codec("br", _BrotliCompressor, _BrotliDecompressor))
+    return AttrMap(*((codec.name, codec) for codec in codecs))
+
+
+# Available codecs, by name.
+CODECS = _codecs()
+
+# Preferred order of codecs when negotiating response encodings.
+PREFERENCE = ("zstd", "br", "gzip", "deflate")
+
+
+def accept_encoding():
+    """Return an Accept-Encoding header value for all available codecs."""
+    return ", ".join(name for name in PREFERENCE if name in CODECS)
+
+
+def compressor(encoding):
+    """Return a new compressor for the given encoding.
+
+    Raises:
+        KeyError: If the encoding is unknown or its codec isn't installed.
+    """
+    return CODECS[encoding].compressor()
+
+
+def compress(data, encoding):
+    """Compress ``data`` in one go."""
+    obj = compressor(encoding)
+    return obj.compress(data) + obj.flush()
+
+
+def iter_compress(chunks, encoding):
+    """Compress a stream of chunks, skipping empty output chunks."""
+    obj = compressor(encoding)
+    for chunk in chunks:
+        out = obj.compress(chunk)
+        if out:
+            yield out
+    out = obj.flush()
+    if out:
+        yield out
+
+
+def decoders(content_encoding):
+    """Return decompressors for the value of a Content-Encoding header.
+
+    Decompressors are returned in the order they must be applied, i.e. the
+    reverse of the order the encodings were applied in.
+
+    Returns:
+        A list of decompressors, or None if any encoding is unsupported.
+    """
+    names = [
+        name.strip().lower()
+        for name in content_encoding.split(",")
+        if name.strip() and name.strip().lower() != "identity"
+    ]
+    if not all(name in CODECS for name in names):
+        return None
+    return [CODECS[name].decompressor() for name in reversed(names)]
+
+
+def iter_decode(chunks, decompressors):
+    """Decode a stream of chunks with a chain of decompressors."""
+    for chunk in chunks:
+        for obj in decompressors:
+            chunk = obj.decompress(chunk)
+        if chunk:
+            yield chunk
+
+    # Flush each stage, passing the output through the later stages.
+    for i, obj in enumerate(decompressors):
+        flush = getattr(obj, "flush", None)
+        chunk = flush() if flush else b""
+        for later in decompressors[i + 1 :]:
+            chunk = later.decompress(chunk)
+        if chunk:
+            yield chunk
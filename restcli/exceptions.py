@@ -18,6 +18,11 @@ __all__ = [
     "CollectionError",
     "EnvError",
     "LibError",
+    "WorkerError",
+    "CassetteError",
+    "CircuitOpenError",
+    "RequestTimeoutError",
+    "DeadlineError",
 ]
 
 
@@ -163,3 +168,57 @@ class LibError(FileContentError):
 
     base_msg = "Invalid lib(s)"
     file_type = "LIB"
+
+
+class WorkerError(Error):
+    """Exception for load workers that can't be reached or that fail."""
+
+    base_msg = "Worker {address} failed"
+
+    def __init__(self, address, msg="", action=None):
+        super().__init__(msg, action)
+        self.address = address
+
+
+class CassetteError(Error):
+    """Exception for cassette stores that are invalid, or miss a response."""
+
+    base_msg = "Cassette '{path}'"
+
+    def __init__(self, path, msg="", action=None):
+        super().__init__(msg, action)
+        self.path = path
+
+
+class CircuitOpenError(Error):
+    """Exception for Requests to a host that keeps failing."""
+
+    base_msg = "Circuit open for {host}"
+
+    def __init__(self, host, msg="", action=None):
+        super().__init__(msg, action)
+        self.host = host
+
+
+class RequestTimeoutError(Error):
+    """Exception for Requests that timed out."""
+
+    base_msg = "Timed out: {method} {url}"
+
+    def __init__(self, method, url, phase, timeout, msg="", action=None):
+        if not msg:
+            msg = "no connection" if phase == "connect" else "no response"
+            if timeout is not None:
+                msg += f" within {timeout:.3g}s"
+        super().__init__(msg, action)
+        self.method = method
+        self.url = url
+        self.phase = phase
+        self.timeout = timeout
+
+
+class DeadlineError(Error):
+    """Exception for Requests that weren't sent because the deadline of
+    their batch passed."""
+
+    base_msg = "Deadline passed"
@@ -0,0 +1,146 @@
+import io
+import mmap
+import re
+
+from restcli.exceptions import InputError
+from restcli.jsonpath import MISSING, compile_path, resolve
+from restcli.jsonstream import find_paths
+from restcli.utils import AttrSeq
+
+__all__ = ["SOURCES", "Extraction", "compile_extract"]
+
+# Prefixes of ``extract`` targets; JSON paths are recognized by their "$".
+SOURCES = AttrSeq(
+    "header",
+    "regex",
+)
+
+
+class Extraction:
+    """A compiled ``extract`` block: values to copy from a Response into the
+    Environment.
+
+    Args:
+        paths (dict): Maps variable names to compiled JSON paths.
+        headers (dict): Maps variable names to header names.
+        patterns (dict): Maps variable names to compiled bytes regexes.
+    """
+
+    def __init__(self, paths=None, headers=None, patterns=None):
+        self.paths = paths or {}
+        self.headers = headers or {}
+        self.patterns = patterns or {}
+
+    def __len__(self):
+        return len(self.paths) + len(self.headers) + len(self.patterns)
+
+    def evaluate(self, response):
+        """Extract values from a Response.
+
+        JSON paths are looked up in ``response.json()``, so a body that was
+        already parsed, e.g. by an ``expect`` block, isn't parsed again.
+        Bodies that were saved to a file are read back from that file, but
+        never whole: JSON paths are found by streaming through it, which
+        stops as soon as every path has been found, and decodes only the
+        values at those paths. Regexes are searched for in the raw body.
+
+        Returns:
+            A dict mapping variable names to the values that were found.
+            Targets that weren't found, e.g. because the body isn't JSON, are
+            left out.
+        """
+        values = {}
+        for var, header in self.headers.items():
+            if header in response.headers:
+                values[var] = response.headers[header]
+
+        download = getattr(response, "download", None)
+        if self.paths:
+            found = self.lookup_paths(response, download)
+            for var, path in self.paths.items():
+                value = found.get(path, MISSING)
+                if value is not MISSING:
+                    values[var] = value
+
+        if self.patterns:
+            if download:
+                with open(download.path, "rb") as handle:
+                    values.update(self.search_file(handle))
+            else:
+                values.update(self.search(response.content))
+
+        return values
+
+    def lookup_paths(self, response, download):
+        """Look up each JSON path in the parsed body, or stream through the
+        file the body was saved to.
+
+        Returns:
+            A dict mapping paths to their values. Paths that weren't found
+            are left out, or map to ``MISSING``.
+        """
+        try:
+            if download:
+                encoding = response.encoding or "utf-8"
+                with open(download.path, encoding=encoding) as handle:
+                    return find_paths(handle, self.paths.values())
+            data = response.json()
+        except ValueError:
+            return {}
+        return {path: resolve(data, path) for path in self.paths.values()}
+
+    def search(self, data):
+        """Search some bytes for each regex."""
+        values = {}
+        for var, pattern in self.patterns.items():
+            match = pattern.search(data)
+            if match:
+                value = match.group(1 if pattern.groups else 0)
+                values[var] = value.decode("utf-8", errors="replace")
+        return values
+
+    def search_file(self, handle):
+        """Search a file for each regex, without reading it into memory."""
+        if not handle.seek(0, io.SEEK_END):
+            return self.search(b"")
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return self.search(data)
+
+
+def compile_extract(spec):
+    """Validate an ``extract`` block and compile it into an
+    :class:`Extraction`.
+
+    Each target is one of:
+
+    - a JSON path into the body, e.g. ``$.data.token``;
+    - ``header:NAME``, the value of a response header;
+    - ``regex:PATTERN``, the first match of a regex in the body, or of its
+      first group if it has any.
+
+    Args:
+        spec (dict): The ``extract`` parameter of a Request.
+
+    Raises:
+        InputError: If the block is malformed.
+    """
+    paths, headers, patterns = {}, {}, {}
+    for var, target in spec.items():
+        if not isinstance(target, str):
+            raise InputError(value=target, msg=f"invalid target for {var}")
+        source, _, arg = target.partition(":")
+        if target.startswith("$"):
+            paths[var] = compile_path(target)
+        elif source == SOURCES.header and arg:
+            headers[var] = arg
+        elif source == SOURCES.regex and arg:
+            try:
+                patterns[var] = re.compile(arg.encode())
+            except re.error as err:
+                raise InputError(value=arg, msg=f"invalid regex - {err}")
+        else:
+            raise InputError(
+                value=target,
+                msg="expected a JSON path, 'header:NAME' or 'regex:PATTERN'",
+            )
+    return Extraction(paths, headers, patterns)
@@ -0,0 +1,230 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass
+
+from restcli.exceptions import InputError
+from restcli.load import Histogram
+from restcli.utils import AttrMap
+
+__all__ = [
+    "HEDGE_PARAMS",
+    "SAFE_METHODS",
+    "HedgePolicy",
+    "Hedger",
+    "LatencyTracker",
+    "compile_hedge",
+    "send",
+]
+
+HEDGE_PARAMS = AttrMap(
+    ("percentile", (int, float)),
+    ("min_samples", int),
+    ("after", (int, float)),
+    ("max_hedges", int),
+)
+
+# Methods whose Requests can be sent twice at once without side effects.
+SAFE_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """When to send duplicates ("hedges") of a slow Request.
+
+    Attributes:
+        percentile: Send a hedge once the Request took longer than this
+            percentile of its past latencies.
+        min_samples: Latencies to see before hedging by ``percentile``.
+        after: Seconds to wait before hedging until ``min_samples``
+            latencies were seen. If None, Requests aren't hedged until then.
+        max_hedges: Most hedges to send for one Request. Each one is sent
+            after waiting as long again.
+    """
+
+    percentile: float = 95.0
+    min_samples: int = 20
+    after: float = None
+    max_hedges: int = 1
+
+
+def compile_hedge(spec):
+    """Validate a ``hedge`` block and compile it into a :class:`HedgePolicy`.
+
+    Args:
+        spec (dict): The ``hedge`` parameter of a Request.
+
+    Raises:
+        InputError: If the block is malformed.
+    """
+    for key, value in spec.items():
+        if key not in HEDGE_PARAMS:
+            raise InputError(value=key, msg="unexpected key in hedge")
+        if not isinstance(value, HEDGE_PARAMS[key]) or isinstance(
+            value, bool
+        ):
+            raise InputError(value=value, msg=f"invalid value for {key}")
+        if value < 0:
+            raise InputError(value=value, msg=f"{key} must not be negative")
+
+    if not 0 < spec.get("percentile", 50) <= 100:
+        raise InputError(
+            value=spec["percentile"], msg="percentile must be in (0, 100]"
+        )
+    if spec.get("max_hedges", 1) < 1:
+        raise InputError(
+            value=spec["max_hedges"], msg="need at least 1 hedge"
+        )
+    return HedgePolicy(**spec)
+
+
+class LatencyTracker:
+    """Latencies of past Requests, to pick how long to wait before hedging
+    them.
+
+    Only the latency of the first copy of each Request is counted, up to
+    its response headers, whether it won or not, so that hedging doesn't
+    skew the latencies it's based on. One tracker is shared by all threads
+    of a :class:`Requestor`.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Request key -> :class:`load.Histogram`
+        self.histograms = {}
+
+    def record(self, key, seconds):
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.record(seconds)
+
+    def delay(self, key, policy):
+        """Return the seconds to wait before hedging a Request, or None if
+        it shouldn't be hedged yet."""
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None or histogram.count < policy.min_samples:
+                return policy.after
+            return histogram.percentile(policy.percentile)
+
+
+def can_hedge(request_kwargs):
+    """Return whether a Request can be sent more than once at a time: its
+    method must be safe, and its body mustn't be a stream."""
+    body = request_kwargs.get("data")
+    return request_kwargs["method"].upper() in SAFE_METHODS and (
+        body is None or isinstance(body, (bytes, str))
+    )
+
+
+def send(request_kwargs, send_once, policy, tracker, key):
+    """Send a Request, and send hedges of it if it's slow.
+
+    The first response to arrive wins. The others are closed as soon as
+    they arrive, without reading their bodies; Requests in flight can't be
+    aborted. If a copy fails, no more hedges are sent, and the error is
+    raised unless another copy still succeeds.
+
+    Args:
+        request_kwargs: Kwargs for ``requests.request``. Hedges are sent
+            with copies of them.
+        send_once: Called with ``request_kwargs`` to send the Request once.
+        policy: The :class:`HedgePolicy`.
+        tracker: The :class:`LatencyTracker` to pick the delay with.
+        key: The Request's key in ``tracker``.
+
+    Returns:
+        A ``(response, hedges, won)`` tuple, where ``hedges`` is the number
+        of hedges sent, and ``won`` whether one of them won.
+    """
+
+    def send_first():
+        start = time.perf_counter()
+        response = send_once(request_kwargs)
+        tracker.record(key, time.perf_counter() - start)
+        return response
+
+    delay = tracker.delay(key, policy) if can_hedge(request_kwargs) else None
+    if delay is None:
+        return send_first(), 0, False
+
+    first = _spawn(send_first)
+    pending = {first}
+    hedges = 0
+    error = None
+    while pending:
+        hedging = error is None and hedges < policy.max_hedges
+        done, pending = wait(
+            pending,
+            timeout=delay if hedging else None,
+            return_when=FIRST_COMPLETED,
+        )
+        if not done:
+            hedges += 1
+            pending.add(_spawn(send_once, dict(request_kwargs)))
+            continue
+        for future in done:
+            if future.exception() is None:
+                for loser in pending:
+                    loser.add_done_callback(_close)
+                return future.result(), hedges, future is not first
+            error = error or future.exception()
+    raise error
+
+
+class Hedger:
+    """Sends a Request once, hedged as described by a :class:`HedgePolicy`.
+
+    It counts the hedges it sent, across calls, e.g. retries.
+
+    Args:
+        send_once: Called with the Request's kwargs to send it once.
+        policy: The :class:`HedgePolicy`.
+        tracker: The :class:`LatencyTracker` to pick the delay with.
+        key: The Request's key in ``tracker``.
+    """
+
+    def __init__(self, send_once, policy, tracker, key):
+        self.send_once = send_once
+        self.policy = policy
+        self.tracker = tracker
+        self.key = key
+        self.hedges = 0
+        # Whether a hedge won, the last time.
+        self.won = False
+
+    def __call__(self, request_kwargs):
+        response, hedges, self.won = send(
+            request_kwargs, self.send_once, self.policy, self.tracker, self.key
+        )
+        self.hedges += hedges
+        return response
+
+
+def _spawn(function, *args):
+    """Call a function in a new thread, and return a Future of its result.
+
+    Each copy of a Request gets its own thread, so hedges never wait for a
+    free worker of a pool, however many Requests are hedged at once.
+    """
+    future = Future()
+
+    def run():
+        future.set_running_or_notify_cancel()
+        try:
+            result = function(*args)
+        except BaseException as err:  # pylint: disable=broad-except
+            future.set_exception(err)
+        else:
+            future.set_result(result)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def _close(future):
+    """Close the response of a losing copy of a Request, once it arrives."""
+    if future.exception() is None:
+        future.result().close()
@@ -0,0 +1,158 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from restcli.exceptions import InputError
+from restcli.utils import AttrSeq
+
+__all__ = ["JOB_STATES", "Job", "JobManager"]
+
+JOB_STATES = AttrSeq(
+    "queued",
+    "running",
+    "done",
+    "failed",
+    "cancelled",
+)
+
+
+class Job:
+    """A command running in the background.
+
+    Attributes:
+        id (int): The Job number, counting from 1.
+        description (str): The command the Job is running.
+        future (:class:`concurrent.futures.Future`): The Job's result.
+        submitted (float): When the Job was submitted.
+        started (float): When the Job started running, or None.
+        finished (float): When the Job finished, or None.
+    """
+
+    def __init__(self, job_id, description):
+        self.id = job_id
+        self.description = description
+        self.future = None
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+
+    def __call__(self, func, *args, **kwargs):
+        self.started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.finished = time.perf_counter()
+
+    @property
+    def state(self):
+        if self.future.cancelled():
+            return JOB_STATES.cancelled
+        if self.started is None:
+            return JOB_STATES.queued
+        if not self.future.done():
+            return JOB_STATES.running
+        if self.future.exception() is not None:
+            return JOB_STATES.failed
+        return JOB_STATES.done
+
+    @property
+    def elapsed(self):
+        """Seconds spent running so far, or in total once finished."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def result(self, timeout=None):
+        """Wait for the Job to finish and return its result.
+
+        Raises:
+            Whatever exception the Job raised.
+            concurrent.futures.TimeoutError: If ``timeout`` seconds pass
+                first.
+        """
+        return self.future.result(timeout)
+
+
+class JobManager:
+    """Run commands in the background on a shared pool of worker threads.
+
+    Workers are started on demand, so a JobManager that never runs a Job
+    costs nothing. Finished Jobs are kept until :meth:`clear` is called, so
+    their results can be collected later.
+
+    Args:
+        workers (optional): Maximum number of Jobs to run at once; more Jobs
+            wait in a queue.
+        notify (optional): Called with each Job when it finishes, from the
+            worker thread that ran it.
+    """
+
+    def __init__(self, workers=4, notify=None):
+        self.workers = workers
+        self.notify = notify
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, description, func, *args, **kwargs):
+        """Run ``func(*args, **kwargs)`` in the background.
+
+        Returns:
+            The new :class:`Job`.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="restcli-job"
+                )
+            job = Job(next(self._ids), description)
+            job.future = self._executor.submit(job, func, *args, **kwargs)
+            self.jobs[job.id] = job
+        if self.notify:
+            job.future.add_done_callback(lambda _: self.notify(job))
+        return job
+
+    def get(self, job_id):
+        """Look up a Job by its number.
+
+        Raises:
+            InputError: If there's no such Job.
+        """
+        try:
+            return self.jobs[int(job_id)]
+        except (KeyError, ValueError):
+            raise InputError(value=job_id, msg="no such job")
+
+    def latest(self):
+        """Return the most recently submitted Job, or None."""
+        if not self.jobs:
+            return None
+        return self.jobs[max(self.jobs)]
+
+    def clear(self):
+        """Forget all finished Jobs."""
+        with self._lock:
+            for job_id, job in list(self.jobs.items()):
+                if job.future.done():
+                    del self.jobs[job_id]
+
+    def counts(self):
+        """Count Jobs in each state, leaving out states with no Jobs."""
+        counts = dict.fromkeys(JOB_STATES, 0)
+        for job in list(self.jobs.values()):
+            counts[job.state] += 1
+        return {state: count for state, count in counts.items() if count}
+
+    def shutdown(self, wait=True):
+        """Stop the workers, cancelling queued Jobs unless ``wait`` is
+        True."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        if not wait:
+            for job in self.jobs.values():
+                job.future.cancel()
+        executor.shutdown(wait=wait)
@@ -0,0 +1,55 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+__all__ = ["BACKEND", "dumps", "dumpb", "loads"]
+
+# Name of the library doing the work.
+BACKEND = "orjson" if orjson else "json"
+
+
+def loads(data):
+    """Parse a JSON document from str or bytes.
+
+    Documents that orjson rejects, e.g. ones with integers beyond 64 bits,
+    are retried with the stdlib, which also gives the same error messages
+    whichever backend is in use.
+
+    Raises:
+        json.JSONDecodeError: If ``data`` isn't valid JSON.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def dumpb(obj, indent=None):
+    """Serialize ``obj`` to UTF-8 encoded JSON.
+
+    Key order is kept, including that of OrderedDicts. ``indent`` is either
+    None, for a single line, or 2.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, option=option)
+        except TypeError:
+            # Types orjson can't serialize; the stdlib may do better, or at
+            # least raise its usual error.
+            pass
+    return json.dumps(obj, indent=indent).encode()
+
+
+def dumps(obj, indent=None):
+    """Serialize ``obj`` to a JSON str, like :func:`dumpb`."""
+    if orjson is None:
+        return json.dumps(obj, indent=indent)
+    return dumpb(obj, indent).decode()
@@ -0,0 +1,97 @@
+import functools
+import re
+from collections.abc import Mapping
+
+from restcli.exceptions import InputError
+
+__all__ = ["MISSING", "compile_path", "fmt_path", "resolve"]
+
+# Stands in for values at paths that don't exist.
+MISSING = object()
+
+STEP_RE = re.compile(
+    r"""
+    \.(?P<name>[^.\[\]]+)                 # .name
+    | \[(?P<index>-?\d+)\]                # [0]
+    | \[(?P<quote>['"])                   # ['name'] or ["name"]
+        (?P<quoted>(?:(?!(?P=quote))[^\\]|\\.)*)
+        (?P=quote)\]
+    """,
+    re.VERBOSE,
+)
+ESCAPE_RE = re.compile(r"\\(.)")
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_path(path):
+    """Compile a JSON path into a tuple of keys and indices.
+
+    Paths are a subset of JSONPath: an optional ``$`` followed by any number
+    of ``.name``, ``[index]``, ``['name']`` or ``["name"]`` steps.
+
+    Args:
+        path (str): The path to compile.
+
+    Returns:
+        A tuple of steps, where each step is either a str (an object key) or
+        an int (an array index).
+
+    Raises:
+        InputError: If the path is malformed.
+
+    Examples:
+        >>> compile_path("$.conditions[0]['variable name']")
+        ('conditions', 0, 'variable name')
+    """
+    pos = 1 if path.startswith("$") else 0
+    steps = []
+    while pos < len(path):
+        match = STEP_RE.match(path, pos)
+        if not match:
+            raise InputError(
+                value=path, msg=f"invalid path syntax at position {pos}"
+            )
+        if match.group("name") is not None:
+            steps.append(match.group("name"))
+        elif match.group("index") is not None:
+            steps.append(int(match.group("index")))
+        else:
+            steps.append(ESCAPE_RE.sub(r"\1", match.group("quoted")))
+        pos = match.end()
+    return tuple(steps)
+
+
+def fmt_path(steps):
+    """Format a tuple of steps as a path string; the inverse of
+    ``compile_path``."""
+    text = "$"
+    for step in steps:
+        if isinstance(step, int):
+            text += f"[{step}]"
+        elif re.fullmatch(r"[^.\[\]'\"\\]+", step):
+            text += f".{step}"
+        else:
+            text += "['{}']".format(re.sub(r"(['\\])", r"\\\1", step))
+    return text
+
+
+def resolve(data, steps):
+    """Follow a compiled path through some decoded JSON.
+
+    Only objects are looked up by name, and only arrays by index, which may
+    be negative; strings aren't indexed into.
+
+    Returns:
+        The value at the path, or ``MISSING`` if the path doesn't exist.
+    """
+    for step in steps:
+        if isinstance(step, int):
+            if not isinstance(data, list):
+                return MISSING
+        elif not isinstance(data, Mapping):
+            return MISSING
+        try:
+            data = data[step]
+        except (KeyError, IndexError):
+            return MISSING
+    return data
@@ -0,0 +1,240 @@
+import itertools
+import json
+import re
+
+from restcli.jsonpath import MISSING, resolve
+
+__all__ = ["CHUNK_SIZE", "JsonStream", "find_paths"]
+
+# Minimum number of characters read from a document at once.
+CHUNK_SIZE = 64 * 1024
+
+
+class JsonStream:
+    """Read a JSON document piece by piece, without loading it whole.
+
+    Callers walk the structure of the document with ``expect`` and ``peek``,
+    and decode whole values with ``value`` or pass over them with ``skip``.
+    Only the value being decoded is held in memory.
+
+    Args:
+        handle: A text file object.
+        chunk_size (optional): Minimum number of characters to read at once.
+        object_pairs_hook (optional): Passed on to
+            :class:`json.JSONDecoder`.
+    """
+
+    WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+
+    def __init__(self, handle, chunk_size=CHUNK_SIZE, object_pairs_hook=None):
+        self.handle = handle
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder(object_pairs_hook=object_pairs_hook)
+
+    def fill(self):
+        """Read more of the document, dropping what was already consumed.
+
+        At least as much as is still buffered is read, so a value that has
+        to be decoded again after each read costs linear time overall.
+
+        Returns:
+            False if the end of the document was reached.
+        """
+        if self.eof:
+            return False
+        unread = len(self.buffer) - self.pos
+        data = self.handle.read(max(self.chunk_size, unread))
+        self.buffer = self.buffer[self.pos :] + data
+        self.pos = 0
+        if not data:
+            self.eof = True
+        return bool(data)
+
+    def peek(self):
+        """Skip whitespace and return the next character, or "" at the end
+        of the document."""
+        while True:
+            self.pos = self.WHITESPACE_RE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars):
+        """Consume the next character, which must be one of ``chars``."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(
+                f"expected one of {chars!r} but found {char or 'EOF'!r}"
+            )
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue after it.
+            if end == len(self.buffer) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip(self):
+        """Consume the next value, holding at most one of its elements in
+        memory at a time.
+
+        Arrays and objects are skipped one element (or member) at a time,
+        each of which is decoded and dropped. This is much faster than
+        scanning them character by character.
+        """
+        char = self.peek()
+        if char not in "[{":
+            self.value()
+            return
+        close = "]" if char == "[" else "}"
+        self.pos += 1
+        if self.peek() == close:
+            self.pos += 1
+            return
+        while True:
+            if char == "{":
+                self.value()
+                self.expect(":")
+            self.value()
+            if self.expect("," + close) == close:
+                return
+
+
+class _Found(Exception):
+    """Raised to stop reading once every path has been found."""
+
+
+class _PathNode:
+
+    __slots__ = ("paths", "children")
+
+    def __init__(self):
+        self.paths = []
+        self.children = {}
+
+
+def find_paths(handle, paths, chunk_size=CHUNK_SIZE):
+    """Find the values at some paths in a JSON document, reading as little
+    of it as possible.
+
+    Only the values that are found are decoded; everything else is skipped
+    over. Reading stops as soon as every path has been found. Paths with
+    negative indices need the whole array they index, which is decoded.
+
+    Args:
+        handle: A text file object with a JSON document.
+        paths: An iterable of compiled paths, as returned by
+            :func:`jsonpath.compile_path`.
+        chunk_size (optional): Minimum number of characters to read at once.
+
+    Returns:
+        A dict mapping each path that was found to its value.
+
+    Raises:
+        ValueError: If the document is malformed.
+    """
+    paths = set(paths)
+    root = _PathNode()
+    for path in paths:
+        node = root
+        for step in path:
+            node = node.children.setdefault(step, _PathNode())
+        node.paths.append(path)
+
+    finder = _PathFinder(JsonStream(handle, chunk_size), len(paths))
+    if paths:
+        try:
+            finder.walk(root)
+        except _Found:
+            pass
+    return finder.found
+
+
+class _PathFinder:
+    """Walks a JSON document along a tree of :class:`_PathNode`, for
+    :func:`find_paths`."""
+
+    def __init__(self, stream, remaining):
+        self.stream = stream
+        self.remaining = remaining
+        self.found = {}
+
+    def record(self, path, value):
+        if path not in self.found:
+            self.found[path] = value
+            self.remaining -= 1
+            if not self.remaining:
+                raise _Found
+
+    def record_all(self, node, value):
+        """Look up every path under ``node`` in an already decoded value."""
+        for path in node.paths:
+            self.record(path, value)
+        for step, child in node.children.items():
+            member = resolve(value, (step,))
+            if member is not MISSING:
+                self.record_all(child, member)
+
+    def walk(self, node):
+        """Find the paths under ``node`` in the next value."""
+        char = self.stream.peek()
+        from_end = char == "[" and any(
+            isinstance(step, int) and step < 0 for step in node.children
+        )
+        if node.paths or from_end:
+            self.record_all(node, self.stream.value())
+        elif char == "{":
+            self.walk_object(node)
+        elif char == "[":
+            self.walk_array(node)
+        else:
+            self.stream.skip()
+
+    def walk_object(self, node):
+        """Find the paths under ``node`` in the members of the next object,
+        skipping the members no path goes through."""
+        stream = self.stream
+        stream.pos += 1
+        if stream.peek() == "}":
+            stream.pos += 1
+            return
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            self.walk_member(node.children.get(key))
+            if stream.expect(",}") == "}":
+                return
+
+    def walk_array(self, node):
+        """Find the paths under ``node`` in the elements of the next array,
+        skipping the elements no path goes through."""
+        stream = self.stream
+        stream.pos += 1
+        if stream.peek() == "]":
+            stream.pos += 1
+            return
+        for index in itertools.count():
+            self.walk_member(node.children.get(index))
+            if stream.expect(",]") == "]":
+                return
+
+    def walk_member(self, child):
+        if child is None:
+            self.stream.skip()
+        else:
+            self.walk(child)
@@ -0,0 +1,309 @@
+import math
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+
+from restcli.reqmod import parser
+
+__all__ = ["Histogram", "LoadProfile", "LoadReport", "run_load"]
+
+# Percentiles shown in load reports.
+PERCENTILES = (50, 90, 99)
+
+
+class Histogram:
+    """A latency histogram that can be merged with others.
+
+    Latencies are counted in log-scaled buckets, each ``PRECISION`` wider
+    than the one before, so any percentile is accurate to within
+    ``PRECISION`` whatever the range of latencies, and histograms from
+    different threads or machines can be merged by adding up their buckets.
+    The count, sum, minimum and maximum are exact.
+    """
+
+    # Relative width of each bucket.
+    PRECISION = 0.01
+
+    # Buckets start at one microsecond; faster latencies share bucket 0.
+    UNIT = 1e-6
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def __len__(self):
+        return self.count
+
+    @classmethod
+    def bucket(cls, seconds):
+        """Return the index of the bucket a latency falls in."""
+        units = seconds / cls.UNIT
+        if units <= 1:
+            return 0
+        return math.ceil(math.log(units) / math.log1p(cls.PRECISION))
+
+    @classmethod
+    def bucket_limit(cls, index):
+        """Return the largest latency that falls in a bucket, in seconds."""
+        return (1 + cls.PRECISION) ** index * cls.UNIT
+
+    def record(self, seconds):
+        """Count a latency."""
+        self.buckets[self.bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        """Add the latencies counted by another Histogram to this one."""
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, percent):
+        """Return the latency that ``percent`` percent of latencies are at
+        most, or None if nothing was counted."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(max(self.bucket_limit(index), self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "buckets": {str(k): v for k, v in self.buckets.items()},
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.buckets.update(
+            {int(k): v for k, v in data["buckets"].items()}
+        )
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+
+@dataclass
+class LoadProfile:
+    """What a load run does.
+
+    The run stops once ``requests`` Requests were sent, or ``duration``
+    seconds passed, whichever comes first; at least one of them must be
+    given.
+
+    Attributes:
+        group: A Group name in the Collection.
+        request: A Request name in the Group.
+        modifiers: Modifiers to apply to every Request.
+        requests: Number of Requests to send.
+        duration: Number of seconds to send Requests for.
+        concurrency: Number of Requests to have in flight at once.
+    """
+
+    group: str
+    request: str
+    modifiers: tuple = ()
+    requests: int = None
+    duration: float = None
+    concurrency: int = 1
+
+    def split(self, parts):
+        """Split the profile between up to ``parts`` workers, each sending
+        its share of ``requests``.
+
+        Workers whose share would be no Requests at all get no profile, so
+        fewer than ``parts`` profiles are returned if ``requests`` is less
+        than ``parts``.
+        """
+        if self.requests is None:
+            return [self] * parts
+        share, extra = divmod(self.requests, parts)
+        return [
+            LoadProfile(
+                **{
+                    **asdict(self),
+                    "requests": share + (1 if i < extra else 0),
+                }
+            )
+            for i in range(min(parts, self.requests))
+        ]
+
+    def to_dict(self):
+        return {**asdict(self), "modifiers": list(self.modifiers)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{**data, "modifiers": tuple(data["modifiers"])})
+
+
+@dataclass
+class LoadReport:
+    """The outcome of a load run, possibly merged from several workers.
+
+    Attributes:
+        histogram: Latencies of the Requests that got a response.
+        statuses: Number of responses per status code.
+        errors: Number of Requests that failed, per error type.
+        hedges: Number of hedges sent, see :mod:`hedge`.
+        hedge_wins: Number of responses that were those of a hedge.
+        resolves: Number of Requests that resolved their host, through a
+            :class:`resolver.DNSCache`.
+        resolve_time: Seconds those Requests spent resolving.
+        elapsed: Seconds the (slowest) run took.
+        workers: Number of workers whose reports were merged.
+    """
+
+    histogram: Histogram = field(default_factory=Histogram)
+    statuses: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+    hedges: int = 0
+    hedge_wins: int = 0
+    resolves: int = 0
+    resolve_time: float = 0.0
+    elapsed: float = 0.0
+    workers: int = 1
+
+    @property
+    def count(self):
+        """Number of Requests sent, including failed ones."""
+        return self.histogram.count + sum(self.errors.values())
+
+    def merge(self, other):
+        """Add the results of another run, e.g. on another worker, that ran
+        at the same time."""
+        self.histogram.merge(other.histogram)
+        self.statuses.update(other.statuses)
+        self.errors.update(other.errors)
+        self.hedges += other.hedges
+        self.hedge_wins += other.hedge_wins
+        self.resolves += other.resolves
+        self.resolve_time += other.resolve_time
+        self.elapsed = max(self.elapsed, other.elapsed)
+        self.workers += other.workers
+        return self
+
+    def to_dict(self):
+        return {
+            "histogram": self.histogram.to_dict(),
+            # JSON object keys are always strings.
+            "statuses": {str(k): v for k, v in self.statuses.items()},
+            "errors": dict(self.errors),
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "resolves": self.resolves,
+            "resolve_time": self.resolve_time,
+            "elapsed": self.elapsed,
+            "workers": self.workers,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            histogram=Histogram.from_dict(data["histogram"]),
+            statuses=Counter({int(k): v for k, v in data["statuses"].items()}),
+            errors=Counter(data["errors"]),
+            hedges=data["hedges"],
+            hedge_wins=data["hedge_wins"],
+            resolves=data["resolves"],
+            resolve_time=data["resolve_time"],
+            elapsed=data["elapsed"],
+            workers=data["workers"],
+        )
+
+
+def run_load(requestor, profile):
+    """Send Requests as described by a :class:`LoadProfile`.
+
+    Each of ``profile.concurrency`` threads sends one Request after another,
+    counting into its own Histogram; they are merged at the end.
+
+    Args:
+        requestor: The :class:`Requestor` to send Requests with.
+        profile: The :class:`LoadProfile` to follow.
+
+    Returns:
+        A :class:`LoadReport`.
+    """
+    updater = parser.compile_modifiers(tuple(profile.modifiers))
+    tickets = (
+        iter(range(profile.requests)) if profile.requests is not None else None
+    )
+    lock = threading.Lock()
+    ready = threading.Barrier(profile.concurrency + 1)
+    reports = [LoadReport() for _ in range(profile.concurrency)]
+    deadline = None
+
+    def take_ticket():
+        if time.perf_counter() >= deadline:
+            return False
+        if tickets is None:
+            return True
+        with lock:
+            return next(tickets, None) is not None
+
+    def send(report):
+        ready.wait()
+        while take_ticket():
+            sent = time.perf_counter()
+            try:
+                response = requestor.request(
+                    profile.group, profile.request, updater
+                )
+            except Exception as err:  # pylint: disable=broad-except
+                report.errors[type(err).__name__] += 1
+                continue
+            report.histogram.record(time.perf_counter() - sent)
+            report.statuses[response.status_code] += 1
+            report.hedges += response.hedges
+            report.hedge_wins += response.hedge_won
+            if response.resolve_time:
+                report.resolves += 1
+                report.resolve_time += response.resolve_time
+
+    threads = [
+        threading.Thread(target=send, args=(report,), daemon=True)
+        for report in reports
+    ]
+    for thread in threads:
+        thread.start()
+    began = time.perf_counter()
+    deadline = began + profile.duration if profile.duration else math.inf
+    ready.wait()
+    for thread in threads:
+        thread.join()
+
+    # The threads' reports are parts of one run, on one worker.
+    report = LoadReport(workers=0)
+    for other in reports:
+        report.merge(other)
+    report.elapsed = time.perf_counter() - began
+    report.workers = 1
+    return report
@@ -0,0 +1,410 @@
+import asyncio
+import random
+import re
+from collections import ChainMap
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+import jinja2
+from yaml import YAMLError
+
+import restcli
+from restcli import json_utils, templates
+from restcli import yaml_utils as yaml
+from restcli.utils import LRUCache
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+__all__ = ["DEFAULT_PORT", "MockServer", "Reply", "Route", "path_pattern"]
+
+DEFAULT_PORT = 8000
+
+TAG_RE = re.compile(r"({{.*?}}|{%.*?%}|{#.*?#})", re.DOTALL)
+NAME_RE = re.compile(r"{{\s*([A-Za-z_]\w*)\s*}}")
+SCHEME_RE = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*://")
+
+# Response headers that describe the connection the response was recorded
+# on, rather than the response itself.
+HOP_HEADERS = frozenset(
+    ("connection", "keep-alive", "transfer-encoding", "content-length")
+)
+
+
+def path_pattern(url):
+    """Turn a templated Request URL into a regex that matches the paths it
+    can render to.
+
+    The origin, e.g. ``http://{{ host }}`` or a leading ``{{ server }}``,
+    and the query string are dropped. Each ``{{ expression }}`` matches one
+    path segment, or part of one; plain ``{{ name }}`` expressions capture
+    the segment in a group of that name.
+
+    Returns:
+        A ``(pattern, specificity)`` tuple, where ``specificity`` is the
+        number of literal characters in the path, so that routes can be
+        tried most specific first.
+    """
+    tokens = [token for token in TAG_RE.split(url) if token]
+    return _build_pattern(_strip_origin(_strip_query(tokens)))
+
+
+def _strip_query(tokens):
+    """Drop the query string and fragment from the tokens of a URL."""
+    for i, token in enumerate(tokens):
+        if TAG_RE.fullmatch(token):
+            continue
+        cut = min((token.find(c) for c in "?#" if c in token), default=-1)
+        if cut >= 0:
+            return tokens[:i] + [token[:cut]]
+    return tokens
+
+
+def _strip_origin(tokens):
+    """Drop the origin from the tokens of a URL, leaving its path."""
+    if not tokens:
+        return tokens
+    if TAG_RE.fullmatch(tokens[0]):
+        return tokens[1:]
+    if not SCHEME_RE.match(tokens[0]):
+        return tokens
+    tokens = [SCHEME_RE.sub("", tokens[0]), *tokens[1:]]
+    for i, token in enumerate(tokens):
+        if not TAG_RE.fullmatch(token) and "/" in token:
+            return [token[token.index("/") :]] + tokens[i + 1 :]
+    return []
+
+
+def _build_pattern(tokens):
+    """Build the ``(pattern, specificity)`` of the tokens of a URL path."""
+    parts = []
+    names = set()
+    specificity = 0
+    for token in tokens:
+        if not TAG_RE.fullmatch(token):
+            parts.append(re.escape(token))
+            specificity += len(token)
+            continue
+        match = NAME_RE.fullmatch(token)
+        if match and match.group(1) not in names:
+            names.add(match.group(1))
+            parts.append(f"(?P<{match.group(1)}>[^/]+)")
+        elif token.startswith("{{"):
+            parts.append("[^/]+")
+    path = "".join(parts)
+    if not path.startswith("/"):
+        path = "/" + path
+    return re.compile(path), specificity
+
+
+@dataclass
+class Reply:
+    """A response of the mock server."""
+
+    status: int = 200
+    headers: dict = field(default_factory=dict)
+    body: bytes = b""
+    latency: float = 0.0
+
+
+@dataclass
+class Route:
+    """A Request of the Collection, as served by the mock server."""
+
+    group: str
+    name: str
+    method: str
+    pattern: re.Pattern
+    specificity: int
+    mock: dict
+
+
+class MockServer:
+    """An HTTP server that answers the Requests of a Collection.
+
+    Each Request is served at its method and URL path, as matched by
+    :func:`path_pattern`. Responses are, in order of preference:
+
+    - The last response recorded in ``cassette`` for the same method, path
+      and query.
+    - The Request's ``mock`` response, whose ``body`` is rendered with the
+      Environment and the vars captured from the path, and sent as JSON.
+    - An empty ``200 OK``.
+
+    Other paths get ``404 Not Found``, or ``405 Method Not Allowed`` if a
+    Request matches them with another method, unless a response was
+    recorded for them.
+
+    The server runs on asyncio, so one process can keep thousands of
+    connections open; uvloop is used if it's installed.
+
+    Args:
+        collection: The :class:`workspace.Collection` to serve.
+        env (optional): Vars to render ``mock`` bodies with.
+        cassette (optional): A :class:`cassette.Cassette` to serve recorded
+            responses from.
+        latency (optional): Seconds to wait before each response, unless
+            the Request's ``mock`` sets its own ``latency``.
+        error_rate (optional): Fraction of responses to replace with
+            ``error_status``, unless the Request's ``mock`` sets its own
+            ``error_rate``.
+        error_status (optional): Status of injected errors.
+    """
+
+    # Maximum number of connections waiting to be accepted.
+    BACKLOG = 1024
+
+    # Maximum number of rendered ``mock`` bodies to keep.
+    RENDER_CACHE_SIZE = 1024
+
+    def __init__(
+        self,
+        collection,
+        env=None,
+        cassette=None,
+        latency=0.0,
+        error_rate=0.0,
+        error_status=503,
+    ):
+        self.env = env if env is not None else {}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.render_cache = LRUCache(self.RENDER_CACHE_SIZE)
+        self.routes = []
+        for group_name, group in collection.items():
+            for name, request in group.items():
+                pattern, specificity = path_pattern(request["url"])
+                self.routes.append(
+                    Route(
+                        group_name,
+                        name,
+                        request["method"].upper(),
+                        pattern,
+                        specificity,
+                        request.get("mock") or {},
+                    )
+                )
+        self.routes.sort(key=lambda route: -route.specificity)
+        self.recorded = self.load_recorded(cassette) if cassette else {}
+
+    @staticmethod
+    def load_recorded(cassette):
+        """Return the last Reply recorded for each method, path and query
+        in a :class:`cassette.Cassette`."""
+        entries = [
+            entry
+            for entries in cassette.load_index().values()
+            for entry in entries
+        ]
+        # Later recordings replace earlier ones.
+        entries.sort(key=lambda entry: entry["offset"])
+        recorded = {}
+        for entry in entries:
+            url = urlsplit(entry["url"])
+            target = url.path + (f"?{url.query}" if url.query else "")
+            headers = {
+                k: v
+                for k, v in entry["headers"]
+                if k.lower() not in HOP_HEADERS
+            }
+            with cassette.open_body(entry) as body:
+                recorded[entry["method"], target] = Reply(
+                    entry["status"], headers, body.read()
+                )
+        return recorded
+
+    def match(self, method, path):
+        """Find the Route for a request.
+
+        Returns:
+            A ``(route, params, status)`` tuple, where ``params`` holds the
+            vars captured from the path. If no Route matches, ``route`` is
+            None and ``status`` says why.
+        """
+        status = HTTPStatus.NOT_FOUND
+        for route in self.routes:
+            match = route.pattern.fullmatch(path)
+            if not match:
+                continue
+            if route.method == method:
+                return route, match.groupdict(), HTTPStatus.OK
+            status = HTTPStatus.METHOD_NOT_ALLOWED
+        return None, {}, status
+
+    def respond(self, method, target):
+        """Return the :class:`Reply` to a request for ``target``, which is a
+        path with an optional query string."""
+        method = method.upper()
+        path = target.partition("?")[0]
+        route, params, status = self.match(method, path)
+        mock = route.mock if route else {}
+
+        error_rate = mock.get("error_rate", self.error_rate)
+        if error_rate and random.random() < error_rate:
+            return self.error_reply(self.error_status, "injected error", mock)
+
+        reply = self.recorded.get((method, target))
+        if reply is None:
+            if route is None:
+                return self.error_reply(status, status.phrase, mock)
+            try:
+                body = self.render_body(route, params)
+            except (YAMLError, jinja2.TemplateError) as err:
+                return self.error_reply(
+                    HTTPStatus.INTERNAL_SERVER_ERROR, str(err), mock
+                )
+            reply = Reply(
+                status=mock.get("status", 200),
+                headers=dict(mock.get("headers", {})),
+                body=body,
+            )
+            if reply.body and not any(
+                k.lower() == "content-type" for k in reply.headers
+            ):
+                reply.headers["Content-Type"] = "application/json"
+        else:
+            reply = Reply(reply.status, reply.headers, reply.body)
+        reply.latency = mock.get("latency", self.latency)
+        return reply
+
+    def error_reply(self, status, message, mock):
+        return Reply(
+            status=status,
+            headers={"Content-Type": "application/json"},
+            body=json_utils.dumpb({"error": message}),
+            latency=mock.get("latency", self.latency),
+        )
+
+    def render_body(self, route, params):
+        """Render the ``mock`` body of a Route as JSON."""
+        source = route.mock.get("body")
+        if not source:
+            return b""
+        key = None
+        if templates.is_deterministic(source):
+            key = (id(route), tuple(sorted(params.items())))
+            body = self.render_cache.get(key)
+            if body is not None:
+                return body
+        data = yaml.load(templates.render(source, ChainMap(params, self.env)))
+        body = json_utils.dumpb(data)
+        if key:
+            self.render_cache.put(key, body)
+        return body
+
+    async def handle(self, reader, writer):
+        """Answer the requests on one connection, until either side closes
+        it."""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                    method, target, version, headers = self.parse_head(head)
+                except asyncio.LimitOverrunError:
+                    reply = self.error_reply(431, "headers too large", {})
+                    await self.send(writer, reply)
+                    break
+                except ValueError:
+                    reply = self.error_reply(400, "bad request", {})
+                    await self.send(writer, reply)
+                    break
+                await self.read_body(reader, headers)
+
+                connection = headers.get("connection", "").lower()
+                if version == "HTTP/1.0":
+                    keep_alive = connection == "keep-alive"
+                else:
+                    keep_alive = connection != "close"
+
+                reply = self.respond(method, target)
+                if reply.latency:
+                    await asyncio.sleep(reply.latency)
+                await self.send(
+                    writer, reply, keep_alive, head_only=method == "HEAD"
+                )
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def parse_head(head):
+        """Parse the request line and headers of a request.
+
+        Returns:
+            A ``(method, target, version, headers)`` tuple, with lowercase
+            header names.
+
+        Raises:
+            ValueError: If the request line is malformed.
+        """
+        request_line, *lines = head[:-4].decode("latin-1").split("\r\n")
+        method, target, version = request_line.split(" ")
+        headers = {}
+        for line in lines:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return method, target, version, headers
+
+    @staticmethod
+    async def read_body(reader, headers):
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if not size:
+                    # Skip any trailers.
+                    while (await reader.readline()).strip():
+                        pass
+                    return b"".join(chunks)
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+        length = int(headers.get("content-length") or 0)
+        return await reader.readexactly(length) if length else b""
+
+    @staticmethod
+    async def send(writer, reply, keep_alive=False, head_only=False):
+        try:
+            reason = HTTPStatus(reply.status).phrase
+        except ValueError:
+            reason = ""
+        lines = [f"HTTP/1.1 {reply.status} {reason}"]
+        if not any(k.lower() == "server" for k in reply.headers):
+            lines.append(f"Server: restcli/{restcli.__version__}")
+        if reply.status >= 200 and reply.status not in (204, 304):
+            lines.append(f"Content-Length: {len(reply.body)}")
+        if not keep_alive:
+            lines.append("Connection: close")
+        lines.extend(f"{k}: {v}" for k, v in reply.headers.items())
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        writer.write(head if head_only else head + reply.body)
+        await writer.drain()
+
+    async def serve(self, host, port, ready=None):
+        """Serve until cancelled.
+
+        Args:
+            host: Address to listen on.
+            port: Port to listen on. Port 0 picks a free port.
+            ready (optional): Called with the ``(host, port)`` the server
+                listens on, once it does.
+        """
+        server = await asyncio.start_server(
+            self.handle, host, port, backlog=self.BACKLOG
+        )
+        if ready:
+            ready(server.sockets[0].getsockname()[:2])
+        async with server:
+            await server.serve_forever()
+
+    def run(self, address, ready=None):
+        """Serve on a ``(host, port)`` address until interrupted."""
+        if uvloop:
+            uvloop.install()
+        asyncio.run(self.serve(*address, ready=ready))
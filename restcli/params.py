@@ -8,9 +8,36 @@ REQUEST_PARAMS = AttrMap(
     ("query", str),
     ("headers", dict),
     ("body", str),
+    ("body_file", str),
+    ("upload", dict),
+    ("compress", str),
+    ("compress_min_size", int),
     ("script", str),
+    ("output", str),
+    ("expect", dict),
+    ("extract", dict),
+    ("mock", dict),
+    ("retry", dict),
+    ("hedge", dict),
+    ("timeout", dict),
     *REQUIRED_REQUEST_PARAMS.items(),
 )
+UPLOAD_PARAMS = AttrMap(
+    ("chunked", bool),
+    ("multipart", str),
+    ("gzip", bool),
+)
+TIMEOUT_PARAMS = AttrMap(
+    ("connect", float),
+    ("read", float),
+)
+MOCK_PARAMS = AttrMap(
+    ("status", int),
+    ("headers", dict),
+    ("body", str),
+    ("latency", float),
+    ("error_rate", float),
+)
 CONFIG_PARAMS = AttrMap(
     ("defaults", dict),
     ("lib", list),
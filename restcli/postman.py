@@ -1,41 +1,158 @@
 import argparse
-import json
+import os
 import re
 import sys
 import warnings
 from collections import OrderedDict
 
+from restcli import json_utils
 from restcli import yaml_utils as yaml
+from restcli.jsonstream import JsonStream
+
+# Size of the chunks read from Postman exports.
+CHUNK_SIZE = 64 * 1024
+
+# Group for requests that aren't in any folder.
+DEFAULT_GROUP = "default"
+
+# Postman variables, e.g. "{{baseUrl}}".
+VAR_RE = re.compile(r"{{([^{}]+)}}")
+
+
+def iter_collection(handle, chunk_size=CHUNK_SIZE):
+    """Read the requests of a Postman collection, one at a time.
+
+    Folders are streamed rather than decoded whole, as long as their
+    "name" comes before their "item" list, as it does in Postman exports.
+
+    Args:
+        handle: A text file object with a Postman collection.
+        chunk_size (optional): Minimum number of characters to read at once.
+
+    Yields:
+        ``(path, request_info)`` for each request, where ``path`` is a tuple
+        of the names of its enclosing folders, and ``(path, None)`` after
+        the last request of each folder. Requests outside of any folder have
+        an empty ``path``.
+    """
+    stream = JsonStream(handle, chunk_size, object_pairs_hook=OrderedDict)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key == "item":
+            yield from _iter_items(stream, ())
+            yield (), None
+        else:
+            stream.value()
+        if stream.expect(",}") == "}":
+            return
+
+
+def _iter_items(stream, path):
+    stream.expect("[")
+    if stream.peek() == "]":
+        stream.pos += 1
+        return
+    while True:
+        yield from _iter_item(stream, path)
+        if stream.expect(",]") == "]":
+            return
+
+
+def _iter_item(stream, path):
+    stream.expect("{")
+    info = OrderedDict()
+    if stream.peek() == "}":
+        stream.pos += 1
+    else:
+        while True:
+            key = stream.value()
+            stream.expect(":")
+            if key == "item" and "name" in info:
+                folder = (*path, info["name"])
+                yield from _iter_items(stream, folder)
+                yield folder, None
+                info[key] = None
+            else:
+                info[key] = stream.value()
+            if stream.expect(",}") == "}":
+                break
+
+    if "item" not in info:
+        yield path, info
+    elif info["item"] is not None:
+        yield from _walk(info, path)
+
+
+def _walk(info, path):
+    """Like ``_iter_item``, for an item that was decoded whole."""
+    if "item" not in info:
+        yield path, info
+        return
+    folder = (*path, info.get("name", ""))
+    for item in info["item"]:
+        yield from _walk(item, folder)
+    yield folder, None
+
+
+def parse_collection(handle, write_group, chunk_size=CHUNK_SIZE):
+    """Convert a Postman collection into restcli Groups.
+
+    Nested folders become Groups named after the path to them, e.g.
+    "users/admin". Each Group is passed to ``write_group`` as soon as its
+    folder has been read, so only the Groups of the folders that are being
+    read are kept in memory.
+
+    Args:
+        handle: A text file object with a Postman collection.
+        write_group: A callable ``write_group(name, group)``.
+        chunk_size (optional): Minimum number of characters to read at once.
+    """
+    groups = {}
+    written = set()
+    for path, request_info in iter_collection(handle, chunk_size):
+        if request_info is not None:
+            group = groups.setdefault(path, OrderedDict())
+            request_name = normalize(request_info["name"])
+            if request_name in group:
+                warnings.warn(
+                    'duplicate request name "%s"; skipping' % request_name
+                )
+                continue
+            group[request_name] = parse_request(request_info)
+            continue
 
-
-def parse_collection(postman_collection):
-    collection = OrderedDict()
-    for folder_info in postman_collection["item"]:
-        group_name = normalize(folder_info["name"])
-        if group_name in collection:
+        group = groups.pop(path, None)
+        if not group:
+            continue
+        group_name = fmt_group_name(path)
+        if group_name in written:
             warnings.warn('duplicate group name "%s"; skipping' % group_name)
-        collection[group_name] = parse_group(folder_info["item"])
+            continue
+        written.add(group_name)
+        write_group(group_name, group)
 
-    return collection
 
+def fmt_group_name(path):
+    """Name the Group for a path of folder names."""
+    if not path:
+        return DEFAULT_GROUP
+    return "/".join(normalize(name).replace("/", "-") for name in path)
 
-def parse_group(folder_info):
-    group = OrderedDict()
-    for request_info in folder_info:
-        request_name = normalize(request_info["name"])
-        if request_name in group:
-            warnings.warn(
-                'duplicate request name "%s"; skipping' % request_name
-            )
-        if "item" in request_info:
-            warnings.warn(
-                "sub-folders in collections are not supported; "
-                'skipping folder "%s"' % request_name
-            )
-            continue
-        group[request_name] = parse_request(request_info)
 
-    return group
+def dump_group(group_name, group):
+    """Dump a Group as YAML, ready to be written to a Collection file."""
+    output = yaml.dump(OrderedDict([(group_name, group)]), indent=4)
+    output = re.sub(r"^([^\s].*)$", "\n\\1", output, flags=re.MULTILINE)
+    return fmt_vars(output)
+
+
+def fmt_vars(text):
+    """Convert Postman variables to Jinja2 variables, in one pass."""
+    return VAR_RE.sub(lambda match: "{{ %s }}" % match.group(1).lower(), text)
 
 
 def parse_request(request_info):
@@ -47,15 +164,17 @@ def parse_request(request_info):
         request["description"] = description
 
     request["method"] = r["method"].lower()
-    request["url"] = r["url"]
+    url = r["url"]
+    # Newer exports describe URLs as objects, with the original text in "raw".
+    request["url"] = url["raw"] if isinstance(url, dict) else url
 
-    header_info = r["header"]
+    header_info = r.get("header", [])
     headers = parse_headers(header_info)
     if headers:
         request["headers"] = headers
 
-    body_info = r["body"]
-    body = parse_body(body_info)
+    body_info = r.get("body")
+    body = parse_body(body_info) if body_info else None
     if body and body.strip() != "{}":
         request["body"] = body
 
@@ -75,7 +194,7 @@ def parse_body(body_info):
         if mode == "formdata":
             python_repr = parse_formdata(body)
         elif mode == "raw":
-            python_repr = json.loads(body)
+            python_repr = json_utils.loads(body)
         else:
             warnings.warn('unsupported body mode "%s"; skipping' % mode)
             return None
@@ -110,23 +229,66 @@ def normalize(text):
     return text
 
 
+def group_writer(outdir):
+    """Return a ``write_group`` for :func:`parse_collection` that writes
+    each Group to its own Collection file in ``outdir``, e.g. the Group
+    "users/admin" to ``users/admin.yaml``.
+
+    Raises:
+        ValueError: From ``write_group``, if a Group would be written outside
+            of ``outdir``, e.g. because a folder is named "..", or to the
+            same file as another Group.
+    """
+    root = os.path.realpath(outdir)
+    written = {}
+
+    def write_group(group_name, group):
+        path = os.path.join(root, *group_name.split("/")) + ".yaml"
+        path = os.path.realpath(path)
+        if os.path.commonpath((root, path)) != root:
+            raise ValueError(
+                f'group "{group_name}" would be written outside of {outdir}'
+            )
+        if path in written:
+            raise ValueError(
+                f'groups "{written[path]}" and "{group_name}" would both be'
+                f" written to {path}"
+            )
+        written[path] = group_name
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as handle:
+            handle.write("---" + dump_group(group_name, group))
+
+    return write_group
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("collection", type=open)
-    parser.add_argument(
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument(
         "-o", "--outfile", type=argparse.FileType("w"), default=sys.stdout
     )
+    output.add_argument(
+        "-d",
+        "--outdir",
+        help="write each group to its own Collection file in this directory",
+    )
     args = parser.parse_args()
 
-    postman_collection = json.load(args.collection)
-    collection = parse_collection(postman_collection)
+    if args.outdir:
+        write_group = group_writer(args.outdir)
+    else:
+        args.outfile.write("---\n")
 
-    output = yaml.dump(collection, indent=4)
-    output = re.sub(r"^([^\s].*)$", "\n\\1", output, flags=re.MULTILINE)
-    for var in re.findall(r"{{([^{}]+)}}", output):
-        output = output.replace("{{%s}}" % var, "{{ %s }}" % var.lower())
-    output = f"---\n{output}"
-    print(output, file=args.outfile)
+        def write_group(group_name, group):
+            args.outfile.write(dump_group(group_name, group))
+
+    with args.collection:
+        try:
+            parse_collection(args.collection, write_group)
+        except ValueError as err:
+            parser.error(str(err))
 
 
 if __name__ == "__main__":
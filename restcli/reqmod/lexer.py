@@ -1,10 +1,11 @@
-import argparse
+import functools
+import re
 import string
 from collections import namedtuple
 
 import click
 
-from restcli.utils import AttrSeq
+from restcli.utils import AttrMap, AttrSeq
 
 QUOTES = "\"'"
 ESCAPES = "\\"
@@ -15,32 +16,41 @@ ACTIONS = AttrSeq(
     "delete",
 )
 
-Lexeme = namedtuple("Lexeme", ["action", "value"])
-
-
-class ClickArgumentParser(argparse.ArgumentParser):
-    """Override `ArgumentParser#error()` to raise a `click.UsageError()`."""
-
-    def error(self, message):
-        raise click.UsageError(message)
+# Flags for each action, as accepted on the commandline.
+FLAGS = AttrMap(
+    ("-a", ACTIONS.append),
+    (f"--{ACTIONS.append}", ACTIONS.append),
+    ("-n", ACTIONS.assign),
+    (f"--{ACTIONS.assign}", ACTIONS.assign),
+    ("-d", ACTIONS.delete),
+    (f"--{ACTIONS.delete}", ACTIONS.delete),
+)
 
+# Args that look like negative numbers are never flags.
+NEGATIVE_NUMBER_RE = re.compile(r"^-\d+$|^-\d*\.\d+$")
 
-lexer = ClickArgumentParser(prog="lexer", add_help=False)
-lexer.add_argument("-a", f"--{ACTIONS.append}", action="append")
-lexer.add_argument("-n", f"--{ACTIONS.assign}", action="append")
-lexer.add_argument("-d", f"--{ACTIONS.delete}", action="append")
-lexer.add_argument("args", nargs="*")
+Lexeme = namedtuple("Lexeme", ["action", "value"])
 
 
 def lex(argv):
     """Lex an argv style sequence into a list of Lexemes.
 
+    Flags are parsed like ``argparse`` would parse them: values may be given
+    as a separate arg (``-a VALUE``), attached to a short flag (``-aVALUE``)
+    or after an equals sign (``--append=VALUE``), and long flags may be
+    abbreviated. Args after ``--`` are never treated as flags. Lexemes are
+    returned in the order they were given.
+
     Args:
         argv: An iterable of strings.
 
     Returns:
         [ Lexeme(action, value) , ... ]
 
+    Raises:
+        click.UsageError: If an unknown flag is given or a flag is missing
+            its value.
+
     Examples:
         >>> lex(('-a', 'foo:bar', '-d', 'baz==', 'a=b', 'x:=true'))
         [
@@ -50,20 +60,112 @@ def lex(argv):
             Lexeme(action='assign', value='x:=true'),
         ]
     """
-    opts = vars(lexer.parse_args(argv))
-    args = opts.pop("args")
-    # Lex flagged options
-    lexemes = [
-        Lexeme(action, val)
-        for action, values in opts.items()
-        if values is not None
-        for val in values
-    ]
-    # Lex short-form `ACTIONS.assign` args
-    lexemes.extend(Lexeme(ACTIONS.assign, token) for token in args)
+    lexemes = []
+    args = iter(argv or ())
+
+    for arg in args:
+        if arg == "--":
+            lexemes.extend(Lexeme(ACTIONS.assign, token) for token in args)
+            break
+
+        if not _is_flag(arg):
+            # Short-form `ACTIONS.assign` arg
+            lexemes.append(Lexeme(ACTIONS.assign, arg))
+            continue
+
+        flag, value = _match_flag(arg)
+        if value is None:
+            value = next(args, None)
+            if value is None or _is_flag(value):
+                raise click.UsageError(
+                    f"argument {_fmt_flag(flag)}: expected one argument"
+                )
+        lexemes.append(Lexeme(FLAGS[flag], value))
+
     return lexemes
 
 
+def _is_flag(arg):
+    """Return whether an arg should be parsed as a flag."""
+    return (
+        arg.startswith("-")
+        and arg != "-"
+        and not NEGATIVE_NUMBER_RE.match(arg)
+        and not (" " in arg and not _find_flag(arg))
+    )
+
+
+def _find_flag(arg):
+    """Find the flag an arg starts with.
+
+    Returns:
+        A tuple ``(flag, value)``, where ``value`` is None if it's not part
+        of ``arg``. If no flag matches, returns None.
+    """
+    if arg in FLAGS:
+        return arg, None
+
+    if "=" in arg:
+        flag, value = arg.split("=", 1)
+        if flag in FLAGS:
+            return flag, value
+
+    if arg.startswith("--"):
+        flag, sep, value = arg.partition("=")
+        matches = [name for name in FLAGS if name.startswith(flag)]
+        if len(matches) > 1:
+            raise click.UsageError(
+                f"ambiguous option: {flag} could match"
+                f" {', '.join(matches)}"
+            )
+        if matches:
+            return matches[0], value if sep else None
+    elif arg[:2] in FLAGS:
+        return arg[:2], arg[2:]
+
+    return None
+
+
+def _match_flag(arg):
+    """Like ``_find_flag``, but raise a ``click.UsageError`` on failure."""
+    match = _find_flag(arg)
+    if not match:
+        raise click.UsageError(f"unrecognized arguments: {arg}")
+    return match
+
+
+def _fmt_flag(flag):
+    """Format all spellings of a flag, e.g. "-a/--append"."""
+    return "/".join(name for name in FLAGS if FLAGS[name] == FLAGS[flag])
+
+
+@functools.lru_cache(maxsize=None)
+def _token_res(sep):
+    """Compile the regexes that split a string into tokenizer events.
+
+    Returns:
+        A dict mapping each quotation mark to the regex used inside quotes of
+        that kind, and None to the regex used outside of quotes.
+    """
+    escapes = re.escape(ESCAPES)
+    escape = f"(?P<escape>[{escapes}][\\s\\S]?)"
+    res = {
+        quote: re.compile(
+            f"{escape}|(?P<quote>{re.escape(quote)})"
+            f"|(?P<text>[^{escapes}{re.escape(quote)}]+)"
+        )
+        for quote in QUOTES
+    }
+    quotes = re.escape(QUOTES)
+    seps = re.escape(sep)
+    res[None] = re.compile(
+        f"{escape}|(?P<quote>[{quotes}])"
+        + (f"|(?P<sep>[{seps}]+)" if sep else "")
+        + f"|(?P<text>[^{escapes}{quotes}{seps}]+)"
+    )
+    return res
+
+
 def tokenize(s, sep=string.whitespace):
     """Split a string on whitespace.
 
@@ -73,6 +175,10 @@ def tokenize(s, sep=string.whitespace):
     Quotations can be present in a token if they are preceded by a backslash or
     contained within non-escaped quotations of a different kind.
 
+    The string is scanned once, in runs of characters rather than one
+    character at a time, so this takes linear time in the length of ``s``.
+    Quoted sections are consumed in as few steps as possible.
+
     Args:
         s (str) - The string to tokenize.
         sep (str) - Character(s) to use as separators. Defaults to whitespace.
@@ -84,39 +190,30 @@ def tokenize(s, sep=string.whitespace):
         >>> tokenize('"Hello world!" I\\ love \\\'Python programming!\\\'')
         ['Hello world!', 'I love', '\'Python', 'programming!\'']
     """
+    token_res = _token_res(sep)
     tokens = []
-    token = ""
+    parts = []
     current_quote = None
 
-    chars = iter(s)
-    char = next(chars, "")
+    pos = 0
+    while pos < len(s):
+        match = token_res[current_quote].match(s, pos)
+        pos = match.end()
+        kind = match.lastgroup
+        text = match.group()
 
-    while char:
         # Quotation marks begin or end a quoted section
-        if char in QUOTES:
-            if char == current_quote:
-                current_quote = None
-            elif not current_quote:
-                current_quote = char
-
-        # Backslash makes the following character literal
-        elif char in ESCAPES:
-            token += char
-            char = next(chars, "")
+        if kind == "quote":
+            current_quote = None if current_quote else text
 
         # Unless in quotes, whitespace is skipped and signifies the token end.
-        elif not current_quote and char in sep:
-            while char in sep:
-                char = next(chars, "")
-            tokens.append(token)
-            token = ""
-
-            # Since we stopped at the first non-whitespace character, it
-            # must be processed.
+        elif kind == "sep" and not current_quote:
+            tokens.append("".join(parts))
+            parts = []
             continue
 
-        token += char
-        char = next(chars, "")
+        # Backslashes and the characters they escape are kept as-is.
+        parts.append(text)
 
-    tokens.append(token)
+    tokens.append("".join(parts))
     return tokens
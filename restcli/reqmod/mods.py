@@ -1,13 +1,15 @@
 import abc
+import functools
 import json
 import re
-import string
 from urllib.parse import quote_plus
 
+from restcli import json_utils
 from restcli.exceptions import ReqModSyntaxError, ReqModValueError
-from restcli.utils import AttrMap, AttrSeq, classproperty, is_ascii
+from restcli.utils import AttrMap, AttrSeq, is_ascii
 
 PARAM_TYPES = AttrSeq(
+    "body_file",
     "json_field",
     "str_field",
     "header",
@@ -15,15 +17,24 @@ PARAM_TYPES = AttrSeq(
 )
 
 
+@functools.lru_cache(maxsize=1024)
 def parse_mod(mod_str):
-    """Attempt to parse a str into a Mod."""
-    for mod_cls in MODS.values():
-        try:
-            mod = mod_cls.match(mod_str)
-        except ReqModSyntaxError:
-            continue
-        return mod
-    raise ReqModSyntaxError(value=mod_str)
+    """Attempt to parse a str into a Mod.
+
+    The string is scanned once for the earliest unescaped delimiter, and the
+    Mod class for that delimiter is used. Where delimiters overlap, the most
+    specific one wins, e.g. ``:=`` over ``:``.
+
+    Results are memoized, so Mods must be treated as immutable.
+    """
+    if mod_str.startswith(BodyFileMod.delimiter):
+        return BodyFileMod.match(mod_str)
+
+    match = DELIMITER_RE.search(mod_str)
+    if not match:
+        raise ReqModSyntaxError(value=mod_str)
+    mod_cls = MODS[match.group()]
+    return mod_cls(key=mod_str[: match.start()], value=mod_str[match.end() :])
 
 
 class Mod(metaclass=abc.ABCMeta):
@@ -33,9 +44,6 @@ class Mod(metaclass=abc.ABCMeta):
     delimiter = NotImplemented
 
     _types = None
-    _pattern: re.Pattern = None
-
-    split_re_tpl = string.Template(r"(?<=[^\\])${delimiter}")
 
     def __init__(self, key, value):
         self.key, self.value = self.clean_params(key, value)
@@ -52,26 +60,24 @@ class Mod(metaclass=abc.ABCMeta):
     def clean_params(cls, key, value):
         """Validate and format the Mod's key and/or value."""
 
+
+class BodyFileMod(Mod):
+    """Sends the Request body from a file, e.g. ``@path/to/file.bin``."""
+
+    param_type = PARAM_TYPES.body_file
+    param = None
+    delimiter = "@"
+
     @classmethod
     def match(cls, mod_str):
-        """Create a new Mod by matching syntax."""
-        # pylint: disable=no-member
-        parts = cls.pattern.split(mod_str, maxsplit=1)
-        if len(parts) != 2:
-            # TODO: add info about proper syntax in error msg
+        """Create a new Mod from a ``@``-prefixed file path."""
+        if not mod_str.startswith(cls.delimiter):
             raise ReqModSyntaxError(value=mod_str)
-        key, value = parts
-        return cls(key=key, value=value)
-
-    @classproperty
-    # pylint: disable=no-self-argument
-    def pattern(cls) -> re.Pattern:
-        if not cls._pattern:
-            re_str = cls.split_re_tpl.substitute(
-                delimiter=re.escape(cls.delimiter)
-            )
-            cls._pattern = re.compile(re_str)
-        return cls._pattern
+        return cls(key="body_file", value=mod_str[len(cls.delimiter) :])
+
+    @classmethod
+    def clean_params(cls, key, value):
+        return key, value
 
 
 class JsonFieldMod(Mod):
@@ -83,7 +89,7 @@ class JsonFieldMod(Mod):
     @classmethod
     def clean_params(cls, key, value):
         try:
-            json_value = json.loads(value)
+            json_value = json_utils.loads(value)
         except json.JSONDecodeError as err:
             # TODO: implement error handling
             raise ReqModValueError(value=value, msg=f"invalid JSON - {err}")
@@ -129,11 +135,14 @@ class UrlParamMod(Mod):
         return quote_plus(key), quote_plus(value)
 
 
-# Tuple of Mod classes, in order of specificity of delimiters
+# Tuple of Mod classes, in order of specificity of delimiters. BodyFileMod
+# comes first since it matches a prefix, and file paths may contain any of
+# the other delimiters.
 MODS = AttrMap(
     *(
         (mod_cls.delimiter, mod_cls)
         for mod_cls in (
+            BodyFileMod,
             JsonFieldMod,
             UrlParamMod,
             HeaderMod,
@@ -141,3 +150,18 @@ MODS = AttrMap(
         )
     )
 )
+
+# Matches the earliest unescaped delimiter of any Mod in MODS, preferring
+# longer delimiters where they overlap.
+DELIMITER_RE = re.compile(
+    r"(?<=[^\\])(?:{})".format(
+        "|".join(
+            re.escape(delimiter)
+            for delimiter in sorted(
+                (d for d in MODS if d != BodyFileMod.delimiter),
+                key=len,
+                reverse=True,
+            )
+        )
+    )
+)
@@ -1,5 +1,8 @@
+import functools
+
+from restcli.reqmod import lexer
 from restcli.reqmod.mods import parse_mod
-from restcli.reqmod.updater import UPDATERS, Updates
+from restcli.reqmod.updater import UPDATERS, CompiledUpdates, Updates
 
 
 def parse(lexemes):
@@ -25,6 +28,22 @@ def parse(lexemes):
     return updates
 
 
+@functools.lru_cache(maxsize=128)
+def compile_modifiers(modifiers):
+    """Lex, parse and compile a sequence of commandline modifiers.
+
+    Results are memoized, so running the same modifiers again, e.g. from
+    each line of an ``exec`` file, costs a dict lookup.
+
+    Args:
+        modifiers (tuple): Modifier args, as given on the commandline.
+
+    Returns:
+        A CompiledUpdates object that can be used to update Requests.
+    """
+    return CompiledUpdates(parse(lexer.lex(modifiers)))
+
+
 examples = [
     # Set a header (:)
     """Authorization:'JWT abc123\'""",
@@ -1,14 +1,25 @@
 import abc
-from dataclasses import dataclass
+from copy import deepcopy
+from dataclasses import dataclass, field
 from typing import Dict, List, Union
 
-from restcli.exceptions import ReqModKeyError, ReqModValueError
+from restcli import jsonpath
+from restcli.exceptions import (
+    InputError,
+    ReqModError,
+    ReqModKeyError,
+    ReqModSyntaxError,
+    ReqModValueError,
+)
 from restcli.utils import AttrMap
 
 JsonValue = Union[
     str, bool, int, float, List["JsonValue"], Dict[str, "JsonValue"]
 ]
 
+# Request Parameters whose keys may be paths to nested fields.
+PATH_PARAMS = ("body",)
+
 
 class Updates(list):
     """Simple list wrapper that provides update utilities."""
@@ -16,11 +27,176 @@ class Updates(list):
     def apply(self, request):
         """Apply all updates to a Request object.
 
+        Updaters are arranged into tries by path, so that updaters sharing a
+        prefix are applied in a single traversal of the Request. The result
+        is the same as applying each updater in turn.
+
         Args:
             request (object): The Request object to update.
         """
+        for trie in self.batches():
+            trie.apply(request)
+
+    def batches(self):
+        """Split the updaters into PathTries that can each be applied in one
+        traversal.
+
+        A new batch is started whenever an updater can't be reordered with
+        the updaters before it, e.g. when it targets an ancestor of a path
+        that an earlier updater changed.
+        """
+        batches = [PathTrie()]
         for updater in self:
-            updater(request)
+            if not batches[-1].insert(updater.path, updater):
+                batches.append(PathTrie())
+                batches[-1].insert(updater.path, updater)
+        return batches
+
+
+class CompiledUpdates:
+    """Updates that are checked and arranged once, then applied to any
+    number of Requests.
+
+    Updaters are grouped into PathTries up front, rooted at the Request and
+    branching on the Request Parameter first, so each application is a
+    single traversal of the parts of the Request that change. Instances are
+    never modified after they are created, so they can be shared freely,
+    e.g. across threads.
+
+    Args:
+        updaters: An iterable of updaters, in the order they should apply.
+
+    Raises:
+        ReqModError: If one updater would undo or break another one.
+    """
+
+    def __init__(self, updaters=()):
+        self.updaters = tuple(updaters)
+        self.check_conflicts()
+        self.batches = tuple(Updates(self.updaters).batches())
+
+    def __len__(self):
+        return len(self.updaters)
+
+    def __iter__(self):
+        return iter(self.updaters)
+
+    def apply(self, request):
+        """Apply all updates to a Request object."""
+        for trie in self.batches:
+            trie.apply(request)
+
+    def check_conflicts(self):
+        """Reject updaters that would undo or break each other.
+
+        An assign or append that is followed by a deletion of the same field,
+        or of an object containing it, would have no effect. An append that
+        follows a deletion of the same field would always fail. Paths that
+        contain array indices are not checked, since deleting array elements
+        shifts the indices of the elements after them.
+        """
+        last = {}
+        for updater in self.updaters:
+            path = updater.path
+            if any(isinstance(step, int) for step in path):
+                continue
+
+            if isinstance(updater, DeleteUpdater):
+                for other_path, other in last.items():
+                    if other_path[: len(path)] == path and not isinstance(
+                        other, DeleteUpdater
+                    ):
+                        raise ReqModError(
+                            value=other.key,
+                            msg=f"overridden by deletion of '{updater.key}'",
+                        )
+            elif isinstance(updater, AppendUpdater) and isinstance(
+                last.get(path), DeleteUpdater
+            ):
+                raise ReqModError(
+                    value=updater.key, msg="appends to a deleted field"
+                )
+
+            # Only the most recent updater of a path, and the paths it
+            # covers, matter from here on.
+            for other_path in list(last):
+                if other_path[: len(path)] == path:
+                    del last[other_path]
+            last[path] = updater
+
+
+class PathTrie:
+    """A trie of updaters, keyed by the steps of their paths.
+
+    The updaters at each node are applied before descending into its
+    children, so updaters may only be added to a node that has no children
+    yet. That way no updater changes a container that an earlier updater in
+    the same trie still has to reach.
+    """
+
+    def __init__(self):
+        self.children = {}
+        self.updaters = []
+
+    def insert(self, path, updater):
+        """Add an updater at the given path.
+
+        Returns:
+            False if the updater conflicts with one already in the trie, in
+            which case the trie is left unchanged; True otherwise.
+        """
+        node = self
+        for i, step in enumerate(path):
+            if node.shifts_index(step, updater, path[i:]):
+                return False
+            if step not in node.children:
+                break
+            node = node.children[step]
+        else:
+            if node.children:
+                return False
+            node.updaters.append(updater)
+            return True
+
+        for step in path[i:]:
+            node = node.children.setdefault(step, PathTrie())
+        node.updaters.append(updater)
+        return True
+
+    def shifts_index(self, step, updater, rest):
+        """Return whether adding an updater under ``step`` would reorder it
+        with a deletion that shifts the indices of its siblings."""
+        if not isinstance(step, int):
+            return False
+        siblings = [key for key in self.children if key != step]
+        if len(rest) == 1 and isinstance(updater, DeleteUpdater):
+            return any(isinstance(key, int) for key in siblings)
+        return any(
+            isinstance(key, int)
+            and any(
+                isinstance(sibling, DeleteUpdater)
+                for sibling in self.children[key].updaters
+            )
+            for key in siblings
+        )
+
+    def apply(self, container):
+        """Apply every updater in the trie to a container."""
+        for step, node in self.children.items():
+            for updater in node.updaters:
+                updater.apply(container, step)
+            if node.children:
+                try:
+                    child = container[step]
+                except (KeyError, IndexError, TypeError):
+                    raise ReqModKeyError(value=node.first_key())
+                node.apply(child)
+
+    def first_key(self):
+        """Return the key of the first updater in the trie."""
+        if self.updaters:
+            return self.updaters[0].key
+        return next(iter(self.children.values())).first_key()
 
 
 @dataclass
@@ -28,17 +204,36 @@ class BaseUpdater(metaclass=abc.ABCMeta):
     """Base class for callable objects that update Request Parameters.
 
     Args:
-        request_param (str): The name of the Request Parameter to update.
+        request_param (str): The name of the Request Parameter to update. If
+            None, ``key`` names a Request Parameter to update as a whole.
         key (str): The key that will be updated within the Request Parameter.
+            In the Request body, keys that start with "." are paths to nested
+            fields, e.g. ``.conditions[0].variable``.
         value: The new value.
 
     Notes:
         Child classes must implement the ``update_request`` method.
+
+        Updaters may be applied many times, so they must not hand out
+        references to ``value`` that the Request could later mutate.
     """
 
     request_param: str
     key: str
     value: JsonValue
+    path: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        if self.request_param in PATH_PARAMS and self.key.startswith("."):
+            try:
+                steps = jsonpath.compile_path(self.key)
+            except InputError as exc:
+                raise ReqModSyntaxError(value=self.key, msg=exc.msg)
+        else:
+            steps = (self.key,)
+        if self.request_param is not None:
+            steps = (self.request_param,) + steps
+        self.path = steps
 
     def __call__(self, request):
         """Update a Request.
@@ -47,24 +242,30 @@ class BaseUpdater(metaclass=abc.ABCMeta):
 
         Args:
             request (dict): The Request object.
-
-        Returns:
-            The updated value.
         """
-        current_request_param = request[self.request_param]
+        container = jsonpath.resolve(request, self.path[:-1])
+        if container is jsonpath.MISSING:
+            raise ReqModKeyError(value=self.key)
+        self.apply(container, self.path[-1])
+
+    def apply(self, container, key):
+        """Update ``container[key]``, raising Request Modifier errors on
+        failure."""
         try:
-            self.update_request(current_request_param)
-        except KeyError:
+            self.update_request(container, key)
+        except (KeyError, IndexError):
             raise ReqModKeyError(value=self.key)
         except (TypeError, ValueError):
             raise ReqModValueError(value=self.value)
 
     @abc.abstractmethod
-    def update_request(self, param_value):
-        """Update a Request Parameter.
+    def update_request(self, container, key):
+        """Update a field of a Request Parameter.
 
         Args:
-            param_value: The value of the Request Parameter to update.
+            container: The object that holds the field, e.g. the value of the
+                Request Parameter or a nested object within it.
+            key: The key or index of the field within ``container``.
 
         Notes:
             Child classes must implement this method.
@@ -74,22 +275,22 @@ class BaseUpdater(metaclass=abc.ABCMeta):
 class AppendUpdater(BaseUpdater):
     """Appends a value to a Request Parameter field."""
 
-    def update_request(self, param_value):
-        param_value[self.key] += self.value
+    def update_request(self, container, key):
+        container[key] += deepcopy(self.value)
 
 
 class AssignUpdater(BaseUpdater):
     """Sets a new value in a Request Parameter field."""
 
-    def update_request(self, param_value):
-        param_value[self.key] = self.value
+    def update_request(self, container, key):
+        container[key] = deepcopy(self.value)
 
 
 class DeleteUpdater(BaseUpdater):
     """Deletes a field in a Request Parameter."""
 
-    def update_request(self, param_value):
-        del param_value[self.key]
+    def update_request(self, container, key):
+        del container[key]
 
 
 UPDATERS = AttrMap(
@@ -1,99 +1,529 @@
+import os
 import re
-from contextlib import contextmanager
+import time
+from collections.abc import Hashable
+from copy import deepcopy
+from urllib.parse import urlsplit
 
 import jinja2
 import requests
+from urllib3.exceptions import ReadTimeoutError
 
+from restcli import (
+    compression,
+    hedge,
+    json_utils,
+    resolver,
+    retry,
+    streams,
+    templates,
+)
 from restcli import yaml_utils as yaml
-from restcli.exceptions import InputError
-from restcli.workspace import Collection, Environment
+from restcli.exceptions import DeadlineError, InputError, RequestTimeoutError
+from restcli.response import Response
+from restcli.utils import LRUCache
+from restcli.workspace import Collection, EnvOverlay, open_env
 
 __all__ = ["Requestor"]
 
 ENV_RE = re.compile(r"([^:]+):(.*)")
 
+# Request Parameters that are rendered into the kwargs of a request.
+RENDERED_PARAMS = (
+    "method",
+    "url",
+    "query",
+    "headers",
+    "body",
+    "body_file",
+    "upload",
+)
+
 
 class Requestor:
     """Parser and executor of requests."""
 
+    # Maximum number of rendered Requests to keep in ``render_cache``.
+    RENDER_CACHE_SIZE = 256
+
     def __init__(self, collection_file, env_file=None):
         self.collection = Collection(collection_file)
-        self.env = Environment(env_file)
+        self.env = open_env(env_file)
+        self.render_cache = LRUCache(self.RENDER_CACHE_SIZE)
+        # A :class:`cassette.Cassette` to record Requests into, or replay
+        # them from, if set.
+        self.cassette = None
+        self.breaker = retry.CircuitBreaker()
+        self.latencies = hedge.LatencyTracker()
+        # A :class:`resolver.DNSCache` to resolve hosts through, if set.
+        self.dns_cache = None
+        self.dns_adapter = None
+        # A ``time.time()`` after which Requests fail with
+        # :class:`DeadlineError` instead of being sent, if set.
+        self.deadline = None
+
+    def request(
+        self,
+        group,
+        name,
+        updater=None,
+        *env_args,
+        output_file=None,
+        progress=None,
+        env=None,
+        render=None,
+    ):
+        """Execute the Request found at ``self.collection[group][name]``.
+
+        Returns a :class:`response.Response`, which decodes the body lazily
+        and at most once. If ``output_file`` is given, or the Request has an
+        ``output`` parameter, the body is streamed to that file instead of
+        being read into memory.
+
+        ``env`` and ``render`` replace ``self.env`` and ``self.render`` for
+        this Request, e.g. to run it in an overlay of the Environment.
+        Unless ``render`` is given, the rendered Request is cached in
+        ``self.render_cache``; see :meth:`render_key`.
 
-    def request(self, group, name, updater=None, *env_args):
-        """Execute the Request found at ``self.collection[group][name]``."""
+        The Request is sent as described by :meth:`send_with_policies`, then
+        its ``expect`` and ``extract`` blocks and its script are run against
+        the Response; see :meth:`apply_checks` and :meth:`run_request_script`.
+        """
+        self.check_deadline()
         request = self.collection[group][name]
+        if env is None:
+            env = self.env
+        cache = None if render else self.render_cache
+        render = render or self.render
 
-        with self.override_env(env_args):
-            request_kwargs = self.prepare_request(request, self.env, updater)
+        request_env = self.overlay_env(env, env_args)
+        request_kwargs = self.prepare_request(
+            request, request_env, updater, render, cache
+        )
+        if not output_file and request.get("output"):
+            output_file = render(request["output"], request_env)
 
-        response = requests.request(**request_kwargs)
+        headers = request_kwargs["headers"]
+        if not any(k.lower() == "accept-encoding" for k in headers):
+            headers["Accept-Encoding"] = compression.accept_encoding()
+        self.encode_json_body(request_kwargs)
 
-        script = request.get("script")
-        if script:
-            script_locals = {"response": response, "env": self.env}
-            if self.collection.libs:
-                for lib in self.collection.libs.values():
-                    script_locals.update(lib.define(response, self.env))
-            self.run_script(script, script_locals)
+        response = self.send_with_policies(
+            (group, name), request_kwargs, output_file, progress
+        )
+        self.apply_checks((group, name), response, env)
+        self.run_request_script(request, response, env)
+        return response
+
+    def send_with_policies(
+        self, key, request_kwargs, output_file=None, progress=None
+    ):
+        """Send a prepared Request, and read its response into a
+        :class:`response.Response`.
+
+        The Request is hedged as described by its :class:`hedge.HedgePolicy`
+        if it has one, unless ``self.cassette`` is set, and retried as
+        described by its :class:`retry.RetryPolicy` if it has one, failing
+        at once while ``self.breaker`` holds its host's circuit open. The
+        number of attempts and hedges, and the seconds spent resolving the
+        host through ``self.dns_cache``, are stored on the Response.
 
+        Args:
+            key: The Request's ``(group, name)``.
+            request_kwargs: Kwargs for ``requests.request``.
+            output_file (optional): Stream the body to this file.
+            progress (optional): Called to report download progress.
+
+        Raises:
+            RequestTimeoutError: If the Request timed out.
+        """
+        send_once = self.send
+        hedge_policy = self.collection.hedge_policies.get(key)
+        if hedge_policy and not self.cassette:
+            send_once = hedge.Hedger(
+                self.send, hedge_policy, self.latencies, key
+            )
+        policy = self.collection.retry_policies.get(key)
+        attempts = 1
+        try:
+            if policy:
+                raw_response, attempts = retry.send(
+                    request_kwargs,
+                    send_once,
+                    policy,
+                    self.breaker,
+                    self.sleep,
+                )
+            else:
+                raw_response = send_once(request_kwargs)
+            response = self.read_response(raw_response, output_file, progress)
+        except (requests.Timeout, ReadTimeoutError) as err:
+            raise self.timeout_error(request_kwargs, err) from err
+
+        response.attempts = attempts
+        if self.dns_cache:
+            response.resolve_time = getattr(raw_response, "resolve_time", 0.0)
+        if isinstance(send_once, hedge.Hedger):
+            response.hedges = send_once.hedges
+            response.hedge_won = send_once.won
         return response
 
+    @staticmethod
+    def read_response(raw_response, output_file=None, progress=None):
+        """Read a streamed ``requests.Response`` into a
+        :class:`response.Response`, through :class:`streams.BodyReader`.
+
+        The :class:`streams.Transfer` summarizing the body is stored on the
+        Response as ``response.transfer``. If ``output_file`` is given, the
+        body is streamed to it instead, and the :class:`streams.Download` is
+        also stored as ``response.download``.
+        """
+        if output_file:
+            download = streams.save_response(
+                raw_response, output_file, progress=progress
+            )
+            return Response(raw_response, download, download)
+        transfer = streams.read_response(raw_response)
+        return Response(raw_response, transfer)
+
+    @staticmethod
+    def timeout_error(request_kwargs, err):
+        """Describe the timeout of a Request as a
+        :class:`RequestTimeoutError`."""
+        connect, read = request_kwargs["timeout"]
+        if isinstance(err, requests.ConnectTimeout):
+            phase, timeout = "connect", connect
+        else:
+            phase, timeout = "read", read
+        return RequestTimeoutError(
+            request_kwargs["method"].upper(),
+            request_kwargs["url"],
+            phase,
+            timeout,
+        )
+
+    def apply_checks(self, key, response, env):
+        """Run the ``expect`` and ``extract`` blocks of the Request at
+        ``key`` against its Response.
+
+        The :class:`checks.CheckResult` objects of the checks are stored on
+        the Response as ``response.expectations``. Then the extracted values
+        are set in ``env``, and stored as ``response.extracted``.
+        """
+        expectations = self.collection.expectations.get(key)
+        if expectations:
+            response.expectations = expectations.evaluate(response)
+        extraction = self.collection.extractions.get(key)
+        if extraction:
+            response.extracted = extraction.evaluate(response)
+            env.update(response.extracted)
+
+    def run_request_script(self, request, response, env):
+        """Run the script of a Request, if it has one, with its Response,
+        the Environment and the Collection's libs as context."""
+        script = request.get("script")
+        if not script:
+            return
+        script_locals = {"response": response, "env": env}
+        for lib in (self.collection.libs or {}).values():
+            script_locals.update(lib.define(response, env))
+        self.run_script(script, script_locals)
+
+    def send(self, request_kwargs):
+        """Send a prepared Request once, and return the streamed
+        ``requests.Response``.
+
+        Its ``timeout`` is capped to the time left until ``self.deadline``,
+        in place, so retries are capped too.
+        """
+        self.cap_timeout(request_kwargs)
+        if self.cassette:
+            with self.cassette.session() as session:
+                return session.request(stream=True, **request_kwargs)
+        if self.dns_cache:
+            self.dns_cache.take_elapsed()
+            session = self.dns_session()
+            response = session.request(stream=True, **request_kwargs)
+            response.resolve_time = self.dns_cache.take_elapsed()
+            return response
+        return requests.request(stream=True, **request_kwargs)
+
+    def dns_session(self):
+        """Return a ``requests.Session`` that resolves hosts through
+        ``self.dns_cache``.
+
+        Each Request gets a new Session, like with ``requests.request``, so
+        cookies don't carry over, but they share one
+        :class:`resolver.ResolvingAdapter`, which keeps connections alive.
+        """
+        adapter = self.dns_adapter
+        if adapter is None or adapter.resolver is not self.dns_cache:
+            adapter = self.dns_adapter = resolver.ResolvingAdapter(
+                self.dns_cache
+            )
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def collection_hosts(self):
+        """Return the hosts of the Collection's URLs, as rendered with the
+        Environment. URLs that can't be rendered are skipped."""
+        hosts = set()
+        for group in self.collection.values():
+            for request in group.values():
+                try:
+                    url = self.render(request["url"], self.env)
+                    host = urlsplit(url).hostname
+                except (jinja2.TemplateError, ValueError):
+                    continue
+                if host:
+                    hosts.add(host)
+        return hosts
+
+    def check_deadline(self):
+        """Raise :class:`DeadlineError` if ``self.deadline`` passed, and
+        return the seconds left until it otherwise, or None if it's unset.
+        """
+        if self.deadline is None:
+            return None
+        remaining = self.deadline - time.time()
+        if remaining <= 0:
+            raise DeadlineError()
+        return remaining
+
+    def sleep(self, seconds):
+        """Wait between the attempts of a Request, unless that would run
+        past ``self.deadline``.
+
+        Raises:
+            DeadlineError: If the wait would end after the deadline.
+        """
+        remaining = self.check_deadline()
+        if remaining is not None and seconds >= remaining:
+            raise DeadlineError()
+        time.sleep(seconds)
+
+    def cap_timeout(self, request_kwargs):
+        """Set the ``(connect, read)`` timeout of some Request kwargs, capped
+        to the time left until ``self.deadline``."""
+        connect, read = request_kwargs.get("timeout") or (None, None)
+        remaining = self.check_deadline()
+        if remaining is not None:
+            connect = remaining if connect is None else min(connect, remaining)
+            read = remaining if read is None else min(read, remaining)
+        request_kwargs["timeout"] = (connect, read)
+
     @classmethod
-    def prepare_request(cls, request, env, updater=None):
-        """Prepare a Request to be executed."""
-        request = {
-            k: request.get(k)
-            for k in ("method", "url", "query", "headers", "body")
-        }
-        kwargs = cls.parse_request(request, env, updater)
+    def prepare_request(
+        cls, request, env, updater=None, render=None, cache=None
+    ):
+        """Prepare a Request to be executed.
+
+        If a ``cache`` is given, e.g. an :class:`utils.LRUCache`, the
+        rendered Request is looked up there before rendering it, and stored
+        there after.
+        """
+        compress = request.get("compress")
+        compress_min_size = request.get("compress_min_size") or 0
+        key = None if cache is None else cls.render_key(request, env, updater)
+        cached = cache.get(key) if key else None
+        if cached:
+            kwargs = deepcopy(cached[1])
+        else:
+            kwargs = cls.parse_request(
+                {k: request.get(k) for k in RENDERED_PARAMS},
+                env,
+                updater,
+                render,
+            )
+            if key:
+                # Keep the Request alive, so its id isn't reused.
+                cache.put(key, (request, deepcopy(kwargs)))
 
         kwargs["json"] = kwargs.pop("body")
         kwargs["params"] = kwargs.pop("query")
 
+        body_file = kwargs.pop("body_file", None)
+        upload = kwargs.pop("upload") or {}
+        if body_file:
+            cls.attach_file(kwargs, body_file, upload)
+        if compress:
+            cls.compress_body(kwargs, compress, compress_min_size)
+
+        timeout = request.get("timeout")
+        if timeout:
+            kwargs["timeout"] = (timeout.get("connect"), timeout.get("read"))
+
         return kwargs
 
+    @staticmethod
+    def render_key(request, env, updater=None):
+        """Return the key under which a rendered Request is cached.
+
+        The key changes whenever the Request is run with other modifiers,
+        or any var that its templates read changes, according to
+        ``env.versions``. Reloading the Collection gives each Request a new
+        key too.
+
+        Returns:
+            A hashable key, or None if the Request mustn't be cached, e.g.
+            because its templates use random filters, or the vars they read
+            hold mutable values.
+        """
+        versions = getattr(env, "versions", None)
+        if versions is None or not isinstance(updater, Hashable):
+            return None
+
+        sources = [request.get(k) for k in ("url", "query", "body")]
+        sources.append(request.get("body_file"))
+        sources.extend((request.get("headers") or {}).values())
+        names = set()
+        for source in sources:
+            if not source:
+                continue
+            if not isinstance(source, str):
+                return None
+            if not templates.is_deterministic(source):
+                return None
+            names |= templates.template_vars(source)
+
+        token = versions(frozenset(names))
+        if token is None:
+            return None
+        return (id(request), token, updater)
+
     @classmethod
-    def parse_request(cls, request, env, updater=None):
-        """Parse a Request object in the context of an Environment."""
+    def attach_file(cls, kwargs, path, upload):
+        """Replace the body of some Request kwargs with a streamed file."""
+        if not os.path.isfile(path):
+            raise InputError(value=path, msg="body file not found")
+
+        upload = dict(upload)
+        if upload.pop("gzip", False):
+            upload["encoding"] = "gzip"
+        body = streams.FileBody(path, **upload)
+        kwargs["headers"] = cls.merge_headers(
+            kwargs["headers"], body.default_headers, body.headers
+        )
+        kwargs["data"] = body
+        kwargs["json"] = None
+
+    @classmethod
+    def compress_body(cls, kwargs, encoding, min_size=0):
+        """Compress the body of some Request kwargs.
+
+        Bodies smaller than ``min_size`` bytes are sent uncompressed.
+        """
+        body = kwargs.get("data")
+        if isinstance(body, streams.FileBody):
+            if not body.encoding and os.path.getsize(body.path) >= min_size:
+                body.encoding = encoding
+                kwargs["headers"] = cls.merge_headers(
+                    kwargs["headers"], overrides=body.headers
+                )
+            return
+
+        if kwargs["json"] is None or kwargs["json"] == {}:
+            return
+        data = json_utils.dumpb(kwargs["json"])
+        if len(data) < min_size:
+            return
+
+        kwargs["headers"] = cls.merge_headers(
+            kwargs["headers"],
+            {"Content-Type": "application/json"},
+            {"Content-Encoding": encoding},
+        )
+        kwargs["data"] = compression.compress(data, encoding)
+        kwargs["json"] = None
+
+    @classmethod
+    def encode_json_body(cls, kwargs):
+        """Encode the JSON body of some Request kwargs, if any.
+
+        This is what ``requests`` does with its ``json`` argument, except
+        that it goes through :mod:`json_utils`, so it's fast if orjson is
+        installed.
+        """
+        if kwargs.get("data") is not None or kwargs.get("json") is None:
+            return
+        kwargs["headers"] = cls.merge_headers(
+            kwargs["headers"], {"Content-Type": "application/json"}
+        )
+        kwargs["data"] = json_utils.dumpb(kwargs["json"])
+        kwargs["json"] = None
+
+    @staticmethod
+    def merge_headers(headers, defaults=None, overrides=None):
+        """Merge headers, comparing names case-insensitively.
+
+        Args:
+            headers: The Request's headers.
+            defaults (optional): Headers to add unless already present.
+            overrides (optional): Headers that replace any existing ones.
+
+        Returns:
+            A new dict of headers.
+        """
+        merged = {}
+        for name, value in (defaults or {}).items():
+            if not any(k.lower() == name.lower() for k in headers):
+                merged[name] = value
+        for name, value in headers.items():
+            if not any(k.lower() == name.lower() for k in overrides or {}):
+                merged[name] = value
+        merged.update(overrides or {})
+        return merged
+
+    @classmethod
+    def parse_request(cls, request, env, updater=None, render=None):
+        """Parse a Request object in the context of an Environment.
+
+        Templates are rendered with ``render(source, env)``, which defaults
+        to ``cls.render``.
+        """
+        render = render or cls.render
         kwargs = {
             **request,
             "method": request["method"],
-            "url": cls.interpolate(request["url"], env),
+            "url": cls.interpolate(request["url"], env, render),
             "query": {},
             "headers": {},
             "body": {},
+            "body_file": "",
         }
 
         body = request.get("body")
         if body:
-            kwargs["body"] = cls.interpolate(body, env)
+            kwargs["body"] = cls.interpolate(body, env, render)
         headers = request.get("headers")
         if headers:
             kwargs["headers"] = {
-                k: cls.interpolate(v, env) for k, v in headers.items()
+                k: cls.interpolate(v, env, render)
+                for k, v in headers.items()
             }
         query = request.get("query")
         if query:
-            kwargs["query"] = cls.interpolate(query, env)
+            kwargs["query"] = cls.interpolate(query, env, render)
+        body_file = request.get("body_file")
+        if body_file:
+            kwargs["body_file"] = render(body_file, env)
 
         if updater:
             updater.apply(kwargs)
 
         return kwargs
 
-    @contextmanager
-    def override_env(self, env_args):
-        """Temporarily modify an Environment with the given overrides.
+    def overlay_env(self, env, env_args):
+        """Return a view of an Environment with the given overrides.
 
-        On exit, the Env is returned to its previous state.
+        The Environment itself is left unchanged.
         """
-        original = self.env.data
-        self.mod_env(env_args)
-
-        yield
-
-        self.env.replace(original)
+        if not env_args:
+            return env
+        set_env, del_env = self.parse_env_args(*env_args)
+        return EnvOverlay(env, set_env, del_env)
 
     def mod_env(self, env_args, save=False):
         """Modify an Environment with the given overrides."""
@@ -132,12 +562,15 @@ class Requestor:
             set_env[key.strip()] = yaml.load(val)
         return set_env, del_env
 
-    @staticmethod
-    def interpolate(data, env):
+    @classmethod
+    def interpolate(cls, data, env, render=None):
         """Given some ``data``, render it with the given ``env``."""
-        tpl = jinja2.Template(data)
-        rendered = tpl.render(env)
-        return yaml.load(rendered)
+        return yaml.load((render or cls.render)(data, env))
+
+    @staticmethod
+    def render(data, env):
+        """Render a template string with the given ``env``."""
+        return templates.render(data, env)
 
     @staticmethod
     def run_script(script, script_locals):
@@ -0,0 +1,252 @@
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool, PoolManager
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.exceptions import NewConnectionError
+
+try:
+    import dns.exception
+    import dns.resolver
+except ImportError:
+    dns = None
+
+__all__ = ["DEFAULT_TTL", "DNSCache", "ResolvingAdapter"]
+
+# Seconds to cache addresses for, when their TTL isn't known.
+DEFAULT_TTL = 60.0
+
+# Most hosts to resolve at once when prefetching.
+PREFETCH_WORKERS = 16
+
+
+class DNSCache:
+    """An in-process cache of host addresses, shared by all threads.
+
+    Addresses are cached for the TTL of their DNS records, if dnspython is
+    installed; otherwise they're looked up with the system resolver, which
+    doesn't tell TTLs, and cached for ``ttl`` seconds. Hosts that dnspython
+    can't resolve, e.g. ones in ``/etc/hosts``, fall back to the system
+    resolver too. Failed lookups aren't cached.
+
+    Like :class:`utils.LRUCache`, it counts its ``hits`` and ``misses``. The
+    seconds each thread spent resolving are added up, until they're taken
+    with :meth:`take_elapsed`.
+
+    Args:
+        ttl (optional): Seconds to cache addresses whose TTL isn't known.
+        clock (optional): Returns the current time in seconds.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        # host -> (addresses, time they expire)
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.local = threading.local()
+
+    def resolve(self, host):
+        """Return the addresses of a host, as ``(family, address)`` tuples.
+
+        Raises:
+            socket.gaierror: If the host can't be resolved.
+        """
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            pass
+        else:
+            if address.version == 6:
+                return [(socket.AF_INET6, host)]
+            return [(socket.AF_INET, host)]
+
+        host = host.lower()
+        with self.lock:
+            entry = self.entries.get(host)
+            if entry and entry[1] > self.clock():
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        start = time.perf_counter()
+        try:
+            addresses, ttl = self.lookup(host)
+        finally:
+            self.local.elapsed = (
+                getattr(self.local, "elapsed", 0.0)
+                + time.perf_counter()
+                - start
+            )
+        if ttl > 0:
+            with self.lock:
+                self.entries[host] = (addresses, self.clock() + ttl)
+        return addresses
+
+    def lookup(self, host):
+        """Look up the addresses of a host, bypassing the cache.
+
+        Returns:
+            An ``(addresses, ttl)`` tuple.
+        """
+        if dns:
+            addresses = []
+            ttls = []
+            for family, rdtype in (
+                (socket.AF_INET, "A"),
+                (socket.AF_INET6, "AAAA"),
+            ):
+                try:
+                    answer = dns.resolver.resolve(host, rdtype)
+                except dns.exception.DNSException:
+                    continue
+                addresses.extend((family, r.address) for r in answer)
+                ttls.append(answer.rrset.ttl)
+            if addresses:
+                return addresses, min(ttls)
+
+        infos = socket.getaddrinfo(
+            host, None, proto=socket.IPPROTO_TCP, type=socket.SOCK_STREAM
+        )
+        addresses = []
+        for family, _, _, _, sockaddr in infos:
+            if (family, sockaddr[0]) not in addresses:
+                addresses.append((family, sockaddr[0]))
+        return addresses, self.ttl
+
+    def prefetch(self, hosts):
+        """Resolve some hosts ahead of time, concurrently.
+
+        Returns:
+            A dict of the hosts that couldn't be resolved, and why.
+        """
+        hosts = set(hosts)
+        if not hosts:
+            return {}
+        errors = {}
+
+        def resolve(host):
+            try:
+                self.resolve(host)
+            except OSError as err:
+                errors[host] = err
+
+        workers = min(PREFETCH_WORKERS, len(hosts))
+        with ThreadPoolExecutor(workers) as executor:
+            list(executor.map(resolve, hosts))
+        return errors
+
+    def take_elapsed(self):
+        """Return the seconds the current thread spent resolving since the
+        last call, and start counting again."""
+        elapsed = getattr(self.local, "elapsed", 0.0)
+        self.local.elapsed = 0.0
+        return elapsed
+
+
+class ResolvingConnectionMixin:
+    """Makes a urllib3 connection look up its host in a :class:`DNSCache`.
+
+    Only the socket connects to the cached addresses; the Host header, and
+    the SNI and certificate checks of HTTPS, still use the host name.
+    """
+
+    def __init__(self, *args, resolver=None, **kwargs):
+        self.resolver = resolver
+        super().__init__(*args, **kwargs)
+
+    def _new_conn(self):
+        if self.resolver is None:
+            return super()._new_conn()
+        host = self._dns_host
+        try:
+            addresses = self.resolver.resolve(host)
+        except OSError as err:
+            raise NewConnectionError(
+                self, f"Failed to establish a new connection: {err}"
+            ) from err
+
+        error = None
+        try:
+            # Try each address, like ``socket.create_connection`` does.
+            for _, address in addresses:
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except NewConnectionError as err:
+                    error = err
+        finally:
+            self._dns_host = host
+        raise error
+
+
+class ResolvingHTTPConnection(ResolvingConnectionMixin, HTTPConnection):
+    pass
+
+
+class ResolvingHTTPSConnection(ResolvingConnectionMixin, HTTPSConnection):
+    pass
+
+
+class ResolvingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = ResolvingHTTPConnection
+
+
+class ResolvingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = ResolvingHTTPSConnection
+
+
+class ResolvingPoolManager(PoolManager):
+    """A urllib3 PoolManager whose connections resolve hosts through a
+    :class:`DNSCache`."""
+
+    def __init__(self, resolver, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.resolver = resolver
+        self.pool_classes_by_scheme = {
+            "http": ResolvingHTTPConnectionPool,
+            "https": ResolvingHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super()._new_pool(scheme, host, port, request_context)
+        # Not passed in ``connection_pool_kw``, which must only hold the
+        # keys that pools are looked up by.
+        pool.conn_kw["resolver"] = self.resolver
+        return pool
+
+
+class ResolvingAdapter(HTTPAdapter):
+    """A transport adapter for ``requests`` that resolves hosts through a
+    :class:`DNSCache`.
+
+    Unlike the adapters of a one-off ``requests.request``, it's meant to be
+    shared, so its connections are kept alive and reused between Requests
+    to the same host.
+    """
+
+    def __init__(self, resolver, **kwargs):
+        self.resolver = resolver
+        super().__init__(**kwargs)
+
+    def init_poolmanager(
+        self, connections, maxsize, block=False, **pool_kwargs
+    ):
+        # pylint: disable=attribute-defined-outside-init
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = ResolvingPoolManager(
+            self.resolver,
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            strict=True,
+            **pool_kwargs,
+        )
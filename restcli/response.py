@@ -0,0 +1,125 @@
+import codecs
+import json
+from functools import cached_property
+
+from restcli import json_utils
+
+__all__ = ["Response"]
+
+# Stands in for a JSON body that hasn't been decoded yet.
+_UNDECODED = object()
+
+
+class Response:
+    """An HTTP response whose body is decoded lazily, and at most once.
+
+    Output formatting, ``expect`` and ``extract`` blocks, scripts and libs
+    all share one Response, so however many of them read ``text`` or call
+    ``json()``, the body is only decoded once. The parsed JSON is shared
+    too, so it shouldn't be modified.
+
+    Attributes that aren't defined here, like ``status_code``, ``headers``
+    and ``raw``, are read from the wrapped :class:`requests.Response`.
+
+    Args:
+        response: The :class:`requests.Response`, with its body read.
+        transfer (optional): The :class:`streams.Transfer` that read it.
+        download (optional): The :class:`streams.Download`, if the body was
+            saved to a file instead.
+
+    Attributes:
+        expectations: :class:`checks.CheckResult` objects for the Request's
+            ``expect`` block, if any.
+        extracted (dict): Values extracted by the Request's ``extract``
+            block, if any.
+        attempts (int): Times the Request was sent, including retries.
+        hedges (int): Hedges sent for the Request, i.e. duplicates sent
+            because it was slow.
+        hedge_won (bool): Whether the response is that of a hedge.
+        resolve_time (float): Seconds spent resolving the host, if it was
+            resolved through a :class:`resolver.DNSCache`.
+    """
+
+    def __init__(self, response, transfer=None, download=None):
+        self.response = response
+        self.transfer = transfer
+        self.download = download
+        self.expectations = None
+        self.extracted = None
+        self.attempts = 1
+        self.hedges = 0
+        self.hedge_won = False
+        self.resolve_time = 0.0
+        self._json = _UNDECODED
+
+    def __getattr__(self, name):
+        if name == "response":
+            # Not set yet, e.g. while being copied.
+            raise AttributeError(name)
+        return getattr(self.response, name)
+
+    def __repr__(self):
+        return f"<Response [{self.status_code}]>"
+
+    @property
+    def content(self):
+        """The body as bytes."""
+        return self.response.content
+
+    @cached_property
+    def encoding(self):
+        """The encoding of the body.
+
+        Taken from the Content-Type header if given. Otherwise, JSON bodies
+        are UTF-8, as the JSON spec requires, and only other bodies fall back
+        to the (slow) detection done by ``requests``.
+        """
+        encoding = self.response.encoding
+        if encoding:
+            return encoding
+        content_type = self.headers.get("Content-Type", "")
+        if "json" in content_type.split(";")[0]:
+            return "utf-8"
+        return self.response.apparent_encoding
+
+    @cached_property
+    def text(self):
+        """The body as text."""
+        content = self.content
+        if not content:
+            return ""
+        try:
+            return str(content, self.encoding or "utf-8", errors="replace")
+        except LookupError:
+            return str(content, "utf-8", errors="replace")
+
+    def json(self):
+        """The body parsed as JSON.
+
+        Raises:
+            json.JSONDecodeError: If the body isn't valid JSON.
+        """
+        if self._json is _UNDECODED:
+            try:
+                try:
+                    self._json = json_utils.loads(self._json_source())
+                except UnicodeDecodeError:
+                    self._json = json_utils.loads(self.text)
+            except json.JSONDecodeError as err:
+                self._json = err
+        if isinstance(self._json, json.JSONDecodeError):
+            raise self._json
+        return self._json
+
+    def _json_source(self):
+        # UTF-8 bytes can be parsed directly, without decoding them to text.
+        if "text" not in vars(self) and self._is_utf8(self.encoding):
+            return self.content
+        return self.text
+
+    @staticmethod
+    def _is_utf8(encoding):
+        try:
+            return codecs.lookup(encoding).name == "utf-8"
+        except (LookupError, TypeError):
+            return False
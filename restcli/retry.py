@@ -0,0 +1,278 @@
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from restcli.exceptions import CircuitOpenError, InputError
+from restcli.utils import AttrMap
+
+__all__ = [
+    "IDEMPOTENT_METHODS",
+    "RETRY_ERRORS",
+    "RETRY_PARAMS",
+    "CircuitBreaker",
+    "RetryPolicy",
+    "compile_retry",
+    "parse_retry_after",
+    "send",
+]
+
+RETRY_PARAMS = AttrMap(
+    ("attempts", int),
+    ("backoff", (int, float)),
+    ("max_backoff", (int, float)),
+    ("statuses", list),
+    ("errors", list),
+    ("any_method", bool),
+    ("breaker_threshold", int),
+    ("breaker_cooldown", (int, float)),
+)
+
+# Exceptions that can be retried, by the names used in ``retry.errors``.
+RETRY_ERRORS = AttrMap(
+    ("connection", requests.ConnectionError),
+    ("timeout", requests.Timeout),
+)
+
+# Methods that can safely be sent more than once.
+IDEMPOTENT_METHODS = frozenset(
+    ("GET", "HEAD", "OPTIONS", "TRACE", "PUT", "DELETE")
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How to retry a Request, and when to stop sending it at all.
+
+    Attributes:
+        attempts: Most times to send the Request, including the first.
+        backoff: Seconds to wait, at most, before the first retry. The most
+            to wait doubles with each retry; the actual wait is a random
+            fraction of it ("full jitter").
+        max_backoff: Most seconds to wait before a retry, including waits
+            asked for with ``Retry-After``.
+        statuses: Response statuses to retry.
+        errors: Names of ``RETRY_ERRORS`` to retry.
+        any_method: Also retry methods that aren't idempotent, like POST.
+        breaker_threshold: Failed Requests in a row, to the same host, after
+            which Requests to that host fail at once. 0 disables this.
+        breaker_cooldown: Seconds to fail at once for, before one Request
+            is let through to see if the host recovered.
+    """
+
+    attempts: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    statuses: tuple = (429, 502, 503, 504)
+    errors: tuple = ("connection", "timeout")
+    any_method: bool = False
+    breaker_threshold: int = 5
+    breaker_cooldown: float = 30.0
+
+    @property
+    def exceptions(self):
+        return tuple(RETRY_ERRORS[name] for name in self.errors)
+
+    def can_retry(self, method):
+        return self.any_method or method.upper() in IDEMPOTENT_METHODS
+
+    def delay(self, retry, retry_after=None):
+        """Return the seconds to wait before the ``retry``-th retry."""
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        limit = min(self.backoff * 2 ** (retry - 1), self.max_backoff)
+        return random.uniform(0, limit)
+
+
+def compile_retry(spec):
+    """Validate a ``retry`` block and compile it into a
+    :class:`RetryPolicy`.
+
+    Args:
+        spec (dict): The ``retry`` parameter of a Request.
+
+    Raises:
+        InputError: If the block is malformed.
+    """
+    for key, value in spec.items():
+        if key not in RETRY_PARAMS:
+            raise InputError(value=key, msg="unexpected key in retry")
+        type_ = RETRY_PARAMS[key]
+        if not isinstance(value, type_) or (
+            isinstance(value, bool) and type_ is not bool
+        ):
+            raise InputError(value=value, msg=f"invalid value for {key}")
+        if type_ is not list and type_ is not bool and value < 0:
+            raise InputError(value=value, msg=f"{key} must not be negative")
+
+    if spec.get("attempts", 1) < 1:
+        raise InputError(value=spec["attempts"], msg="need at least 1 attempt")
+    statuses = spec.get("statuses", ())
+    if not all(isinstance(s, int) for s in statuses):
+        raise InputError(value=statuses, msg="status codes must be ints")
+    errors = spec.get("errors", ())
+    for name in errors:
+        if name not in RETRY_ERRORS:
+            raise InputError(
+                value=name,
+                msg="unknown error; expected one of:"
+                f" {', '.join(RETRY_ERRORS)}",
+            )
+    return RetryPolicy(
+        **{
+            key: tuple(value) if isinstance(value, list) else value
+            for key, value in spec.items()
+        }
+    )
+
+
+def parse_retry_after(value, now=None):
+    """Parse a ``Retry-After`` header into seconds to wait, or None if it's
+    malformed."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    now = time.time() if now is None else now
+    return max(when.timestamp() - now, 0.0)
+
+
+class CircuitBreaker:
+    """Tracks which hosts keep failing, so Requests to them can fail at once
+    instead of piling up.
+
+    A host's circuit opens after ``policy.breaker_threshold`` Requests in a
+    row failed, i.e. ended, after any retries, with an exception or status
+    that the :class:`RetryPolicy` retries.
+    While it's open, Requests to the host fail with
+    :class:`CircuitOpenError`. After ``policy.breaker_cooldown`` seconds, one
+    Request is let through, with its retries; if it succeeds the circuit
+    closes, if it fails it opens again, and if it ends with an error that
+    isn't retried, another Request is let through.
+
+    One breaker is shared by all threads of a :class:`Requestor`.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.lock = threading.Lock()
+        # host -> [failures in a row, time the circuit opened, trial sent]
+        self.hosts = {}
+
+    def before(self, host, policy):
+        """Check that a Request may be sent to a host.
+
+        Returns:
+            Whether the Request is the trial let through after the cooldown.
+            If it is, and its outcome isn't recorded, it must be released
+            with :meth:`release`.
+
+        Raises:
+            CircuitOpenError: If the host's circuit is open.
+        """
+        if not policy.breaker_threshold:
+            return False
+        with self.lock:
+            state = self.hosts.get(host)
+            if not state or state[0] < policy.breaker_threshold:
+                return False
+            failures, opened, trial = state
+            remaining = opened + policy.breaker_cooldown - self.clock()
+            if remaining <= 0 and not trial:
+                state[2] = True
+                return True
+        raise CircuitOpenError(
+            host,
+            f"{failures} failed Requests in a row;"
+            f" retrying in {max(remaining, 0):.1f}s",
+        )
+
+    def release(self, host):
+        """Let another trial through to a host, e.g. because the last one
+        ended with an error that says nothing about the host."""
+        with self.lock:
+            state = self.hosts.get(host)
+            if state:
+                state[2] = False
+
+    def record(self, host, policy, failed):
+        """Count the outcome of a Request to a host."""
+        if not policy.breaker_threshold:
+            return
+        with self.lock:
+            if not failed:
+                self.hosts.pop(host, None)
+                return
+            state = self.hosts.setdefault(host, [0, None, False])
+            state[0] += 1
+            if state[0] >= policy.breaker_threshold:
+                state[1] = self.clock()
+                state[2] = False
+
+
+def send(request_kwargs, send_once, policy, breaker=None, sleep=time.sleep):
+    """Send a Request, retrying it according to a :class:`RetryPolicy`.
+
+    Args:
+        request_kwargs: Kwargs for ``requests.request``.
+        send_once: Called with ``request_kwargs`` to send the Request once.
+        policy: The :class:`RetryPolicy`.
+        breaker (optional): A :class:`CircuitBreaker`.
+        sleep (optional): Called with the seconds to wait between attempts.
+
+    Returns:
+        A ``(response, attempts)`` tuple. The response is the last one
+        received, even if its status was retried.
+
+    Raises:
+        CircuitOpenError: If the host's circuit is open.
+        requests.RequestException: If the last attempt failed.
+    """
+    host = urlsplit(request_kwargs["url"]).netloc
+    attempts = policy.attempts
+    if not policy.can_retry(request_kwargs["method"]):
+        attempts = 1
+    # Only the first attempt checks the circuit: the retries of a trial are
+    # part of it.
+    trial = breaker.before(host, policy) if breaker else False
+    recorded = False
+    attempt = 0
+    try:
+        while True:
+            attempt += 1
+            retry_after = None
+            try:
+                response = send_once(request_kwargs)
+            except policy.exceptions:
+                if attempt >= attempts:
+                    if breaker:
+                        breaker.record(host, policy, failed=True)
+                        recorded = True
+                    raise
+            else:
+                failed = response.status_code in policy.statuses
+                if not failed or attempt >= attempts:
+                    if breaker:
+                        breaker.record(host, policy, failed)
+                        recorded = True
+                    return response, attempt
+                retry_after = parse_retry_after(
+                    response.headers.get("Retry-After")
+                )
+                response.close()
+            sleep(policy.delay(attempt, retry_after))
+    finally:
+        if trial and not recorded:
+            breaker.release(host)
@@ -0,0 +1,170 @@
+import io
+import multiprocessing
+from contextlib import redirect_stderr
+from copy import deepcopy
+from dataclasses import dataclass, field
+
+from restcli.exceptions import DeadlineError, Error
+
+__all__ = ["ExecJob", "ExecResult", "ShardedExec", "env_changes"]
+
+# Stands in for vars that aren't set.
+_MISSING = object()
+
+# State of the current worker process, set up by ``_init_worker``.
+_worker = {}
+
+
+@dataclass
+class ExecJob:
+    """One line of an ``exec`` file, parsed into ``App.run`` kwargs.
+
+    Lines that couldn't be parsed carry the formatted ``error`` instead.
+    """
+
+    line: str
+    kwargs: dict = None
+    error: str = ""
+
+
+@dataclass
+class ExecResult:
+    """The outcome of running an :class:`ExecJob` in a worker.
+
+    Attributes:
+        line: The line that was run.
+        output: What ``App.run`` returned, if it succeeded.
+        log: Diagnostics the worker wrote to stderr, like ``--stats``.
+        error: The formatted error, if the line failed.
+        set_env: Vars the line set, e.g. from scripts or ``extract``.
+        del_env: Vars the line deleted.
+        skipped: Whether the line wasn't run, because the deadline of the
+            batch passed.
+    """
+
+    line: str
+    output: str = ""
+    log: str = ""
+    error: str = ""
+    set_env: dict = field(default_factory=dict)
+    del_env: list = field(default_factory=list)
+    skipped: bool = False
+
+
+def env_changes(env, initial):
+    """Compare an Environment with an earlier copy of its data.
+
+    Returns:
+        A ``(set_env, del_env)`` tuple, like
+        :meth:`Requestor.parse_env_args`.
+    """
+    set_env = {}
+    del_env = []
+    for key in env:
+        if env[key] != initial.get(key, _MISSING):
+            set_env[key] = env[key]
+    for key in initial:
+        if key not in env:
+            del_env.append(key)
+    return set_env, del_env
+
+
+def _init_worker(app_class, app_kwargs, env_data, deadline=None):
+    app = app_class(**app_kwargs)
+    app.r.env.replace(deepcopy(env_data))
+    app.r.deadline = deadline
+    _worker.update(app=app, initial=env_data)
+
+
+def _run_job(job):
+    result = ExecResult(job.line, error=job.error)
+    if job.error:
+        return result
+
+    app, initial = _worker["app"], _worker["initial"]
+    env = app.r.env
+    log = io.StringIO()
+    try:
+        app.r.check_deadline()
+        with redirect_stderr(log):
+            result.output = app.run(**job.kwargs)
+    except DeadlineError:
+        result.skipped = True
+    except Error as err:
+        # Reported like the ``run`` command does, rather than sent back to
+        # the parent, since these errors can't always be pickled.
+        result.error = f"Error: {err.show()}"
+    finally:
+        result.log = log.getvalue()
+
+        # Every line starts from the Environment as it was when the batch
+        # started. Only the vars that changed are restored, so the others
+        # keep their versions, and cached renders stay valid.
+        result.set_env, result.del_env = env_changes(env, initial)
+        for key in result.set_env:
+            if key in initial:
+                env[key] = deepcopy(initial[key])
+            else:
+                del env[key]
+        for key in result.del_env:
+            env[key] = deepcopy(initial[key])
+    return result
+
+
+class ShardedExec:
+    """Run the lines of an ``exec`` file in a pool of worker processes.
+
+    Rendering, YAML parsing, scripts and output formatting are CPU-bound,
+    so a batch that's spread over processes isn't held back by the GIL.
+    Each worker loads the Collection once, and gets a copy of the
+    Environment as it was when the batch started.
+
+    Lines may run in any order, and in any worker, so each one sees the
+    Environment as it was when the batch started, not as earlier lines left
+    it. Changes made by a line, e.g. by its script, are merged into the
+    Environment in file order, so when several lines change the same var,
+    the last of them wins, as if they had run one after another.
+
+    Lines are skipped once the deadline of ``app``'s Requestor passed.
+
+    Args:
+        app: The :class:`App` whose settings the workers copy, and whose
+            Environment changes are merged into.
+        workers: Number of worker processes.
+    """
+
+    def __init__(self, app, workers):
+        self.app = app
+        self.workers = workers
+
+    def run(self, jobs):
+        """Run some :class:`ExecJob` objects.
+
+        Jobs are consumed lazily, and their results are yielded in the same
+        order, as soon as they and all jobs before them are done.
+
+        Yields:
+            An :class:`ExecResult` for each job.
+        """
+        app = self.app
+        app_kwargs = dict(
+            collection_file=app.r.collection.source,
+            env_file=None,
+            quiet=app.quiet,
+            raw_output=app.raw_output,
+            stats=app.stats,
+            record=app.record,
+            replay=app.replay,
+            dns_cache=app.dns_cache,
+        )
+        initargs = (type(app), app_kwargs, app.r.env.data, app.r.deadline)
+        with multiprocessing.Pool(
+            self.workers, _init_worker, initargs
+        ) as pool:
+            for result in pool.imap(_run_job, jobs):
+                if result.set_env or result.del_env:
+                    app.r.env.update(result.set_env)
+                    app.r.env.remove(*result.del_env)
+                    if app.autosave:
+                        app.r.env.save()
+                yield result
@@ -0,0 +1,298 @@
+import mimetypes
+import mmap
+import os
+import time
+from dataclasses import dataclass
+
+from urllib3.filepost import choose_boundary
+
+from restcli import compression
+
+__all__ = [
+    "CHUNK_SIZE",
+    "BodyReader",
+    "Download",
+    "FileBody",
+    "Transfer",
+    "read_response",
+    "save_response",
+]
+
+# Size of the chunks used when streaming bodies to or from disk.
+CHUNK_SIZE = 64 * 1024
+
+# Minimum number of seconds between two progress reports.
+PROGRESS_INTERVAL = 0.1
+
+
+@dataclass
+class Transfer:
+    """Summary of a received Response body.
+
+    Args:
+        size (int): Number of decoded bytes received.
+        wire_size (int): Number of bytes received on the wire, before any
+            Content-Encoding was decoded.
+        elapsed (float): Seconds spent receiving the body.
+    """
+
+    size: int
+    wire_size: int
+    elapsed: float
+
+    @property
+    def rate(self):
+        """Throughput in (decoded) bytes per second."""
+        if not self.elapsed:
+            return float(self.size)
+        return self.size / self.elapsed
+
+
+@dataclass
+class Download(Transfer):
+    """Summary of a Response body that was streamed to a file.
+
+    Args:
+        path (str): Where the body was written.
+    """
+
+    path: str = None
+
+
+class BodyReader:
+    """Iterate over the decoded body of a streamed Response.
+
+    Content-Encodings are decoded here rather than by urllib3, so that every
+    coding in :mod:`restcli.compression` is supported and the number of bytes
+    received on the wire can be counted.
+
+    Args:
+        response: A :class:`requests.Response` requested with ``stream=True``.
+        chunk_size (optional): Size of each chunk read from the socket.
+    """
+
+    def __init__(self, response, chunk_size=CHUNK_SIZE):
+        self.response = response
+        self.chunk_size = chunk_size
+        self.size = 0
+        self.wire_size = 0
+        self.elapsed = 0.0
+
+    def __iter__(self):
+        start = time.perf_counter()
+        decompressors = compression.decoders(
+            self.response.headers.get("Content-Encoding", "")
+        )
+        # Unsupported codings are left for urllib3 to deal with.
+        decode_content = decompressors is None
+        chunks = self.response.raw.stream(
+            self.chunk_size, decode_content=decode_content
+        )
+        chunks = self.count_wire_bytes(chunks)
+        if decompressors:
+            chunks = compression.iter_decode(chunks, decompressors)
+
+        for chunk in chunks:
+            self.size += len(chunk)
+            yield chunk
+        self.elapsed = time.perf_counter() - start
+
+    def count_wire_bytes(self, chunks):
+        for chunk in chunks:
+            self.wire_size += len(chunk)
+            yield chunk
+
+    @property
+    def transfer(self):
+        return Transfer(
+            size=self.size, wire_size=self.wire_size, elapsed=self.elapsed
+        )
+
+
+def read_response(response, chunk_size=CHUNK_SIZE):
+    """Read and decode the whole body of a streamed Response into memory.
+
+    Afterwards, the body is available through the usual ``content``,
+    ``text`` and ``json()`` attributes of the Response.
+
+    Returns:
+        A :class:`Transfer` describing the transfer.
+    """
+    reader = BodyReader(response, chunk_size)
+    try:
+        # pylint: disable=protected-access
+        response._content = b"".join(reader)
+        response._content_consumed = True
+    finally:
+        response.close()
+    return reader.transfer
+
+
+def save_response(response, path, chunk_size=CHUNK_SIZE, progress=None):
+    """Stream the body of a Response to a file, one chunk at a time.
+
+    Args:
+        response: A :class:`requests.Response` requested with ``stream=True``.
+        path: Path of the file to write.
+        chunk_size (optional): Size of each chunk read from the socket.
+        progress (optional): A callable ``progress(received, total)`` that is
+            called periodically while receiving. ``total`` is None if
+            unknown.
+
+    Returns:
+        A :class:`Download` describing the transfer.
+    """
+    # Content-Length counts encoded bytes, so it's useless for progress
+    # reporting when the body is compressed on the wire.
+    total = None
+    if "Content-Encoding" not in response.headers:
+        try:
+            total = int(response.headers["Content-Length"])
+        except (KeyError, ValueError):
+            pass
+
+    reader = BodyReader(response, chunk_size)
+    last_report = time.perf_counter()
+    try:
+        with open(path, "wb") as handle:
+            for chunk in reader:
+                handle.write(chunk)
+                if progress:
+                    now = time.perf_counter()
+                    if now - last_report >= PROGRESS_INTERVAL:
+                        progress(reader.size, total)
+                        last_report = now
+    finally:
+        response.close()
+    if progress:
+        progress(reader.size, total)
+
+    return Download(
+        size=reader.size,
+        wire_size=reader.wire_size,
+        elapsed=reader.elapsed,
+        path=path,
+    )
+
+
+class FileBody:
+    """A Request body that is streamed from a file.
+
+    The file is never read into memory as a whole. Where possible it is
+    memory-mapped and sent in slices of the mapping, otherwise it is read in
+    chunks. Instances can be iterated more than once, e.g. to follow
+    redirects.
+
+    Args:
+        path (str): Path of the file to send.
+        chunked (optional): Use chunked transfer encoding even if the size
+            of the body is known up front.
+        multipart (optional): If given, wrap the file in a
+            ``multipart/form-data`` body, using this as the field name.
+        encoding (optional): Compress the body on the fly with this
+            Content-Encoding, e.g. "gzip".
+        chunk_size (optional): Size of each chunk sent.
+    """
+
+    def __init__(
+        self,
+        path,
+        chunked=False,
+        multipart=None,
+        encoding=None,
+        chunk_size=CHUNK_SIZE,
+    ):
+        self.path = path
+        self.chunked = chunked
+        self.multipart = multipart
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+
+        mimetype, _ = mimetypes.guess_type(path)
+        self.mimetype = mimetype or "application/octet-stream"
+
+        self.boundary = None
+        self.preamble = self.epilogue = b""
+        if multipart:
+            self.boundary = choose_boundary()
+            filename = os.path.basename(path)
+            self.preamble = (
+                f"--{self.boundary}\r\n"
+                "Content-Disposition: form-data;"
+                f' name="{multipart}"; filename="{filename}"\r\n'
+                f"Content-Type: {self.mimetype}\r\n\r\n"
+            ).encode()
+            self.epilogue = f"\r\n--{self.boundary}--\r\n".encode()
+
+    def __len__(self):
+        """Return the size of the body, or 0 if it's not known up front.
+
+        A size of 0 makes ``requests`` fall back to chunked encoding.
+        """
+        if self.chunked or self.encoding:
+            return 0
+        return (
+            len(self.preamble)
+            + os.path.getsize(self.path)
+            + len(self.epilogue)
+        )
+
+    def __bool__(self):
+        return True
+
+    def __iter__(self):
+        chunks = self.iter_raw()
+        if self.encoding:
+            chunks = compression.iter_compress(chunks, self.encoding)
+        # An empty chunk would terminate a chunked body prematurely.
+        return (chunk for chunk in chunks if len(chunk))
+
+    @property
+    def headers(self):
+        """Headers that must be sent with this body."""
+        headers = {}
+        if self.multipart:
+            headers["Content-Type"] = (
+                f"multipart/form-data; boundary={self.boundary}"
+            )
+        if self.encoding:
+            headers["Content-Encoding"] = self.encoding
+        return headers
+
+    @property
+    def default_headers(self):
+        """Headers that should be sent unless the Request overrides them."""
+        return {"Content-Type": self.mimetype}
+
+    def iter_raw(self):
+        """Yield the uncompressed body in chunks."""
+        yield self.preamble
+        with open(self.path, "rb") as handle:
+            try:
+                mapping = mmap.mmap(
+                    handle.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            except (ValueError, OSError):
+                # Empty files and non-regular files can't be mapped.
+                yield from iter(lambda: handle.read(self.chunk_size), b"")
+            else:
+                with mapping:
+                    yield from self.iter_mapping(mapping)
+        yield self.epilogue
+
+    def iter_mapping(self, mapping):
+        """Yield slices of a memory mapping without copying them.
+
+        Each slice is released once the next one is requested, so consumers
+        must not hold on to them.
+        """
+        view = memoryview(mapping)
+        try:
+            for offset in range(0, len(view), self.chunk_size):
+                chunk = view[offset : offset + self.chunk_size]
+                try:
+                    yield chunk
+                finally:
+                    chunk.release()
+        finally:
+            view.release()
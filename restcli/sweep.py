@@ -0,0 +1,231 @@
+import csv
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import jinja2
+import requests
+import urllib3
+
+from restcli import json_utils
+from restcli.exceptions import (
+    DeadlineError,
+    Error,
+    InputError,
+    RequestTimeoutError,
+)
+from restcli.templates import OverlayRenderer
+from restcli.utils import AttrSeq
+from restcli.workspace import EnvOverlay
+
+__all__ = ["FORMATS", "Sweep", "guess_format", "read_rows"]
+
+# Errors that fail a single row, rather than the whole sweep.
+ROW_ERRORS = (
+    Error,
+    requests.RequestException,
+    # Raised while reading the body, e.g. if the connection drops.
+    urllib3.exceptions.HTTPError,
+    jinja2.TemplateError,
+)
+
+FORMATS = AttrSeq(
+    "csv",
+    "jsonl",
+)
+
+
+def guess_format(path):
+    """Guess the format of a data file from its extension."""
+    _, ext = os.path.splitext(path or "")
+    if ext.lower() == ".csv":
+        return FORMATS.csv
+    return FORMATS.jsonl
+
+
+def read_rows(handle, data_format):
+    """Lazily read rows of Environment overrides from a data file.
+
+    CSV files must have a header row, which names the variables; their
+    values are always strings. JSON Lines files hold one JSON object per
+    line, and blank lines are skipped.
+
+    Yields:
+        ``(number, row)`` tuples, where ``number`` counts rows from 1.
+    """
+    if data_format == FORMATS.csv:
+        rows = csv.DictReader(handle)
+    else:
+        rows = _read_jsonl(handle)
+    return enumerate(rows, start=1)
+
+
+def _read_jsonl(handle):
+    for lineno, line in enumerate(handle, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json_utils.loads(line)
+        except ValueError as err:
+            raise InputError(
+                value=line.strip(), msg=f"line {lineno}: invalid JSON - {err}"
+            )
+        if not isinstance(row, dict):
+            raise InputError(
+                value=line.strip(), msg=f"line {lineno}: not a JSON object"
+            )
+        yield row
+
+
+class Sweep:
+    """Run a Request once for each row of some data.
+
+    Each row is laid over the Environment for its Request, without changing
+    the Environment itself, so rows can run concurrently. Changes made by
+    Request scripts only last for their own row. Templates that don't read
+    any of a row's variables are rendered only once for the whole sweep.
+
+    Args:
+        requestor: The :class:`Requestor` to run Requests with.
+        group: A Group name in the Collection.
+        name: A Request name in the Group.
+        updater (optional): Updates to apply to every Request.
+        workers (optional): Maximum number of Requests to run at once.
+        include_body (optional): Whether to include response bodies in the
+            results.
+    """
+
+    def __init__(
+        self,
+        requestor,
+        group,
+        name,
+        updater=None,
+        workers=1,
+        include_body=True,
+    ):
+        self.requestor = requestor
+        self.group = group
+        self.name = name
+        self.updater = updater
+        self.workers = workers
+        self.include_body = include_body
+        self.renderer = OverlayRenderer()
+
+    def run(self, rows):
+        """Run the Request for each row.
+
+        Rows are consumed lazily: at most twice as many as there are workers
+        are held in memory at once. With more than one worker, results are
+        yielded in the order they finish.
+
+        Args:
+            rows: An iterable of ``(number, row)`` tuples, as returned by
+                :func:`read_rows`.
+
+        Yields:
+            A result dict for each row.
+        """
+        if self.workers <= 1:
+            for number, row in rows:
+                yield self.run_row(number, row)
+            return
+
+        window = self.workers * 2
+        with ThreadPoolExecutor(self.workers) as executor:
+            pending = set()
+            for number, row in rows:
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(executor.submit(self.run_row, number, row))
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+    def run_row(self, number, row):
+        """Run the Request for a single row.
+
+        Returns:
+            A dict with the row number and either the response status, or
+            an error message if the Request failed. If the Request has an
+            ``expect`` block, ``passed`` says whether all its checks passed,
+            and ``failures`` lists the ones that didn't. Rows that weren't
+            run because the Requestor's deadline passed are marked
+            ``skipped``; Requests that timed out have a ``timeout`` phase,
+            ``connect`` or ``read``. Requests that were hedged have the
+            number of ``hedges`` sent, and whether a hedge won. Requests
+            whose host was resolved have a ``resolve_time``.
+        """
+        env = EnvOverlay(self.requestor.env, row)
+        start = time.perf_counter()
+        try:
+            response = self.requestor.request(
+                self.group,
+                self.name,
+                self.updater,
+                env=env,
+                render=self.renderer,
+            )
+        except ROW_ERRORS as err:
+            return {"row": number, **self.error_fields(err)}
+
+        result = {
+            "row": number,
+            "status": response.status_code,
+            "reason": response.reason,
+            "elapsed": round(time.perf_counter() - start, 6),
+        }
+        result.update(self.send_fields(response))
+        result.update(self.check_fields(response))
+        result.update(self.body_fields(response))
+        return result
+
+    @staticmethod
+    def error_fields(err):
+        """Describe a Request that failed with one of ``ROW_ERRORS``."""
+        if isinstance(err, DeadlineError):
+            return {"error": err.show(), "skipped": True}
+        if isinstance(err, RequestTimeoutError):
+            return {"error": err.show(), "timeout": err.phase}
+        if isinstance(err, Error):
+            return {"error": err.show()}
+        return {"error": str(err)}
+
+    @staticmethod
+    def send_fields(response):
+        """Describe how a Request was sent: its host's ``resolve_time``, and
+        the ``hedges`` sent."""
+        fields = {}
+        if response.resolve_time:
+            fields["resolve_time"] = round(response.resolve_time, 6)
+        if response.hedges:
+            fields["hedges"] = response.hedges
+            fields["hedge_won"] = response.hedge_won
+        return fields
+
+    @staticmethod
+    def check_fields(response):
+        """Describe the outcome of a Request's ``expect`` block."""
+        results = getattr(response, "expectations", None)
+        if not results:
+            return {}
+        return {
+            "passed": all(r.passed for r in results),
+            "failures": [r.to_dict() for r in results if not r.passed],
+        }
+
+    def body_fields(self, response):
+        """Describe a response body: the file it was saved to, or the body
+        itself if ``self.include_body`` is set."""
+        download = getattr(response, "download", None)
+        if download:
+            return {"output": download.path}
+        if not self.include_body:
+            return {}
+        try:
+            return {"body": response.json()}
+        except ValueError:
+            return {"body": response.text}
@@ -0,0 +1,95 @@
+import functools
+from collections import ChainMap
+
+import jinja2
+import jinja2.meta
+from jinja2 import nodes
+from jinja2.utils import concat
+
+__all__ = [
+    "OverlayRenderer",
+    "compile_template",
+    "is_deterministic",
+    "render",
+    "template_vars",
+]
+
+# Same options as templates created with ``jinja2.Template(source)``.
+ENVIRONMENT = jinja2.Environment()
+
+# Filters and globals whose output differs from one call to the next.
+RANDOM_FILTERS = frozenset(("random",))
+RANDOM_GLOBALS = frozenset(("lipsum",))
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_template(source):
+    """Compile a template string, reusing earlier compilations."""
+    return ENVIRONMENT.from_string(source)
+
+
+@functools.lru_cache(maxsize=1024)
+def template_vars(source):
+    """Return the names of all variables a template string reads from its
+    context."""
+    return frozenset(
+        jinja2.meta.find_undeclared_variables(ENVIRONMENT.parse(source))
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def is_deterministic(source):
+    """Return whether a template string always renders the same given the
+    same variables, i.e. it uses no random filters or globals."""
+    ast = ENVIRONMENT.parse(source)
+    for node in ast.find_all((nodes.Filter, nodes.Name)):
+        if isinstance(node, nodes.Filter) and node.name in RANDOM_FILTERS:
+            return False
+        if isinstance(node, nodes.Name) and node.name in RANDOM_GLOBALS:
+            return False
+    return True
+
+
+def render(source, env):
+    """Render a template string with the given ``env``.
+
+    Unlike ``jinja2.Template.render``, this doesn't copy ``env`` into a new
+    dict, so rendering costs the same for small and large Environments.
+    """
+    template = compile_template(source)
+    context = template.new_context(
+        ChainMap(env, template.globals), shared=True
+    )
+    try:
+        return concat(template.root_render_func(context))
+    except Exception:  # pylint: disable=broad-except
+        return ENVIRONMENT.handle_exception()
+
+
+class OverlayRenderer:
+    """Render templates in many overlays of the same Environment.
+
+    Overlays are :class:`workspace.EnvOverlay` views, or ChainMaps whose
+    first map holds the overriding variables. The Environment they overlay
+    is shared, and must not change while the renderer is in use. Templates
+    that don't read any overriding variable, and aren't random (see
+    :func:`is_deterministic`), render the same in every overlay, so they are
+    only rendered once.
+    """
+
+    def __init__(self):
+        self.shared = {}
+
+    def __call__(self, source, env):
+        if isinstance(env, ChainMap):
+            shadowed = env.maps[0].keys()
+        else:
+            shadowed = getattr(env, "shadowed", env.keys())
+        if not is_deterministic(source) or template_vars(source) & shadowed:
+            return render(source, env)
+
+        try:
+            return self.shared[source]
+        except KeyError:
+            output = self.shared[source] = render(source, env)
+            return output
@@ -1,5 +1,10 @@
+import os
+import shutil
+import tempfile
+import threading
 from collections import OrderedDict
 from collections.abc import Mapping, Sequence
+from contextlib import contextmanager
 
 
 class AttrSeq(Sequence):
@@ -89,6 +94,54 @@ class classproperty:
         return self
 
 
+class LRUCache:
+    """A bounded cache that evicts its least recently used items first.
+
+    Lookups are counted as ``hits`` and ``misses``. Instances are safe to
+    share between threads.
+
+    Args:
+        maxsize: The maximum number of items to keep.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        """Return the item for ``key``, or ``default`` if there is none."""
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Add or replace the item for ``key``, evicting the oldest item if
+        the cache is full."""
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            if len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        """Remove all items and reset the counters."""
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+
 def recursive_update(mapping, data):
     """Like dict.update, but recursively updates nested dicts as well."""
     for key, val in data.items():
@@ -112,3 +165,63 @@ def select_first(*args):
         if arg is not None:
             return arg
     return None
+
+
+def fmt_size(n):
+    """Format a number of bytes as a human readable string."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(n) < 1024 or unit == "GiB":
+            break
+        n /= 1024
+    if unit == "B":
+        return f"{n} {unit}"
+    return f"{n:.1f} {unit}"
+
+
+@contextmanager
+def atomic_write(path, mode="w"):
+    """Open a file for writing, replacing it atomically on success.
+
+    Data is written to a temporary file next to ``path``, which is synced
+    to disk and then renamed over ``path``. Readers see either the old or
+    the new contents, never a partial write, even if the process dies. If an
+    exception is raised, ``path`` is left untouched.
+
+    Args:
+        path: Path of the file to write. Symlinks are followed.
+        mode (optional): Mode to open the temporary file with.
+
+    Yields:
+        A file object.
+    """
+    path = os.path.realpath(path)
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}.")
+    try:
+        with os.fdopen(fd, mode) as handle:
+            yield handle
+            handle.flush()
+            os.fsync(handle.fileno())
+        try:
+            shutil.copymode(path, tmp_path)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+    # Make the rename itself durable, where the platform allows it.
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
@@ -1,25 +1,43 @@
 import abc
 import importlib
 import inspect
+import itertools
+import os
 import random
+import sqlite3
+import threading
+import time
 from collections import OrderedDict
-from collections.abc import Mapping
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
 from copy import deepcopy
 
+from restcli import checks, compression, extract, hedge, retry
 from restcli import yaml_utils as yaml
 from restcli.exceptions import (
     CollectionError,
     EnvError,
     FileContentError,
+    InputError,
     LibError,
 )
 from restcli.params import (
     CONFIG_PARAMS,
+    MOCK_PARAMS,
     REQUEST_PARAMS,
     REQUIRED_REQUEST_PARAMS,
+    TIMEOUT_PARAMS,
+    UPLOAD_PARAMS,
 )
+from restcli.utils import atomic_write
 
-__all__ = ["Collection", "Environment"]
+__all__ = [
+    "Collection",
+    "EnvOverlay",
+    "Environment",
+    "SqliteEnvironment",
+    "open_env",
+]
 
 
 class YamlDictReader(OrderedDict, metaclass=abc.ABCMeta):
@@ -66,9 +84,28 @@ class Collection(YamlDictReader):
 
     error_class = CollectionError
 
+    # Request Parameters that are checked by a loader method when they are
+    # set, and the attribute that keeps what the loader compiled, if any.
+    PARAM_LOADERS = (
+        ("upload", "load_upload", None),
+        ("compress", "load_compress", None),
+        ("expect", "load_expect", "expectations"),
+        ("extract", "load_extract", "extractions"),
+        ("retry", "load_retry", "retry_policies"),
+        ("hedge", "load_hedge", "hedge_policies"),
+        ("mock", "load_mock", None),
+        ("timeout", "load_timeout", None),
+    )
+
     def __init__(self, source):
         self.defaults = {}
         self.libs = []
+        # Compiled ``expect``, ``extract``, ``retry`` and ``hedge`` blocks,
+        # keyed by (group name, request name).
+        self.expectations = {}
+        self.extractions = {}
+        self.retry_policies = {}
+        self.hedge_policies = {}
         super().__init__(source)
 
     def load(self):
@@ -122,6 +159,7 @@ class Collection(YamlDictReader):
     def load_collection(self, collection):
         """Parse and validate a Collection."""
         new_collection = OrderedDict()
+        compiled = {attr: {} for _, _, attr in self.PARAM_LOADERS if attr}
         for group_name, group in collection.items():
             path = [group_name]
             self.assert_mapping(group, "Group", path)
@@ -156,48 +194,644 @@ class Collection(YamlDictReader):
                         msg=f'Request "{key}" must be a {type_.__name__}',
                     )
 
+                self.load_params(new_req, (group_name, req_name), compiled)
                 new_group[req_name] = new_req
             new_collection[group_name] = new_group
 
         self.clear()
         self.update(new_collection)
+        for attr, blocks in compiled.items():
+            setattr(self, attr, blocks)
+
+    def load_params(self, request, key, compiled):
+        """Run the loader of each Request Parameter in ``PARAM_LOADERS``
+        that is set, adding what they compile to ``compiled``.
+
+        Args:
+            request: The Request, with defaults filled in.
+            key: The (group name, request name) of the Request.
+            compiled: A dict of dicts, by attribute name, to add the
+                compiled Request Parameters to.
+        """
+        for param, loader, attr in self.PARAM_LOADERS:
+            if not request[param]:
+                continue
+            loaded = getattr(self, loader)(request[param], [*key, param])
+            if attr:
+                compiled[attr][key] = loaded
+
+    def load_expect(self, expect, path):
+        """Validate and compile the ``expect`` block of a Request."""
+        try:
+            return checks.compile_expect(expect)
+        except InputError as err:
+            self.raise_error(err.show(), path)
+
+    def load_extract(self, spec, path):
+        """Validate and compile the ``extract`` block of a Request."""
+        try:
+            return extract.compile_extract(spec)
+        except InputError as err:
+            self.raise_error(err.show(), path)
+
+    def load_retry(self, spec, path):
+        """Validate and compile the ``retry`` block of a Request."""
+        try:
+            return retry.compile_retry(spec)
+        except InputError as err:
+            self.raise_error(err.show(), path)
+
+    def load_hedge(self, spec, path):
+        """Validate and compile the ``hedge`` block of a Request."""
+        try:
+            return hedge.compile_hedge(spec)
+        except InputError as err:
+            self.raise_error(err.show(), path)
+
+    def load_upload(self, upload, path):
+        """Validate the ``upload`` options of a Request."""
+        self.load_options(upload, UPLOAD_PARAMS, "upload", path)
+
+    def load_compress(self, compress, path):
+        """Validate the ``compress`` codec of a Request."""
+        if compress not in compression.CODECS:
+            self.raise_error(
+                f'Unsupported compression "{compress}"; expected one'
+                f' of: {", ".join(compression.CODECS)}',
+                path,
+            )
+
+    def load_mock(self, mock, path):
+        """Validate the ``mock`` response of a Request."""
+        self.load_options(mock, MOCK_PARAMS, "mock", path)
+        error_rate = mock.get("error_rate", 0)
+        if not 0 <= error_rate <= 1:
+            self.raise_error(
+                'Mock option "error_rate" must be between 0 and 1',
+                [*path, "error_rate"],
+            )
+
+    def load_timeout(self, timeout, path):
+        """Validate the ``timeout`` options of a Request."""
+        self.load_options(timeout, TIMEOUT_PARAMS, "timeout", path)
+        for key, value in timeout.items():
+            if value <= 0:
+                self.raise_error(
+                    f'Timeout option "{key}" must be positive', [*path, key]
+                )
+
+    def load_options(self, options, params, label, path):
+        """Validate the keys and types of an options mapping, like
+        ``upload``. Options of type float may be given as ints too."""
+        for key, value in options.items():
+            if key not in params:
+                self.raise_error(f'Unexpected key in {label}: "{key}"', path)
+            type_ = params[key]
+            name = type_.__name__
+            if type_ is float:
+                type_, name = (int, float), "number"
+            self.assert_type(
+                obj=value,
+                type_=type_,
+                path=[*path, key],
+                msg=f'{label.capitalize()} option "{key}" must be a {name}',
+            )
+
+
+class BatchedSaves:
+    """Mixin for Environments whose saves can be coalesced.
+
+    Child classes must implement ``write``, which unconditionally persists
+    the Environment, and the ``dirty`` property, and set ``_lock`` to an
+    RLock that they hold while changing. Saves hold it too, so they never
+    write a half-made change, nor overwrite a newer save with an older one.
+    """
+
+    # Minimum number of seconds between two saves within a ``batch``.
+    SAVE_INTERVAL = 1.0
+
+    _batch_depth = 0
+    _pending = False
+    _last_save = None
+
+    def save(self):
+        """Save the Environment to ``self.source``.
+
+        Nothing is written unless the Environment is ``dirty``. Within a
+        ``batch``, saves are written at most once every ``SAVE_INTERVAL``
+        seconds, and any save that was held back is written when the batch
+        ends.
+        """
+        with self._lock:
+            if not self.dirty:
+                self._pending = False
+                return
+
+            if (
+                self._batch_depth
+                and self._last_save is not None
+                and time.monotonic() - self._last_save < self.SAVE_INTERVAL
+            ):
+                self._pending = True
+                return
+
+            self.write()
+            self._pending = False
+            self._last_save = time.monotonic()
+
+    @contextmanager
+    def batch(self):
+        """Coalesce saves until the end of the block.
+
+        Batches may be nested; held back saves are written when the
+        outermost batch ends, even if it ends with an exception.
+        """
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth and self._pending:
+                    self.save()
+
+
+# Hands out the versions of all vars, so no two changes share a version.
+_VERSIONS = itertools.count(1)
+
+# Types of values that can't be changed in place, only replaced.
+IMMUTABLE_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+class VersionedVars:
+    """Mixin for Environments that track a version for each var.
 
+    A var's version changes whenever it is set or deleted, so anything
+    derived from some vars, like a rendered Request, can be cached under
+    their versions. Values changed in place, e.g. a list that's appended to,
+    keep their version; that's why ``versions`` refuses vars holding mutable
+    values.
 
-class Environment(YamlDictReader):
-    """An Env reader and parser."""
+    Child classes must call ``reset_versions`` before they are loaded, and
+    ``touch`` whenever a var changes.
+    """
+
+    def reset_versions(self):
+        """Give every var a new version, e.g. after a reload."""
+        self._epoch = next(_VERSIONS)
+        self._versions = {}
+
+    def touch(self, key):
+        """Give a var a new version."""
+        self._versions[key] = next(_VERSIONS)
+
+    def versions(self, keys):
+        """Return a hashable token for the current versions of some vars.
+
+        Returns:
+            A tuple that changes whenever any of the vars changes, or None
+            if any of them holds a mutable value.
+        """
+        token = [self._epoch]
+        for key in sorted(keys):
+            if not isinstance(self.get(key), IMMUTABLE_TYPES):
+                return None
+            token.append(self._versions.get(key, 0))
+        return tuple(token)
+
+
+class Environment(VersionedVars, BatchedSaves, YamlDictReader):
+    """An Env reader and parser.
+
+    Saving is cheap when nothing changed: the Environment remembers what it
+    last loaded or saved, and ``save`` does nothing if it still matches.
+
+    Like :class:`SqliteEnvironment`, it can be changed and saved from
+    several threads at once, e.g. by background Jobs.
+    """
 
     error_class = EnvError
 
+    def __init__(self, source):
+        self._lock = threading.RLock()
+        self._snapshot = None
+        self.reset_versions()
+        super().__init__(source)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            self.touch(key)
+
+    def __delitem__(self, key):
+        with self._lock:
+            super().__delitem__(key)
+            self.touch(key)
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self.reset_versions()
+
+    def update(self, *args, **kwargs):
+        with self._lock:
+            super().update(*args, **kwargs)
+
     def load(self):
         """Reload the current Environment, changing it to ``path`` if given."""
-        if self.source:
-            with open(self.source) as handle:
-                data = yaml.load(handle)
-                self.replace(data)
-        self["__rando__"] = random.randint(100000000, 999999999)
+        with self._lock:
+            if self.source:
+                with open(self.source) as handle:
+                    data = yaml.load(handle)
+                    self.replace(data)
+            self["__rando__"] = random.randint(100000000, 999999999)
+            self._snapshot = self.data
+            self._pending = False
 
     @property
     def data(self):
         """Return a copy of the raw data in the Environment."""
-        return deepcopy(OrderedDict(self))
+        with self._lock:
+            return deepcopy(OrderedDict(self))
+
+    @property
+    def dirty(self):
+        """Whether the Environment changed since it was last loaded or
+        saved."""
+        with self._lock:
+            return self._snapshot != self
 
     def replace(self, *args, **kwargs):
         """Replace all data from the Environment with the given data."""
-        self.clear()
-        self.update(*args, **kwargs)
+        with self._lock:
+            self.clear()
+            self.update(*args, **kwargs)
 
     def remove(self, *args):
         """Remove each of the given vars from the Environment."""
-        for var in args:
+        with self._lock:
+            for var in args:
+                try:
+                    del self[var]
+                except KeyError:
+                    pass
+
+    def write(self):
+        """Write the Environment to ``self.source``, replacing it
+        atomically."""
+        with self._lock:
+            data = self.data
+            with atomic_write(self.source) as handle:
+                yaml.dump(data, handle)
+            self._snapshot = data
+
+
+# Marks vars that were deleted but not yet saved.
+_DELETED = object()
+
+
+class SqliteEnvironment(VersionedVars, BatchedSaves, MutableMapping):
+    """An Environment stored in a SQLite database.
+
+    Values are read lazily, one var at a time, and cached until the next
+    ``load``. Changes are kept in memory until ``save``, which writes only
+    the vars that changed, in a single transaction. Vars changed by other
+    processes in the meantime are left alone, so several processes can
+    safely share one database. Every saved change is also recorded in a
+    ``changes`` table.
+
+    Values are stored as YAML, like in Environment files.
+
+    Args:
+        source: Path of the database file. An empty file is an empty
+            Environment.
+    """
+
+    error_class = EnvError
+
+    # File extensions of Environment files that are SQLite databases.
+    SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+    # Seconds to wait for other processes to release the database.
+    LOCK_TIMEOUT = 30.0
+
+    SCHEMA = (
+        """
+        CREATE TABLE IF NOT EXISTS env (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            updated REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT NOT NULL,
+            value TEXT,
+            pid INTEGER NOT NULL,
+            changed REAL NOT NULL
+        )
+        """,
+    )
+
+    def __init__(self, source):
+        self.source = source
+        self._lock = threading.RLock()
+        self._connection = None
+        self.load()
+
+    def load(self):
+        """Forget all cached values and unsaved changes."""
+        with self._lock:
+            self._cache = {}
+            self._originals = {}
+            self._changes = OrderedDict()
+            self._keys = None
+            self._volatile = {
+                "__rando__": random.randint(100000000, 999999999)
+            }
+            self._pending = False
+            self.reset_versions()
+            self.connect()
+
+    def copy(self):
+        return self.__class__(self.source)
+
+    def connect(self):
+        """Open the database, creating its tables if needed."""
+        if self._connection is not None:
+            self._connection.close()
+        try:
+            connection = sqlite3.connect(
+                self.source,
+                timeout=self.LOCK_TIMEOUT,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+        except sqlite3.DatabaseError as err:
+            raise EnvError(file=self.source, msg=str(err))
+        self._connection = connection
+
+    def __getitem__(self, key):
+        with self._lock:
+            if key in self._volatile:
+                return self._volatile[key]
+            if key in self._changes:
+                value = self._changes[key]
+                if value is _DELETED:
+                    raise KeyError(key)
+                return value
+            if key in self._cache:
+                return self._cache[key]
+
+            row = self._connection.execute(
+                "SELECT value FROM env WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(key)
+            value = self._cache[key] = yaml.load(row[0])
+            self._originals[key] = deepcopy(value)
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key in self._volatile:
+                self._volatile[key] = value
+            else:
+                self._changes[key] = value
+            self.touch(key)
+
+    def __delitem__(self, key):
+        with self._lock:
+            if key not in self:
+                raise KeyError(key)
+            if key in self._volatile:
+                del self._volatile[key]
+            else:
+                self._changes[key] = _DELETED
+            self.touch(key)
+
+    def __iter__(self):
+        with self._lock:
+            if self._keys is None:
+                self._keys = [
+                    key
+                    for key, in self._connection.execute(
+                        "SELECT key FROM env ORDER BY rowid"
+                    )
+                ]
+            keys = list(self._keys)
+            keys.extend(k for k in self._changes if k not in self._keys)
+            keys.extend(self._volatile)
+            changes = dict(self._changes)
+        return (key for key in keys if changes.get(key) is not _DELETED)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    @property
+    def data(self):
+        """Return a copy of all data in the Environment."""
+        return OrderedDict((key, deepcopy(self[key])) for key in self)
+
+    def replace(self, *args, **kwargs):
+        """Replace all data from the Environment with the given data."""
+        with self._lock:
+            for key in list(self):
+                del self[key]
+            self.update(*args, **kwargs)
+
+    def remove(self, *args):
+        """Remove each of the given vars from the Environment."""
+        with self._lock:
+            for var in args:
+                try:
+                    del self[var]
+                except KeyError:
+                    pass
+
+    def changed(self):
+        """Return the vars that changed since they were last loaded, as a
+        dict mapping each var to its new value or to ``_DELETED``."""
+        with self._lock:
+            changes = dict(self._changes)
+            # Values read from the database may have been changed in place.
+            for key, value in self._cache.items():
+                if key not in changes and value != self._originals[key]:
+                    changes[key] = value
+        return changes
+
+    @property
+    def dirty(self):
+        """Whether the Environment has unsaved changes."""
+        return bool(self.changed())
+
+    def write(self):
+        """Write all changed vars to the database in one transaction."""
+        with self._lock:
+            changes = self.changed()
+            now = time.time()
+            pid = os.getpid()
+            connection = self._connection
             try:
-                del self[var]
-            except KeyError:
-                pass
+                # Take the write lock up front, waiting for other processes.
+                connection.execute("BEGIN IMMEDIATE")
+                for key, value in changes.items():
+                    text = None if value is _DELETED else yaml.dump(value)
+                    if text is None:
+                        connection.execute(
+                            "DELETE FROM env WHERE key = ?", (key,)
+                        )
+                    elif not connection.execute(
+                        "UPDATE env SET value = ?, version = version + 1,"
+                        " updated = ? WHERE key = ?",
+                        (text, now, key),
+                    ).rowcount:
+                        connection.execute(
+                            "INSERT INTO env (key, value, version, updated)"
+                            " VALUES (?, ?, 1, ?)",
+                            (key, text, now),
+                        )
+                    connection.execute(
+                        "INSERT INTO changes (key, value, pid, changed)"
+                        " VALUES (?, ?, ?, ?)",
+                        (key, text, pid, now),
+                    )
+                connection.execute("COMMIT")
+            except sqlite3.Error as err:
+                if connection.in_transaction:
+                    connection.execute("ROLLBACK")
+                raise EnvError(file=self.source, msg=str(err))
+
+            for key, value in changes.items():
+                if value is _DELETED:
+                    self._cache.pop(key, None)
+                    self._originals.pop(key, None)
+                else:
+                    self._cache[key] = value
+                    self._originals[key] = deepcopy(value)
+            self._changes.clear()
+            self._keys = None
+
+    def history(self, key=None):
+        """Return saved changes, oldest first, as ``(key, value, pid,
+        changed)`` tuples. ``value`` is None for deletions."""
+        query = "SELECT key, value, pid, changed FROM changes"
+        params = ()
+        if key is not None:
+            query += " WHERE key = ?"
+            params = (key,)
+        with self._lock:
+            rows = self._connection.execute(query + " ORDER BY id", params)
+            return [
+                (k, None if v is None else yaml.load(v), pid, changed)
+                for k, v, pid, changed in rows
+            ]
+
+
+class EnvOverlay(MutableMapping):
+    """A view of an Environment with some vars overridden.
+
+    Changes made through the view, e.g. by a script, only change its
+    overrides, never the Environment. Other Environment methods, like
+    ``save``, are passed on to the Environment.
+
+    Args:
+        env: The Environment to view.
+        set_env (optional): Vars to add or replace.
+        del_env (optional): Vars to hide. These win over ``set_env``.
+    """
+
+    def __init__(self, env, set_env=None, del_env=()):
+        self.env = env
+        self.removed = frozenset(del_env)
+        self.overrides = {
+            key: value
+            for key, value in (set_env or {}).items()
+            if key not in self.removed
+        }
+
+    def __getattr__(self, name):
+        if name == "env":
+            # Not set yet, e.g. while being copied.
+            raise AttributeError(name)
+        return getattr(self.env, name)
+
+    def __getitem__(self, key):
+        if key in self.overrides:
+            return self.overrides[key]
+        if key in self.removed:
+            raise KeyError(key)
+        return self.env[key]
+
+    def __setitem__(self, key, value):
+        self.overrides[key] = value
+        self.removed -= {key}
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.overrides.pop(key, None)
+        self.removed |= {key}
+
+    def __iter__(self):
+        yield from self.overrides
+        for key in self.env:
+            if key not in self.overrides and key not in self.removed:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
 
-    def save(self):
-        """Save ``self.env`` to ``self.env_path``."""
-        with open(self.source, "w") as handle:
-            return yaml.dump(self.data, handle)
+    @property
+    def shadowed(self):
+        """The names of the vars the view overrides or hides."""
+        return self.overrides.keys() | self.removed
+
+    @property
+    def data(self):
+        """Return a copy of the raw data in the view."""
+        return deepcopy(OrderedDict(self))
+
+    def replace(self, *args, **kwargs):
+        """Replace all data in the view with the given data."""
+        self.clear()
+        self.update(*args, **kwargs)
+
+    def remove(self, *args):
+        """Hide each of the given vars."""
+        self.removed |= set(args)
+        for var in args:
+            self.overrides.pop(var, None)
+
+    def versions(self, keys):
+        """Return a hashable token for the current versions of some vars,
+        like :meth:`VersionedVars.versions`, or None if the viewed
+        Environment doesn't track versions."""
+        versions = getattr(self.env, "versions", None)
+        shadowed = self.shadowed
+        token = versions(keys - shadowed) if versions else None
+        if token is None:
+            return None
+        overrides = []
+        for key in sorted(keys & shadowed):
+            value = self.get(key)
+            if not isinstance(value, IMMUTABLE_TYPES):
+                return None
+            overrides.append((key, key in self.removed, value))
+        return token + tuple(overrides)
+
+
+def open_env(source):
+    """Open an Environment, choosing its storage by file extension."""
+    if source and source.lower().endswith(SqliteEnvironment.SUFFIXES):
+        return SqliteEnvironment(source)
+    return Environment(source)
 
 
 class Libs(YamlDictReader):
@@ -17,11 +17,13 @@ class SafeCustomLoader(yaml.SafeLoader):
     pass
 
 
-class CustomDumper(yaml.Dumper):
+# Use the libyaml emitter where PyYAML was built with it; it produces the
+# same output, many times faster.
+class CustomDumper(getattr(yaml, "CDumper", yaml.Dumper)):
     pass
 
 
-class SafeCustomDumper(yaml.SafeDumper):
+class SafeCustomDumper(getattr(yaml, "CSafeDumper", yaml.SafeDumper)):
     pass
 
 
@@ -60,7 +62,9 @@ class YamlLiteralStr(str):
 
 
 def literal_unicode_representer(dumper, data):
-    return dumper.represent_scalar(u"tag:yaml.org,2002:str", data, style="|")
+    return dumper.represent_scalar(
+        u"tag:yaml.org,2002:str", str(data), style="|"
+    )
 
 
 CustomDumper.add_representer(YamlLiteralStr, literal_unicode_representer)
@@ -73,5 +73,9 @@ setup(
     install_requires=requirements,
     extras_require={
         "testing": ["pytest>=5.0.0"],
+        "zstd": ["zstandard"],
+        "brotli": ["brotli"],
+        "orjson": ["orjson"],
+        "dns": ["dnspython>=2.0"],
     },
 )
@@ -60,6 +60,22 @@ def coverage(ctx, html=False):
         ctx.run("coverage html", pty=True)
 
 
+@task(iterable=["name"])
+def bench(ctx, name):
+    """Run the benchmarks, or only those given with --name."""
+    modules = name or [
+        "extract",
+        "json_codec",
+        "lexer",
+        "render_cache",
+        "response",
+        "updates",
+    ]
+    for module in modules:
+        print(f"# {module}")
+        ctx.run(f"python -m benchmarks.{module}", pty=True)
+
+
 # ----------------------------------------------------------------------
 # Installation
 
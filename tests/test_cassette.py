@@ -0,0 +1,152 @@
+import gzip
+import io
+import json
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+
+from restcli import streams
+from restcli.cassette import MODES, Cassette
+from restcli.exceptions import CassetteError
+from restcli.requestor import Requestor
+
+COLLECTION = """\
+items:
+    get:
+        method: get
+        url: "http://example.org/items/{{ item_id }}"
+    add:
+        method: post
+        url: "http://example.org/items"
+        body: '{"id": {{ item_id }}}'
+"""
+
+
+@pytest.fixture
+def requestor(tmp_path):
+    collection = tmp_path / "collection.yaml"
+    collection.write_text(COLLECTION)
+    env = tmp_path / "env.yaml"
+    env.write_text("item_id: 1\n")
+    return Requestor(str(collection), str(env))
+
+
+def mock_network(mocker):
+    """Patch the network under the cassette adapters with a server that
+    sends gzipped JSON describing the request."""
+
+    def send(adapter, request, **kwargs):
+        body = json.dumps(
+            {"url": request.url, "body": request.body and len(request.body)}
+        ).encode()
+        raw = HTTPResponse(
+            body=io.BytesIO(gzip.compress(body)),
+            headers={
+                "Content-Type": "application/json",
+                "Content-Encoding": "gzip",
+                "Set-Cookie": "a=1",
+            },
+            status=201,
+            reason="Created",
+            version=11,
+            preload_content=False,
+        )
+        raw.chunked = False
+        return adapter.build_response(request, raw)
+
+    return mocker.patch.object(
+        HTTPAdapter, "send", autospec=True, side_effect=send
+    )
+
+
+def prepare(method, url, body=None):
+    return requests.Request(method, url, data=body).prepare()
+
+
+def test_key(tmp_path):
+    key = Cassette.key
+    assert key(prepare("get", "http://a/")) == key(prepare("GET", "http://a/"))
+    assert key(prepare("get", "http://a/")) != key(prepare("get", "http://b/"))
+    assert key(prepare("post", "http://a", "x")) == key(
+        prepare("post", "http://a", b"x")
+    )
+    assert key(prepare("post", "http://a", "x")) != key(
+        prepare("post", "http://a", "y")
+    )
+
+    # File bodies are keyed by their contents, not their random boundaries.
+    path = tmp_path / "body.txt"
+    path.write_text("hello")
+    first, second = (
+        prepare("post", "http://a", streams.FileBody(str(path), multipart="f"))
+        for _ in range(2)
+    )
+    assert first.body.boundary != second.body.boundary
+    assert key(first) == key(second)
+    old_key = key(first)
+    path.write_text("hello!")
+    assert key(first) != old_key
+
+
+def test_record_replay(requestor, mocker, tmp_path):
+    network = mock_network(mocker)
+    store = str(tmp_path / "store")
+
+    requestor.cassette = Cassette(store, MODES.record)
+    recorded = [
+        requestor.request("items", "get"),
+        requestor.request("items", "add"),
+        requestor.request("items", "get", None, "item_id:2"),
+    ]
+    assert network.call_count == 3
+    assert recorded[1].json() == {
+        "url": "http://example.org/items",
+        "body": len('{"id": 1}'),
+    }
+
+    network.side_effect = AssertionError("sent over the network")
+    requestor.cassette = Cassette(store, MODES.replay)
+    replayed = [
+        requestor.request("items", "get"),
+        requestor.request("items", "add"),
+        requestor.request("items", "get", None, "item_id:2"),
+    ]
+    for old, new in zip(recorded, replayed):
+        assert new.status_code == 201
+        assert new.reason == "Created"
+        assert new.raw.version == 11
+        assert new.headers == old.headers
+        assert new.cookies["a"] == "1"
+        assert new.content == old.content
+        assert new.transfer.wire_size == old.transfer.wire_size
+
+    with pytest.raises(CassetteError) as exc_info:
+        requestor.request("items", "get", None, "item_id:3")
+    assert "GET http://example.org/items/3" in exc_info.value.show()
+
+
+def test_replay_order(tmp_path):
+    cassette = Cassette(str(tmp_path), MODES.record)
+    request = prepare("get", "http://a")
+    response = HTTPResponse(status=200, reason="OK", version=11)
+    key = cassette.key(request)
+    cassette.record(key, request, response, b"one")
+    cassette.record(key, request, response, b"")
+    cassette.record(key, request, response, b"three")
+
+    cassette = Cassette(str(tmp_path), MODES.replay)
+    bodies = [cassette.open_body(cassette.find(key)).read() for _ in range(4)]
+    assert bodies == [b"one", b"", b"three", b"three"]
+    assert cassette.find("nope") is None
+
+
+def test_invalid_store(tmp_path):
+    with pytest.raises(CassetteError):
+        Cassette(str(tmp_path), MODES.replay)
+    (tmp_path / Cassette.INDEX_FILE).write_text('{"key": "a"}\nnope\n')
+    cassette = Cassette(str(tmp_path), MODES.replay)
+    with pytest.raises(CassetteError) as exc_info:
+        cassette.find("a")
+    assert "line 2" in exc_info.value.show()
@@ -0,0 +1,140 @@
+import datetime
+import json
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+from restcli import checks
+from restcli.exceptions import CollectionError, InputError
+from restcli.streams import Download, Transfer
+from restcli.workspace import Collection
+
+
+@pytest.fixture
+def response(mocker):
+    body = {"id": 7, "name": "Dune", "tags": ["sf"], "published": True}
+    response = mocker.Mock(
+        status_code=200,
+        headers=CaseInsensitiveDict(
+            {"Content-Type": "application/json; charset=utf-8"}
+        ),
+        elapsed=datetime.timedelta(seconds=0.1),
+        transfer=Transfer(size=10, wire_size=10, elapsed=0.05),
+        download=None,
+    )
+    response.json.side_effect = lambda: json.loads(json.dumps(body))
+    return response
+
+
+def evaluate(spec, response):
+    return {
+        result.check: result.passed
+        for result in checks.compile_expect(spec).evaluate(response)
+    }
+
+
+def test_expect(response):
+    spec = {
+        "status": [200, 201],
+        "headers": {"content-type": "^application/json"},
+        "json": {
+            "$.id": 7,
+            "$.name": {"regex": "^D", "type": "string"},
+            "$.tags[0]": {"equals": "sf"},
+            "$.published": {"equals": 1, "type": "boolean"},
+            "$.id.x": {"type": "null"},
+            "$.name[0]": "D",
+        },
+        "max_latency": 0.2,
+    }
+    assert evaluate(spec, response) == {
+        "status": True,
+        "header content-type": True,
+        "$.id equals": True,
+        "$.name regex": True,
+        "$.name type": True,
+        "$.tags[0] equals": True,
+        "$.published equals": False,
+        "$.published type": True,
+        "$.id.x type": False,
+        "$.name[0] equals": False,
+        "max_latency": True,
+    }
+    # The body is parsed once for all the checks.
+    assert response.json.call_count == 1
+
+
+def test_expect_failures(response):
+    expectations = checks.compile_expect(
+        {"status": 201, "headers": {"X-Missing": "."}, "max_latency": 0.1}
+    )
+    results = expectations.evaluate(response)
+    assert [result.to_dict() for result in results] == [
+        {"check": "status", "passed": False, "expected": 201, "actual": 200},
+        {
+            "check": "header X-Missing",
+            "passed": False,
+            "expected": ".",
+            "actual": None,
+        },
+        {
+            "check": "max_latency",
+            "passed": False,
+            "expected": 0.1,
+            "actual": 0.15,
+        },
+    ]
+    assert str(results[0]) == "FAIL status: expected 201, got 200"
+    assert not response.json.called
+
+
+def test_expect_download(response, tmp_path):
+    path = tmp_path / "body.json"
+    path.write_text('{"id": 8}')
+    response.download = Download(size=9, wire_size=9, elapsed=0, path=path)
+    assert evaluate({"json": {"$.id": 8}}, response) == {"$.id equals": True}
+    assert not response.json.called
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        {"code": 200},
+        {"status": "200"},
+        {"status": True},
+        {"status": [200, "201"]},
+        {"status": [200, True]},
+        {"headers": {"X-Foo": "("}},
+        {"json": {"$.id": {"within": [1, 2]}}},
+        {"json": {"$.id": {"type": "float"}}},
+        {"json": {"$.id": {"type": ["integer"]}}},
+        {"json": {"$.id": {"type": {"integer": 1}}}},
+        {"json": {"$.id[": 1}},
+        {"max_latency": "1s"},
+    ],
+)
+def test_expect_invalid(spec):
+    with pytest.raises(InputError):
+        checks.compile_expect(spec)
+
+
+def test_collection_expect(tmp_path):
+    path = tmp_path / "collection.yaml"
+    path.write_text(
+        "books:\n"
+        "  get:\n"
+        "    method: get\n"
+        "    url: http://localhost\n"
+        "    expect:\n"
+        "      status: 200\n"
+        "  list:\n"
+        "    method: get\n"
+        "    url: http://localhost\n"
+    )
+    collection = Collection(str(path))
+    assert list(collection.expectations) == [("books", "get")]
+    assert len(collection.expectations["books", "get"]) == 1
+
+    path.write_text(path.read_text().replace("status", "code"))
+    with pytest.raises(CollectionError):
+        collection.load()
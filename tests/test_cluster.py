@@ -0,0 +1,88 @@
+import threading
+
+import pytest
+
+from restcli.cluster import Coordinator, WorkerServer, parse_address
+from restcli.exceptions import InputError, WorkerError
+from restcli.load import LoadProfile
+
+TEST_GROUPS_PATH = "tests/resources/test_collection.yaml"
+
+
+@pytest.fixture
+def workers():
+    servers = [WorkerServer(("127.0.0.1", 0), token="s3cret") for _ in "ab"]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield [server.server_address for server in servers]
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def collection():
+    with open(TEST_GROUPS_PATH) as handle:
+        return handle.read()
+
+
+def test_coordinator(workers, collection, mocker):
+    mock = mocker.patch("requests.request")
+    mock.return_value.status_code = 200
+    mock.return_value.headers = {}
+    mock.return_value.raw.stream.return_value = iter(())
+    env = {"server": "http://example.org", "book_id": 7}
+    profile = LoadProfile("books", "edit", requests=11, concurrency=2)
+
+    report = Coordinator(workers, token="s3cret").run(collection, env, profile)
+
+    assert report.workers == 2
+    assert report.count == 11
+    assert report.statuses == {200: 11}
+    assert mock.call_count == 11
+    assert mock.call_args[1]["url"] == "http://example.org/books/7"
+
+
+def test_coordinator_fewer_requests(workers, collection, mocker):
+    mock = mocker.patch("requests.request")
+    mock.return_value.status_code = 200
+    mock.return_value.headers = {}
+    mock.return_value.raw.stream.return_value = iter(())
+    profile = LoadProfile("books", "edit", requests=1)
+
+    report = Coordinator(workers, token="s3cret").run(collection, {}, profile)
+
+    assert report.workers == 1
+    assert report.count == 1
+    assert mock.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "token, profile, error",
+    [
+        ("wrong", LoadProfile("books", "edit", requests=1), "invalid token"),
+        ("wröng", LoadProfile("books", "edit", requests=1), "invalid token"),
+        ("s3cret", LoadProfile("books", "nope", requests=1), "no such"),
+    ],
+)
+def test_coordinator_rejected(workers, collection, token, profile, error):
+    coordinator = Coordinator(workers, token=token)
+    with pytest.raises(WorkerError, match=error):
+        coordinator.run(collection, {}, profile)
+
+
+def test_coordinator_unreachable(collection):
+    with WorkerServer(("127.0.0.1", 0)) as server:
+        address = server.server_address
+    coordinator = Coordinator([address], timeout=1)
+    profile = LoadProfile("books", "edit", requests=1)
+    with pytest.raises(WorkerError):
+        coordinator.run(collection, {}, profile)
+
+
+def test_parse_address():
+    assert parse_address("7405") == ("127.0.0.1", 7405)
+    assert parse_address("example.org:80") == ("example.org", 80)
+    assert parse_address("[::1]:80") == ("::1", 80)
+    with pytest.raises(InputError):
+        parse_address("example.org")
@@ -0,0 +1,64 @@
+import gzip
+import zlib
+
+import pytest
+
+from restcli import compression
+
+DATA = b"".join(b"%d: hello, world!\n" % i for i in range(1000))
+
+
+def chunked(data, size=100):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("encoding", tuple(compression.CODECS))
+def test_roundtrip(encoding):
+    compressed = b"".join(compression.iter_compress(chunked(DATA), encoding))
+    assert len(compressed) < len(DATA)
+    decoders = compression.decoders(encoding)
+    decoded = b"".join(
+        compression.iter_decode(chunked(compressed, 7), decoders)
+    )
+    assert decoded == DATA
+
+
+@pytest.mark.parametrize("encoding", tuple(compression.CODECS))
+def test_compress(encoding):
+    compressed = compression.compress(DATA, encoding)
+    decoders = compression.decoders(encoding)
+    decoded = compression.iter_decode([compressed], decoders)
+    assert b"".join(decoded) == DATA
+
+
+def test_decode_gzip():
+    decoders = compression.decoders("gzip")
+    decoded = compression.iter_decode([gzip.compress(DATA)], decoders)
+    assert b"".join(decoded) == DATA
+
+
+def test_decode_raw_deflate():
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    compressed = compressor.compress(DATA) + compressor.flush()
+    decoders = compression.decoders("deflate")
+    decoded = compression.iter_decode(chunked(compressed), decoders)
+    assert b"".join(decoded) == DATA
+
+
+def test_decode_multiple():
+    compressed = zlib.compress(gzip.compress(DATA))
+    decoders = compression.decoders("gzip, identity, deflate")
+    assert len(decoders) == 2
+    decoded = compression.iter_decode(chunked(compressed), decoders)
+    assert b"".join(decoded) == DATA
+
+
+def test_decoders_unsupported():
+    assert compression.decoders("") == []
+    assert compression.decoders("gzip, compress") is None
+
+
+def test_accept_encoding():
+    accepted = compression.accept_encoding().split(", ")
+    assert accepted[-2:] == ["gzip", "deflate"]
+    assert set(accepted) == set(compression.CODECS)
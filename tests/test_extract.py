@@ -0,0 +1,152 @@
+import io
+import json
+
+import pytest
+from requests.structures import CaseInsensitiveDict
+
+from restcli.exceptions import InputError
+from restcli.extract import compile_extract
+from restcli.jsonpath import compile_path
+from restcli.jsonstream import JsonStream, find_paths
+from restcli.streams import Download
+
+DOCUMENT = {
+    "data": {"token": "abc", "tricky": 'a"]}\\', "empty": {}, "none": None},
+    "items": [{"id": i, "tags": ["x"] * 3} for i in range(50)],
+    "last": [1, 2, 3],
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_find_paths(chunk_size):
+    paths = {
+        "$.data.token": "abc",
+        "$.data.tricky": 'a"]}\\',
+        "$.data.none": None,
+        "$.items[49].id": 49,
+        "$.items[-1].tags": ["x"] * 3,
+        "$.last": [1, 2, 3],
+        "$.last[1]": 2,
+        "$.data.token[0]": None,
+        "$.missing": None,
+        "$.items[50]": None,
+    }
+    found = find_paths(
+        io.StringIO(json.dumps(DOCUMENT)),
+        [compile_path(path) for path in paths],
+        chunk_size,
+    )
+    assert found == {
+        compile_path(path): value
+        for path, value in paths.items()
+        if value is not None or path == "$.data.none"
+    }
+
+
+class CountingReader(io.StringIO):
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.consumed = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.consumed += len(data)
+        return data
+
+
+def test_find_paths_stops_early():
+    document = json.dumps(
+        {"token": "abc", "padding": ["x" * 100] * 1000, "other": 1}
+    )
+    handle = CountingReader(document)
+    found = find_paths(handle, [compile_path("$.token")], chunk_size=64)
+    assert found == {("token",): "abc"}
+    assert handle.consumed < 256
+
+
+def test_skip():
+    stream = JsonStream(io.StringIO('[{"a": "\\\\"}, "b\\"]", 1.5] 2'), 2)
+    stream.skip()
+    assert stream.value() == 2
+
+
+def test_find_paths_invalid():
+    with pytest.raises(ValueError):
+        find_paths(io.StringIO('{"a": '), [compile_path("$.a")])
+
+
+@pytest.fixture
+def response(mocker):
+    response = mocker.Mock(
+        headers=CaseInsensitiveDict({"X-Request-Id": "r-1"}),
+        content=json.dumps(DOCUMENT).encode(),
+        encoding=None,
+        download=None,
+    )
+    response.json.side_effect = lambda: json.loads(response.content)
+    return response
+
+
+SPEC = {
+    "token": "$.data.token",
+    "first_id": "$.items[0].id",
+    "request_id": "header:x-request-id",
+    "etag": "header:ETag",
+    "tags": 'regex:"tags": \\[(?:"x"(?:, )?)+\\]',
+    "id_49": 'regex:"id": (49)',
+    "nothing": "$.nothing",
+}
+EXTRACTED = {
+    "token": "abc",
+    "first_id": 0,
+    "request_id": "r-1",
+    "tags": '"tags": ["x", "x", "x"]',
+    "id_49": "49",
+}
+
+
+def test_extract(response):
+    assert compile_extract(SPEC).evaluate(response) == EXTRACTED
+
+
+def test_extract_parsed_body(response):
+    spec = {
+        "token": "$.data.token",
+        "char": "$.data.token[0]",
+        "last_id": "$.items[-1].id",
+    }
+    assert compile_extract(spec).evaluate(response) == {
+        "token": "abc",
+        "last_id": 49,
+    }
+    # The body is parsed by the Response, which caches it.
+    assert response.json.call_count == 1
+
+
+def test_extract_download(response, tmp_path):
+    path = tmp_path / "body.json"
+    path.write_bytes(response.content)
+    response.download = Download(size=0, wire_size=0, elapsed=0, path=path)
+    response.content = None
+    assert compile_extract(SPEC).evaluate(response) == EXTRACTED
+
+
+def test_extract_not_json(response):
+    response.content = b"<html>oops</html>"
+    extraction = compile_extract({"token": "$.token", "tag": "regex:<(\\w+)>"})
+    assert extraction.evaluate(response) == {"tag": "html"}
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        {"token": "data.token"},
+        {"token": "$.data["},
+        {"token": "header:"},
+        {"token": "regex:("},
+        {"token": 1},
+    ],
+)
+def test_extract_invalid(spec):
+    with pytest.raises(InputError):
+        compile_extract(spec)
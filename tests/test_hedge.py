@@ -0,0 +1,172 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from restcli import hedge
+from restcli.exceptions import InputError
+from restcli.hedge import HedgePolicy, LatencyTracker
+from restcli.requestor import Requestor
+
+COLLECTION = """\
+items:
+    get:
+        method: get
+        url: "http://example.org/items"
+        hedge:
+            after: 0.01
+"""
+
+KWARGS = {"method": "GET", "url": "http://example.org/items"}
+KEY = ("items", "get")
+
+
+def make_sender(mocker, *outcomes):
+    """Return a mock that sends a Request once, with each outcome in turn:
+    a response that's sent once the given Event is set, or at once if it's
+    None, or an exception to raise."""
+
+    def send_once(kwargs):
+        release, outcome = next(results)
+        if release:
+            release.wait(5)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    results = iter(outcomes)
+    return mocker.Mock(side_effect=send_once)
+
+
+def test_compile_hedge():
+    policy = hedge.compile_hedge({"percentile": 99, "after": 0.5})
+    assert policy == HedgePolicy(percentile=99, after=0.5)
+
+    for spec in (
+        {"delay": 1},
+        {"percentile": 0},
+        {"percentile": 101},
+        {"after": -1},
+        {"after": True},
+        {"max_hedges": 0},
+    ):
+        with pytest.raises(InputError):
+            hedge.compile_hedge(spec)
+
+
+def test_tracker_delay():
+    tracker = LatencyTracker()
+    policy = HedgePolicy(percentile=50, min_samples=4, after=2.0)
+    assert tracker.delay(KEY, policy) == 2.0
+    assert tracker.delay(KEY, HedgePolicy()) is None
+    for seconds in (0.1, 0.2, 0.3, 5.0):
+        tracker.record(KEY, seconds)
+    assert tracker.delay(KEY, policy) == pytest.approx(0.2, rel=0.01)
+    assert tracker.delay(("items", "add"), policy) == 2.0
+
+
+def test_send_fast(mocker):
+    tracker = LatencyTracker()
+    response = mocker.Mock()
+    send_once = make_sender(mocker, (None, response))
+    policy = HedgePolicy(after=5)
+
+    assert hedge.send(KWARGS, send_once, policy, tracker, KEY) == (
+        response,
+        0,
+        False,
+    )
+    assert send_once.call_count == 1
+    assert tracker.histograms[KEY].count == 1
+
+
+def test_send_hedged(mocker):
+    tracker = LatencyTracker()
+    slow, fast = mocker.Mock(), mocker.Mock()
+    release = threading.Event()
+    send_once = make_sender(mocker, (release, slow), (None, fast))
+    policy = HedgePolicy(after=0.01)
+
+    result = hedge.send(KWARGS, send_once, policy, tracker, KEY)
+    assert result == (fast, 1, True)
+    # Hedges are sent with a copy of the kwargs.
+    assert send_once.call_args_list[1][0][0] == KWARGS
+    assert send_once.call_args_list[1][0][0] is not KWARGS
+
+    # The loser is closed once it arrives, and its latency still counts.
+    assert not slow.close.called
+    release.set()
+    for _ in range(100):
+        if slow.close.called:
+            break
+        time.sleep(0.01)
+    assert slow.close.called
+    assert tracker.histograms[KEY].count == 1
+    assert not fast.close.called
+
+
+def test_send_hedge_fails(mocker):
+    tracker = LatencyTracker()
+    response = mocker.Mock()
+    release = threading.Event()
+    send_once = make_sender(
+        mocker, (release, response), (None, requests.ConnectionError())
+    )
+    policy = HedgePolicy(after=0.01, max_hedges=3)
+
+    timer = threading.Timer(0.1, release.set)
+    timer.start()
+    result = hedge.send(KWARGS, send_once, policy, tracker, KEY)
+    timer.join()
+    # No more hedges are sent after one failed.
+    assert result == (response, 1, False)
+    assert send_once.call_count == 2
+
+    send_once = make_sender(
+        mocker,
+        (None, requests.ConnectionError()),
+    )
+    with pytest.raises(requests.ConnectionError):
+        hedge.send(KWARGS, send_once, policy, tracker, KEY)
+
+
+def test_send_unsafe(mocker):
+    tracker = LatencyTracker()
+    policy = HedgePolicy(after=0)
+    for kwargs in (
+        {**KWARGS, "method": "post"},
+        {**KWARGS, "data": iter([b"chunk"])},
+    ):
+        send_once = make_sender(mocker, (None, mocker.Mock()))
+        _, hedges, _ = hedge.send(kwargs, send_once, policy, tracker, KEY)
+        assert hedges == 0
+
+
+def test_request_hedge(tmp_path, mocker):
+    path = tmp_path / "collection.yaml"
+    path.write_text(COLLECTION)
+    requestor = Requestor(str(path))
+    release = threading.Event()
+    responses = iter([(release, 502), (None, 200)])
+
+    def request(**kwargs):
+        wait, status = next(responses)
+        if wait:
+            wait.wait(5)
+        response = mocker.Mock(
+            status_code=status,
+            reason="",
+            headers={},
+            encoding=None,
+            content=b"",
+        )
+        response.raw.stream.return_value = iter([])
+        return response
+
+    mocker.patch("requests.request", side_effect=request)
+    response = requestor.request("items", "get")
+    release.set()
+
+    assert response.status_code == 200
+    assert (response.hedges, response.hedge_won) == (1, True)
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from restcli.exceptions import InputError
+from restcli.jobs import JOB_STATES, JobManager
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(workers=2)
+    yield manager
+    manager.shutdown()
+
+
+def test_submit(manager):
+    job = manager.submit("add", lambda a, b: a + b, 1, b=2)
+    assert job.result(timeout=5) == 3
+    assert job.state == JOB_STATES.done
+    assert job.elapsed >= 0
+    assert manager.get(job.id) is job
+    assert manager.get(str(job.id)) is job
+
+
+def test_states(manager):
+    release = threading.Event()
+    jobs = [manager.submit(str(i), release.wait, 5) for i in range(3)]
+    try:
+        # Two workers, so the third Job has to wait.
+        assert jobs[2].state == JOB_STATES.queued
+        assert manager.counts()["queued"] >= 1
+    finally:
+        release.set()
+    for job in jobs:
+        job.result(timeout=5)
+    assert manager.counts() == {"done": 3}
+
+    failed = manager.submit("fail", lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        failed.result(timeout=5)
+    assert failed.state == JOB_STATES.failed
+
+
+def test_notify():
+    finished = []
+    manager = JobManager(notify=finished.append)
+    job = manager.submit("noop", lambda: None)
+    manager.shutdown()
+    assert finished == [job]
+
+
+def test_latest_and_clear(manager):
+    assert manager.latest() is None
+    release = threading.Event()
+    done = manager.submit("done", lambda: None)
+    done.result(timeout=5)
+    running = manager.submit("running", release.wait, 5)
+    assert manager.latest() is running
+
+    manager.clear()
+    assert list(manager.jobs) == [running.id]
+    with pytest.raises(InputError):
+        manager.get(done.id)
+    release.set()
+
+
+@pytest.mark.parametrize("job_id", [42, "x"])
+def test_get_missing(manager, job_id):
+    with pytest.raises(InputError):
+        manager.get(job_id)
@@ -0,0 +1,36 @@
+import json
+from collections import OrderedDict
+
+import pytest
+
+from restcli import json_utils
+
+
+def test_round_trip():
+    data = OrderedDict([("z", 1), ("a", [1.5, None, True]), ("m", {})])
+    for indent in (None, 2):
+        text = json_utils.dumps(data, indent=indent)
+        assert list(json_utils.loads(text)) == ["z", "a", "m"]
+        assert json_utils.loads(json_utils.dumpb(data, indent)) == data
+
+
+def test_indent():
+    """Indented output matches the stdlib, whichever backend is used."""
+    data = {"a": [1, {"b": "c"}], "d": {}, "e": []}
+    assert json_utils.dumps(data, indent=2) == json.dumps(data, indent=2)
+
+
+def test_big_ints():
+    assert json_utils.loads("[18446744073709551616]") == [2 ** 64]
+    assert json_utils.dumps([2 ** 64]) == "[18446744073709551616]"
+
+
+@pytest.mark.parametrize("data", ["", "{", b"[1,]", "nan"])
+def test_loads_invalid(data):
+    with pytest.raises(json.JSONDecodeError):
+        json_utils.loads(data)
+
+
+def test_dumps_invalid():
+    with pytest.raises(TypeError):
+        json_utils.dumps({"a": object()})
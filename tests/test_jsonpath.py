@@ -0,0 +1,39 @@
+import pytest
+
+from restcli import jsonpath
+from restcli.exceptions import InputError
+
+
+@pytest.mark.parametrize(
+    "path, steps",
+    [
+        ("$", ()),
+        ("", ()),
+        (".a", ("a",)),
+        ("$.a.b", ("a", "b")),
+        (".a[0][-1]", ("a", 0, -1)),
+        ("$['a.b'][\"c\"]", ("a.b", "c")),
+        ("$['it\\'s']", ("it's",)),
+        (".conditions[0].variable", ("conditions", 0, "variable")),
+    ],
+)
+def test_compile_path(path, steps):
+    assert jsonpath.compile_path(path) == steps
+    assert jsonpath.compile_path(jsonpath.fmt_path(steps)) == steps
+
+
+@pytest.mark.parametrize("path", ["a", ".", ".a[", ".a[x]", "$['a]", "$$"])
+def test_compile_path_invalid(path):
+    with pytest.raises(InputError):
+        jsonpath.compile_path(path)
+
+
+def test_resolve():
+    data = {"a": [{"b": 1}]}
+    assert jsonpath.resolve(data, ("a", 0, "b")) == 1
+    assert jsonpath.resolve(data, ()) is data
+    assert jsonpath.resolve(data, ("a", -1, "b")) == 1
+    for path in (("x",), ("a", 1), ("a", "b"), ("a", 0, "b", 0), (0,)):
+        assert jsonpath.resolve(data, path) is jsonpath.MISSING
+    # Strings aren't indexed into.
+    assert jsonpath.resolve({"a": "xyz"}, ("a", 0)) is jsonpath.MISSING
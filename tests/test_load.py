@@ -0,0 +1,119 @@
+import itertools
+import random
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from restcli.load import Histogram, LoadProfile, LoadReport, run_load
+
+
+def test_histogram_percentiles():
+    random.seed(1)
+    latencies = [random.uniform(0.001, 2.0) for _ in range(10000)]
+    histogram = Histogram()
+    for latency in latencies:
+        histogram.record(latency)
+
+    latencies.sort()
+    for percent in (1, 50, 90, 99, 100):
+        exact = latencies[int(len(latencies) * percent / 100) - 1]
+        approx = histogram.percentile(percent)
+        assert exact <= approx <= exact * (1 + Histogram.PRECISION)
+    assert histogram.min == latencies[0]
+    assert histogram.max == latencies[-1]
+    assert histogram.mean == pytest.approx(sum(latencies) / len(latencies))
+    assert Histogram().percentile(50) is None
+
+
+def test_histogram_merge():
+    latencies = [0.0000001, 0.002, 0.01, 0.5, 3.0, 0.0005]
+    whole = Histogram()
+    parts = [Histogram(), Histogram()]
+    for i, latency in enumerate(latencies):
+        whole.record(latency)
+        parts[i % 2].record(latency)
+
+    merged = Histogram.from_dict(parts[0].to_dict()).merge(parts[1])
+    assert merged.to_dict() == whole.to_dict()
+    assert merged.percentile(50) == whole.percentile(50)
+
+
+def test_profile_split():
+    profile = LoadProfile("g", "r", ("a:=1",), requests=10, concurrency=2)
+    shares = profile.split(3)
+    assert [share.requests for share in shares] == [4, 3, 3]
+    assert all(share.concurrency == 2 for share in shares)
+    assert LoadProfile.from_dict(profile.to_dict()) == profile
+
+    profile = LoadProfile("g", "r", duration=1.5)
+    assert profile.split(2) == [profile, profile]
+
+    # Workers don't get empty shares, which would mean no limit.
+    profile = LoadProfile("g", "r", requests=1)
+    assert profile.split(2) == [profile]
+
+
+def test_report_merge():
+    report = LoadReport(statuses=Counter({200: 3}), elapsed=1.0)
+    other = LoadReport(
+        statuses=Counter({200: 1, 503: 2}),
+        errors=Counter({"ConnectionError": 1}),
+        hedges=2,
+        hedge_wins=1,
+        elapsed=2.0,
+    )
+    other = LoadReport.from_dict(other.to_dict())
+    report.merge(other)
+    assert report.statuses == {200: 4, 503: 2}
+    assert report.errors == {"ConnectionError": 1}
+    assert (report.hedges, report.hedge_wins) == (2, 1)
+    assert report.elapsed == 2.0
+    assert report.workers == 2
+
+
+def test_run_load():
+    calls = []
+    counter = itertools.count(1)
+
+    def request(group, name, updater):
+        calls.append((group, name))
+        number = next(counter)
+        if number == 3:
+            raise ConnectionError("refused")
+        return SimpleNamespace(
+            status_code=200 if number % 2 else 500,
+            hedges=number % 4 == 0,
+            hedge_won=number == 4,
+            resolve_time=0.5 if number == 1 else 0.0,
+        )
+
+    requestor = SimpleNamespace(request=request)
+    profile = LoadProfile("books", "edit", requests=9, concurrency=3)
+    report = run_load(requestor, profile)
+
+    assert calls == [("books", "edit")] * 9
+    assert report.count == 9
+    assert report.histogram.count == 8
+    assert report.statuses == {200: 4, 500: 4}
+    assert report.errors == {"ConnectionError": 1}
+    assert (report.hedges, report.hedge_wins) == (2, 1)
+    assert (report.resolves, report.resolve_time) == (1, 0.5)
+
+
+def test_run_load_no_requests():
+    requestor = SimpleNamespace(request=pytest.fail)
+    report = run_load(requestor, LoadProfile("books", "edit", requests=0))
+    assert report.count == 0
+
+
+def test_run_load_duration():
+    requestor = SimpleNamespace(
+        request=lambda *args: SimpleNamespace(
+            status_code=204, hedges=0, hedge_won=False, resolve_time=0.0
+        )
+    )
+    profile = LoadProfile("books", "edit", duration=0.05, concurrency=2)
+    report = run_load(requestor, profile)
+    assert report.count > 0
+    assert 0.05 <= report.elapsed < 1
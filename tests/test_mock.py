@@ -0,0 +1,207 @@
+import asyncio
+import json
+
+import pytest
+import requests
+from urllib3 import HTTPResponse
+
+from restcli.cassette import MODES, Cassette
+from restcli.exceptions import CollectionError
+from restcli.mock import MockServer, path_pattern
+from restcli.workspace import Collection
+
+COLLECTION = """\
+users:
+    get:
+        method: get
+        url: "{{ server }}/users/{{ user_id }}?full={{ full }}"
+        mock:
+            headers:
+                X-Mock: "yes"
+            body: |
+                id: {{ user_id }}
+                team: {{ team }}
+    me:
+        method: get
+        url: "{{ server }}/users/me"
+        mock:
+            body: "id: 0"
+    delete:
+        method: delete
+        url: "https://{{ host }}:8443/users/{{ user_id }}"
+        mock:
+            status: 204
+            latency: 0.5
+    flaky:
+        method: post
+        url: "/flaky"
+        mock:
+            error_rate: 1
+"""
+
+
+@pytest.fixture
+def collection(tmp_path):
+    path = tmp_path / "collection.yaml"
+    path.write_text(COLLECTION)
+    return Collection(str(path))
+
+
+@pytest.fixture
+def server(collection):
+    return MockServer(collection, {"team": "red"})
+
+
+@pytest.mark.parametrize(
+    "url, path, params",
+    (
+        ("{{ server }}/users/{{ id }}", "/users/7", {"id": "7"}),
+        ("http://{{ host }}:80/a/{{ b|int }}/c", "/a/1/c", {}),
+        ("https://example.org/a?b={{ c }}", "/a", {}),
+        ("/a/{{ b }}-{{ c }}.json#top", "/a/1-2.json", {"b": "1", "c": "2"}),
+        ("{{ server }}", "/", {}),
+        ("http://example.org", "/", {}),
+    ),
+)
+def test_path_pattern(url, path, params):
+    pattern, _ = path_pattern(url)
+    match = pattern.fullmatch(path)
+    assert match
+    assert match.groupdict() == params
+
+
+def test_path_pattern_segments():
+    pattern, specificity = path_pattern("{{ server }}/users/{{ id }}")
+    assert specificity == len("/users/")
+    assert not pattern.fullmatch("/users/")
+    assert not pattern.fullmatch("/users/1/posts")
+
+
+def test_respond(server):
+    reply = server.respond("GET", "/users/5?full=1")
+    assert reply.status == 200
+    assert reply.headers == {
+        "X-Mock": "yes",
+        "Content-Type": "application/json",
+    }
+    assert reply.body == b'{"id": 5, "team": "red"}'
+    assert reply.latency == 0
+
+    # More specific paths win.
+    assert server.respond("get", "/users/me").body == b'{"id": 0}'
+
+    reply = server.respond("DELETE", "/users/5")
+    assert (reply.status, reply.body, reply.latency) == (204, b"", 0.5)
+
+    assert server.respond("GET", "/nope").status == 404
+    assert server.respond("PUT", "/users/5").status == 405
+    assert server.respond("POST", "/flaky").status == 503
+
+
+def test_respond_broken_body(tmp_path):
+    path = tmp_path / "collection.yaml"
+    path.write_text(
+        "items:\n"
+        "  yaml:\n"
+        "    method: get\n"
+        "    url: /yaml\n"
+        "    mock: {body: 'id: [{{ 1 }}'}\n"
+        "  jinja:\n"
+        "    method: get\n"
+        "    url: /jinja\n"
+        "    mock: {body: 'id: {{ nope.a.b }}'}\n"
+    )
+    server = MockServer(Collection(str(path)))
+    for target in ("/yaml", "/jinja"):
+        reply = server.respond("GET", target)
+        assert reply.status == 500
+        assert json.loads(reply.body)["error"]
+
+
+def test_respond_injection(collection):
+    server = MockServer(collection, latency=0.1, error_rate=1)
+    reply = server.respond("GET", "/users/me")
+    assert (reply.status, reply.latency) == (503, 0.1)
+    # The Request's own settings win.
+    reply = server.respond("DELETE", "/users/5")
+    assert (reply.status, reply.latency) == (503, 0.5)
+
+
+def test_respond_recorded(collection, tmp_path):
+    cassette = Cassette(str(tmp_path), MODES.record)
+    request = requests.Request(
+        "GET", "http://example.org/users/5?full=1"
+    ).prepare()
+    response = HTTPResponse(
+        headers={"Content-Length": "3", "X-Recorded": "1"},
+        status=201,
+        reason="Created",
+        version=11,
+    )
+    for body in (b"old", b"new"):
+        cassette.record(cassette.key(request), request, response, body)
+
+    server = MockServer(collection, cassette=Cassette(str(tmp_path)))
+    reply = server.respond("GET", "/users/5?full=1")
+    assert (reply.status, reply.headers, reply.body) == (
+        201,
+        {"X-Recorded": "1"},
+        b"new",
+    )
+    # Other queries fall back to the mock response.
+    assert server.respond("GET", "/users/5?full=0").status == 200
+
+    # Recorded responses are served even if no Request matches them.
+    request = requests.Request("PUT", "http://example.org/a").prepare()
+    cassette.record(cassette.key(request), request, response, b"")
+    server = MockServer(collection, cassette=Cassette(str(tmp_path)))
+    assert server.respond("PUT", "/a").status == 201
+
+
+def test_serve(server):
+    async def exchange(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            b"POST /flaky HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+            b"3\r\nabc\r\n0\r\n\r\n"
+            b"GET /users/1 HTTP/1.1\r\nConnection: close\r\n\r\n"
+        )
+        await writer.drain()
+        data = await reader.read()
+        writer.close()
+        return data
+
+    async def main():
+        ready = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(
+            server.serve("127.0.0.1", 0, ready.set_result)
+        )
+        _, port = await ready
+        try:
+            return await exchange(port)
+        finally:
+            task.cancel()
+
+    data = asyncio.run(main())
+    first, second = data.split(b"HTTP/1.1 ")[1:]
+    assert first.startswith(b"503 Service Unavailable\r\n")
+    assert b"Connection: close" not in first
+    assert second.startswith(b"200 OK\r\n")
+    assert b"Connection: close\r\n" in second
+    assert second.endswith(b'\r\n\r\n{"id": 1, "team": "red"}')
+
+
+@pytest.mark.parametrize(
+    "mock",
+    (
+        "{nope: 1}",
+        "{status: ok}",
+        "{latency: fast}",
+        "{error_rate: 2}",
+    ),
+)
+def test_invalid_mock(tmp_path, mock):
+    path = tmp_path / "collection.yaml"
+    path.write_text(f"g:\n  r:\n    method: get\n    url: /\n    mock: {mock}")
+    with pytest.raises(CollectionError):
+        Collection(str(path))
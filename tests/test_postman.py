@@ -0,0 +1,169 @@
+import io
+import json
+from collections import OrderedDict
+
+import pytest
+
+from restcli import postman
+from restcli import yaml_utils as yaml
+
+
+def request_info(name, url, **request):
+    return {
+        "name": name,
+        "request": {"method": "GET", "url": url, "header": [], **request},
+    }
+
+
+COLLECTION = {
+    "info": {"name": "Demo", "schema": "v2.1"},
+    "item": [
+        {
+            "name": "Users",
+            "item": [
+                request_info(
+                    "List Users",
+                    {"raw": "{{baseUrl}}/users", "host": ["{{baseUrl}}"]},
+                    header=[{"key": "X-Token", "value": "{{Token}}"}],
+                ),
+                {
+                    "name": "Admin Ops",
+                    "item": [request_info("Ban", "{{baseUrl}}/ban")],
+                },
+                request_info("Get User", "{{baseUrl}}/users/1"),
+            ],
+        },
+        request_info("Ping", "{{baseUrl}}/ping"),
+        # Folders with "item" before "name" are decoded whole.
+        {"item": [request_info("Late", "x")], "name": "Late Named"},
+    ],
+    "variable": [{"key": "baseUrl", "value": 12345678901234567890}],
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, postman.CHUNK_SIZE])
+def test_iter_collection(chunk_size):
+    handle = io.StringIO(json.dumps(COLLECTION, indent=2))
+    events = [
+        (path, info and info["name"])
+        for path, info in postman.iter_collection(handle, chunk_size)
+    ]
+    assert events == [
+        (("Users",), "List Users"),
+        (("Users", "Admin Ops"), "Ban"),
+        (("Users", "Admin Ops"), None),
+        (("Users",), "Get User"),
+        (("Users",), None),
+        ((), "Ping"),
+        (("Late Named",), "Late"),
+        (("Late Named",), None),
+        ((), None),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64])
+def test_json_stream(chunk_size):
+    document = [123456789, -1.5e10, 'a "quoted" str', {"a": [1, 2]}, []]
+    stream = postman.JsonStream(io.StringIO(json.dumps(document)), chunk_size)
+    stream.expect("[")
+    values = []
+    while True:
+        values.append(stream.value())
+        if stream.expect(",]") == "]":
+            break
+    assert values == document
+    assert stream.peek() == ""
+
+
+def test_json_stream_invalid():
+    stream = postman.JsonStream(io.StringIO('{"a": [1, 2'), chunk_size=4)
+    stream.expect("{")
+    stream.value()
+    stream.expect(":")
+    with pytest.raises(ValueError):
+        stream.value()
+
+
+def test_parse_collection():
+    handle = io.StringIO(json.dumps(COLLECTION))
+    groups = []
+    postman.parse_collection(
+        handle, lambda name, group: groups.append((name, group))
+    )
+    assert [(name, list(group)) for name, group in groups] == [
+        ("users/admin-ops", ["ban"]),
+        ("users", ["list-users", "get-user"]),
+        ("late-named", ["late"]),
+        ("default", ["ping"]),
+    ]
+    assert groups[1][1]["list-users"] == OrderedDict(
+        (
+            ("method", "get"),
+            ("url", "{{baseUrl}}/users"),
+            ("headers", OrderedDict((("X-Token", "{{Token}}"),))),
+        )
+    )
+
+
+def test_parse_collection_duplicates():
+    collection = {
+        "item": [
+            {"name": "Things", "item": [request_info("A", "a")]},
+            {"name": "things", "item": [request_info("B", "b")]},
+            request_info("Dup", "1"),
+            request_info("dup", "2"),
+        ]
+    }
+    groups = {}
+    with pytest.warns(UserWarning):
+        postman.parse_collection(
+            io.StringIO(json.dumps(collection)), groups.__setitem__
+        )
+    assert list(groups) == ["things", "default"]
+    assert list(groups["things"]) == ["a"]
+    assert groups["default"]["dup"]["url"] == "1"
+
+
+def test_group_writer(tmp_path):
+    write_group = postman.group_writer(str(tmp_path / "out"))
+    write_group("users/admin-ops", {"ban": {"method": "get", "url": "x"}})
+    path = tmp_path / "out" / "users" / "admin-ops.yaml"
+    assert list(yaml.load(path.read_text())) == ["users/admin-ops"]
+
+    for name in ("../../etc", "users/../../x"):
+        with pytest.raises(ValueError, match="outside"):
+            write_group(name, {})
+    assert not (tmp_path / "x.yaml").exists()
+
+    # Folders with names that resolve to the same file are refused.
+    with pytest.raises(ValueError, match="both"):
+        write_group("users/./admin-ops", {})
+    with pytest.raises(ValueError, match="both"):
+        write_group("users//admin-ops", {})
+
+
+def test_parse_collection_dot_folders(tmp_path):
+    collection = {
+        "item": [
+            {
+                "name": "..",
+                "item": [{"name": "..", "item": [request_info("A", "a")]}],
+            }
+        ]
+    }
+    write_group = postman.group_writer(str(tmp_path / "out"))
+    with pytest.raises(ValueError):
+        postman.parse_collection(
+            io.StringIO(json.dumps(collection)), write_group
+        )
+    assert list(tmp_path.rglob("*.yaml")) == []
+
+
+def test_dump_group():
+    output = postman.dump_group(
+        "users", {"get": {"method": "get", "url": "{{baseUrl}}/{{Id}}"}}
+    )
+    assert "{{ baseurl }}/{{ id }}" in output
+    assert yaml.load(output) == {
+        "users": {"get": {"method": "get", "url": "{{ baseurl }}/{{ id }}"}}
+    }
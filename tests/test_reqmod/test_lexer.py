@@ -1,7 +1,15 @@
+import argparse
 import operator
+import random
+import string
 from functools import reduce
 
+import click
+import pytest
+
+import tests.random_gen as gen
 from restcli.reqmod import lexer
+from restcli.reqmod.lexer import ACTIONS
 from tests.helpers import contents_equal
 
 
@@ -75,3 +83,168 @@ class TestDelete(LexerTestMixin):
 
     def transform_args(self, args):
         return intersperse_left("-d", args)
+
+
+# Reference implementations
+# --------------------------------------------------------------------------
+# These are the original argparse-based `lex` and char-by-char `tokenize`.
+# The rewritten versions must produce the same results. `reference_tokenize`
+# has one fix: the original looped forever on trailing whitespace.
+
+
+class ReferenceArgumentParser(argparse.ArgumentParser):
+    def error(self, message):
+        raise click.UsageError(message)
+
+
+reference_lexer = ReferenceArgumentParser(prog="lexer", add_help=False)
+reference_lexer.add_argument("-a", "--append", action="append")
+reference_lexer.add_argument("-n", "--assign", action="append")
+reference_lexer.add_argument("-d", "--delete", action="append")
+reference_lexer.add_argument("args", nargs="*")
+
+
+def reference_lex(argv):
+    opts = vars(reference_lexer.parse_args(argv))
+    args = opts.pop("args")
+    lexemes = [
+        lexer.Lexeme(action, val)
+        for action, values in opts.items()
+        if values is not None
+        for val in values
+    ]
+    lexemes.extend(lexer.Lexeme(ACTIONS.assign, token) for token in args)
+    return lexemes
+
+
+def reference_tokenize(s, sep=string.whitespace):
+    tokens = []
+    token = ""
+    current_quote = None
+
+    chars = iter(s)
+    char = next(chars, "")
+
+    while char:
+        if char in lexer.QUOTES:
+            if char == current_quote:
+                current_quote = None
+            elif not current_quote:
+                current_quote = char
+        elif char in lexer.ESCAPES:
+            token += char
+            char = next(chars, "")
+        elif not current_quote and char in sep:
+            while char and char in sep:
+                char = next(chars, "")
+            tokens.append(token)
+            token = ""
+            continue
+
+        token += char
+        char = next(chars, "")
+
+    tokens.append(token)
+    return tokens
+
+
+# Randomized comparisons against the reference implementations
+# --------------------------------------------------------------------------
+
+TEST_ITERATIONS = 500
+
+TOKENIZER_ALPHABET = "ab:=.[]" + lexer.QUOTES + lexer.ESCAPES * 2 + " \t\n"
+
+
+def random_text(alphabet, max_len=30):
+    return "".join(
+        random.choice(alphabet) for _ in range(random.randint(0, max_len))
+    )
+
+
+def random_arg():
+    value = random_text(gen.ALPHANUMERIC_CHARS + ":=.[]\"' ", 12)
+    return random.choice(
+        (
+            [value],
+            [value],
+            ["-a", value],
+            ["-n", value],
+            ["-d", value],
+            ["--delete", value],
+            ["--app", value],
+            [f"--assign={value}"],
+            [f"-d{value}"],
+            [f"-n={value}"],
+            ["-12"],
+            ["-.5"],
+            ["-"],
+        )
+    )
+
+
+def test_tokenize_matches_reference():
+    for _ in range(TEST_ITERATIONS):
+        s = random_text(TOKENIZER_ALPHABET)
+        assert lexer.tokenize(s) == reference_tokenize(s)
+
+
+def test_tokenize_custom_sep_matches_reference():
+    for _ in range(TEST_ITERATIONS):
+        s = random_text(TOKENIZER_ALPHABET + ",;")
+        assert lexer.tokenize(s, sep=",;") == reference_tokenize(s, sep=",;")
+
+
+def test_tokenize_trailing_whitespace():
+    assert lexer.tokenize(" foo  'b a r' \t") == ["", "foo", "'b a r'", ""]
+
+
+def test_lex_matches_reference():
+    for _ in range(TEST_ITERATIONS):
+        argv = [
+            arg for _ in range(random.randint(0, 6)) for arg in random_arg()
+        ]
+        # argparse can't intermix positional args with flags, so skip
+        # argvs that the reference rejects for that reason alone.
+        try:
+            expected = reference_lex(argv)
+        except click.UsageError:
+            continue
+        assert sorted(lexer.lex(argv)) == sorted(expected)
+
+
+def test_lex_order():
+    argv = ["foo:bar", "-d", "foo:", "-a", "x=y", "z:=1"]
+    assert lexer.lex(argv) == [
+        (ACTIONS.assign, "foo:bar"),
+        (ACTIONS.delete, "foo:"),
+        (ACTIONS.append, "x=y"),
+        (ACTIONS.assign, "z:=1"),
+    ]
+
+
+def test_lex_double_dash():
+    argv = ["-a", "x=y", "--", "-d", "--append"]
+    assert lexer.lex(argv) == [
+        (ACTIONS.append, "x=y"),
+        (ACTIONS.assign, "-d"),
+        (ACTIONS.assign, "--append"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "argv",
+    (
+        ["-x"],
+        ["--foo=bar"],
+        ["-a"],
+        ["foo:bar", "-d"],
+        ["-n", "-d", "foo:"],
+        ["--a", "foo:bar"],
+    ),
+)
+def test_lex_errors(argv):
+    with pytest.raises(click.UsageError):
+        reference_lex(argv)
+    with pytest.raises(click.UsageError):
+        lexer.lex(argv)
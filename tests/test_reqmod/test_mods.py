@@ -25,8 +25,7 @@ class ModTypesTestMixin:
     ):
         if input_key is DEFAULT:
             input_key = gen.alphanum(11)
-        mod_str = cls.mod_cls.delimiter.join((input_key, input_val))
-        mod = cls.mod_cls.match(mod_str)
+        mod = cls.mod_cls(key=input_key, value=input_val)
 
         if expected_key is DEFAULT:
             expected_key = input_key
@@ -203,3 +202,58 @@ class TestStrFieldMod(ModTypesTestMixin):
             input_val=gen.unicode(),
             input_key=gen.unicode(),
         )
+
+
+class TestBodyFileMod:
+
+    mod_cls = mods.BodyFileMod
+
+    def test_path(self):
+        mod = mods.parse_mod("@/tmp/foo:bar==baz.json")
+        assert isinstance(mod, self.mod_cls)
+        assert mod.param is None
+        assert mod.key == "body_file"
+        assert mod.value == "/tmp/foo:bar==baz.json"
+
+    def test_no_prefix(self):
+        with pytest.raises(ReqModSyntaxError):
+            self.mod_cls.match("foo@bar")
+
+
+class TestParseMod:
+    @pytest.mark.parametrize(
+        "mod_str, mod_cls, key, value",
+        (
+            ("foo:=5", mods.JsonFieldMod, "foo", 5),
+            ("foo==bar", mods.UrlParamMod, "foo", "bar"),
+            ("foo:bar", mods.HeaderMod, "foo", "bar"),
+            ("foo=bar", mods.StrFieldMod, "foo", "bar"),
+            # The earliest delimiter wins...
+            ("foo:bar=baz:=5", mods.HeaderMod, "foo", "bar=baz:=5"),
+            ("foo=bar:=5", mods.StrFieldMod, "foo", "bar:=5"),
+            ("foo==bar:baz", mods.UrlParamMod, "foo", "bar%3Abaz"),
+            # ...unless it's escaped.
+            ("foo\\:bar=baz", mods.StrFieldMod, "foo\\:bar", "baz"),
+            ("foo\\==bar", mods.StrFieldMod, "foo\\=", "bar"),
+            ("a\\=\\===b=c", mods.UrlParamMod, "a%5C%3D%5C%3D", "b%3Dc"),
+        ),
+    )
+    def test_dispatch(self, mod_str, mod_cls, key, value):
+        mod = mods.parse_mod(mod_str)
+        assert type(mod) is mod_cls
+        assert mod.key == key
+        assert mod.value == value
+
+    def test_no_delimiter(self):
+        with pytest.raises(ReqModSyntaxError):
+            mods.parse_mod("foobar")
+        with pytest.raises(ReqModSyntaxError):
+            mods.parse_mod(":foobar")
+
+    def test_memoized(self):
+        mod_str = f"{gen.alphanum(11)}:=[1, 2]"
+        assert mods.parse_mod(mod_str) is mods.parse_mod(mod_str)
+
+    def test_invalid_json(self):
+        with pytest.raises(ReqModValueError):
+            mods.parse_mod(f"{gen.alphanum(11)}:=[1, 2")
@@ -7,8 +7,13 @@ import pytest
 import pytest_mock  # noqa: F401
 
 from restcli import yaml_utils as yaml
+from restcli.exceptions import (
+    ReqModError,
+    ReqModKeyError,
+    ReqModSyntaxError,
+)
 from restcli.reqmod import parser
-from restcli.reqmod.lexer import ACTIONS
+from restcli.reqmod.lexer import ACTIONS, Lexeme
 
 
 @pytest.fixture
@@ -65,3 +70,165 @@ class TestParse:
         calls = [call(lexemes)]
         assert mock_parser.call_count == 1
         assert mock_parser.call_args_list == calls
+
+
+def test_parse_reapply():
+    """Applying the same Updates twice must not leak state between Requests."""
+    lexemes = (
+        Lexeme(ACTIONS.assign, "colors:=[1]"),
+        Lexeme(ACTIONS.append, "colors:=[2]"),
+    )
+    for _ in range(2):
+        updates = parser.parse(lexemes)
+        request = {"body": {}}
+        updates.apply(request)
+        assert request == {"body": {"colors": [1, 2]}}
+
+
+def apply_mods(request, *lexemes):
+    updates = parser.parse(Lexeme(action, value) for action, value in lexemes)
+    updates.apply(request)
+    return request
+
+
+def test_parse_nested():
+    request = {
+        "headers": {".x": "1"},
+        "body": {
+            "location": {"addr1": "1 Main St", "addr2": "Apt 2"},
+            "conditions": [{"variable": "temp"}, {"variable": "humidity"}],
+        },
+    }
+    apply_mods(
+        request,
+        (ACTIONS.assign, ".location.postal_code:=33705"),
+        (ACTIONS.assign, ".conditions[0].variable=ambient_light"),
+        (ACTIONS.delete, ".location.addr2="),
+        (ACTIONS.append, ".conditions[-1].variable=_max"),
+        (ACTIONS.assign, ".x:2"),
+        (ACTIONS.assign, "literal.key:=1"),
+    )
+    assert request == {
+        "headers": {".x": "2"},
+        "body": {
+            "location": {"addr1": "1 Main St", "postal_code": 33705},
+            "conditions": [
+                {"variable": "ambient_light"},
+                {"variable": "humidity_max"},
+            ],
+            "literal.key": 1,
+        },
+    }
+
+
+def test_parse_nested_no_copy():
+    untouched = {"deep": [1, 2, 3]}
+    request = {"body": {"a": {"b": 1}, "untouched": untouched}}
+    apply_mods(request, (ACTIONS.assign, ".a.b:=2"))
+    assert request["body"]["a"] == {"b": 2}
+    assert request["body"]["untouched"] is untouched
+
+
+@pytest.mark.parametrize(
+    "lexemes",
+    [
+        # Replace a subtree, then update inside the new subtree
+        (
+            (ACTIONS.assign, '.a:={"b": {"c": 1}}'),
+            (ACTIONS.assign, ".a.b.c:=2"),
+            (ACTIONS.delete, ".a="),
+            (ACTIONS.assign, ".a:=[]"),
+            (ACTIONS.append, ".a:=[1, 2, 3]"),
+        ),
+        # Deletions shift the indices of later siblings
+        (
+            (ACTIONS.assign, ".l[1].x:=1"),
+            (ACTIONS.delete, ".l[0]="),
+            (ACTIONS.assign, ".l[1].y:=2"),
+            (ACTIONS.delete, ".l[0]="),
+        ),
+    ],
+)
+def test_parse_nested_sequential(lexemes):
+    """Batched updates must match applying each update in turn."""
+
+    def fresh():
+        return {"body": {"a": {}, "l": [{}, {}, {}, {}]}}
+
+    expected = fresh()
+    for updater in parser.parse(Lexeme(*lexeme) for lexeme in lexemes):
+        updater(expected)
+    assert apply_mods(fresh(), *lexemes) == expected
+
+
+@pytest.mark.parametrize(
+    "value, exc",
+    [
+        (".missing.key:=1", ReqModKeyError),
+        (".list[5]:=1", ReqModKeyError),
+        (".list[0].x[0]:=1", ReqModKeyError),
+        (".list[:=1", ReqModSyntaxError),
+    ],
+)
+def test_parse_nested_errors(value, exc):
+    with pytest.raises(exc):
+        apply_mods({"body": {"list": [1]}}, (ACTIONS.assign, value))
+
+
+def test_compile_modifiers():
+    modifiers = (".a.b:=1", "-a", ".a.c=x", "X-Foo:bar", "-d", "q==")
+    updates = parser.compile_modifiers(modifiers)
+    assert parser.compile_modifiers(modifiers) is updates
+    assert len(updates) == 4
+
+    for _ in range(2):
+        request = {"headers": {}, "query": {"q": "1"}, "body": {"a": {}}}
+        request["body"]["a"]["c"] = "w"
+        updates.apply(request)
+        assert request == {
+            "headers": {"X-Foo": "bar"},
+            "query": {},
+            "body": {"a": {"b": 1, "c": "wx"}},
+        }
+
+
+def test_compile_modifiers_fused():
+    """Updaters sharing a prefix, or replacing an object and then updating
+    inside it, are applied in a single pass."""
+    updates = parser.compile_modifiers(
+        ('.a:={"b": {}}', ".a.b.c:=1", ".a.d:=2", "X-Foo:bar")
+    )
+    assert len(updates.batches) == 1
+    request = {"headers": {}, "body": {}}
+    updates.apply(request)
+    assert request == {
+        "headers": {"X-Foo": "bar"},
+        "body": {"a": {"b": {"c": 1}, "d": 2}},
+    }
+
+
+@pytest.mark.parametrize(
+    "modifiers",
+    [
+        ("X-Foo:bar", "-d", "X-Foo:"),
+        (".a.b:=1", "-d", ".a="),
+        ("-a", "tags:=[1]", "-d", "tags="),
+        ("-d", "tags=", "-a", "tags:=[1]"),
+    ],
+)
+def test_compile_modifiers_conflict(modifiers):
+    with pytest.raises(ReqModError):
+        parser.compile_modifiers(modifiers)
+
+
+@pytest.mark.parametrize(
+    "modifiers",
+    [
+        ("-d", "X-Foo:", "X-Foo:bar"),
+        ("-d", "tags=", "tags:=[]", "-a", "tags:=[1]"),
+        (".l[0]:=1", "-d", ".l[0]="),
+        ("-d", ".a.b=", "-d", ".a="),
+    ],
+)
+def test_compile_modifiers_no_conflict(modifiers):
+    parser.compile_modifiers(modifiers)
@@ -1,9 +1,17 @@
+import gzip
 import io
+import json
 from types import SimpleNamespace
 
 import pytest
 import pytest_mock
+import requests
 
+from restcli.exceptions import (
+    CollectionError,
+    DeadlineError,
+    RequestTimeoutError,
+)
 from restcli.requestor import Requestor
 
 TEST_GROUPS_PATH = "tests/resources/test_collection.yaml"
@@ -22,6 +30,76 @@ def test_request(requestor, mocker):
     assert mock.call_count == 1
 
 
+def test_request_env_args(requestor, mocker):
+    """Environment overrides apply to one Request and leave the Env as-is."""
+    mock = mocker.patch("requests.request")
+    env = requestor.env.data
+    requestor.request("books", "edit", None, "book_id:5", "!server")
+    assert mock.call_args[1]["url"] == "/books/5"
+    assert requestor.env == env
+    assert not requestor.env.dirty
+
+
+def test_request_output_file(requestor, mocker, tmp_path):
+    """Test Requestor()#request() with an ``output_file``."""
+    chunks = [b"abc", b"defg", b"h"]
+    response = mocker.Mock(headers={"Content-Length": "8"})
+    response.raw.stream.return_value = iter(chunks)
+    mock = mocker.patch("requests.request", return_value=response)
+    progress = mocker.Mock()
+    path = tmp_path / "body.bin"
+
+    result = requestor.request(
+        "books", "edit", output_file=str(path), progress=progress
+    )
+
+    assert mock.call_args[1]["stream"] is True
+    assert path.read_bytes() == b"".join(chunks)
+    assert result.download.path == str(path)
+    assert result.download.size == 8
+    progress.assert_called_with(8, 8)
+
+
+def test_request_render_cache(requestor, mocker):
+    """Rendered Requests are reused until a var they read changes."""
+    mock = mocker.patch("requests.request")
+    render = mocker.spy(Requestor, "parse_request")
+    cache = requestor.render_cache
+
+    for _ in range(3):
+        requestor.request("books", "edit")
+    assert render.call_count == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+    # Callers may modify the kwargs they get.
+    assert mock.call_args[1]["headers"]["Accept-Encoding"]
+
+    requestor.env["foo"] = "baz"
+    requestor.request("books", "edit")
+    assert render.call_count == 1
+
+    requestor.env["book_id"] = 2
+    requestor.request("books", "edit")
+    assert render.call_count == 2
+    assert mock.call_args[1]["url"] == "http://foobar.org/books/2"
+
+    requestor.request("books", "edit", None, "book_id:3")
+    requestor.request("books", "edit", None, "book_id:3")
+    assert render.call_count == 3
+    assert mock.call_args[1]["url"] == "http://foobar.org/books/3"
+
+
+def test_render_key():
+    request = {"url": "{{ server }}/{{ id }}", "headers": {"X-A": "{{ a }}"}}
+    env = SimpleNamespace(versions=lambda keys: tuple(sorted(keys)))
+    key = Requestor.render_key(request, env)
+    assert key == (id(request), ("a", "id", "server"), None)
+    assert Requestor.render_key(request, env, []) is None
+    assert Requestor.render_key(request, {}) is None
+    assert Requestor.render_key({"url": "{{ 'ab' | random }}"}, env) is None
+    env.versions = lambda keys: None
+    assert Requestor.render_key(request, env) is None
+
+
 def test_prepare_request():
     """Test Requestor#prepare_request()."""
     request = {
@@ -58,6 +136,85 @@ def test_prepare_request():
     assert actual == expected
 
 
+def test_prepare_request_body_file(tmp_path):
+    """Test Requestor#prepare_request() with a ``body_file``."""
+    path = tmp_path / "upload.json"
+    path.write_text('{"id": 1}')
+    request = {
+        "method": "post",
+        "url": "http://foobar.org/upload",
+        "headers": {"X-Foo": "bar"},
+        "body": "id: 2",
+        "body_file": "{{ dir }}/upload.json",
+        "upload": {"gzip": True},
+    }
+    env = {"dir": str(tmp_path)}
+
+    actual = Requestor.prepare_request(request, env)
+    body = actual.pop("data")
+    assert body.path == str(path)
+    assert body.encoding == "gzip"
+    assert actual == {
+        "method": "post",
+        "url": "http://foobar.org/upload",
+        "headers": {
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+            "X-Foo": "bar",
+        },
+        "json": None,
+        "params": {},
+    }
+
+
+def test_prepare_request_compress():
+    """Test Requestor#prepare_request() with ``compress``."""
+    request = {
+        "method": "post",
+        "url": "http://foobar.org/authors",
+        "headers": {"X-Foo": "bar"},
+        "body": "names: [{{ name }}, {{ name }}, {{ name }}]",
+        "compress": "gzip",
+        "compress_min_size": 10,
+    }
+    env = {"name": "Bartholomew McNozzleWafer"}
+
+    actual = Requestor.prepare_request(request, env)
+    body = actual.pop("data")
+    assert json.loads(gzip.decompress(body)) == {"names": [env["name"]] * 3}
+    assert actual == {
+        "method": "post",
+        "url": "http://foobar.org/authors",
+        "headers": {
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+            "X-Foo": "bar",
+        },
+        "json": None,
+        "params": {},
+    }
+
+    # Bodies below the threshold are left alone.
+    request["compress_min_size"] = 1000
+    actual = Requestor.prepare_request(request, env)
+    assert "data" not in actual
+    assert actual["json"] == {"names": [env["name"]] * 3}
+
+
+def test_encode_json_body():
+    """Test Requestor#encode_json_body()."""
+    kwargs = {"headers": {"content-type": "text/x-json"}, "json": {"a": 1}}
+    Requestor.encode_json_body(kwargs)
+    assert json.loads(kwargs["data"]) == {"a": 1}
+    assert kwargs["json"] is None
+    assert kwargs["headers"] == {"content-type": "text/x-json"}
+
+    # Bodies that are already encoded are left alone.
+    kwargs = {"headers": {}, "json": None, "data": b"abc"}
+    Requestor.encode_json_body(kwargs)
+    assert kwargs == {"headers": {}, "json": None, "data": b"abc"}
+
+
 def test_parse_env_args():
     """Test Requestor#parse_env_args()."""
     env_args = [
@@ -120,3 +277,90 @@ def test_run_script():
         script_locals={"response": response, "env": env},
     )
     assert env["f"].getvalue().strip() == "404"
+
+
+TIMEOUT_COLLECTION = """\
+defaults:
+    timeout:
+        connect: 2
+---
+items:
+    get:
+        method: get
+        url: "http://example.org/items"
+        timeout:
+            connect: 1
+            read: 5.5
+    add:
+        method: post
+        url: "http://example.org/items"
+"""
+
+
+def test_request_timeout(tmp_path, mocker):
+    path = tmp_path / "collection.yaml"
+    path.write_text(TIMEOUT_COLLECTION)
+    requestor = Requestor(str(path))
+    mock = mocker.patch("requests.request")
+
+    requestor.request("items", "get")
+    assert mock.call_args[1]["timeout"] == (1, 5.5)
+    requestor.request("items", "add")
+    assert mock.call_args[1]["timeout"] == (2, None)
+
+    mock.side_effect = requests.ConnectTimeout()
+    with pytest.raises(RequestTimeoutError) as exc_info:
+        requestor.request("items", "get")
+    assert exc_info.value.phase == "connect"
+    assert exc_info.value.show() == (
+        "Timed out: GET http://example.org/items: no connection within 1s"
+    )
+
+
+def test_request_deadline(tmp_path, mocker):
+    path = tmp_path / "collection.yaml"
+    path.write_text(TIMEOUT_COLLECTION)
+    requestor = Requestor(str(path))
+    mock = mocker.patch("requests.request")
+    mocker.patch("time.time", return_value=100.0)
+
+    requestor.deadline = 103.0
+    requestor.request("items", "get")
+    assert mock.call_args[1]["timeout"] == (1, 3.0)
+    requestor.request("items", "add")
+    assert mock.call_args[1]["timeout"] == (2, 3.0)
+
+    requestor.deadline = 100.0
+    with pytest.raises(DeadlineError):
+        requestor.request("items", "get")
+    assert mock.call_count == 2
+
+
+@pytest.mark.parametrize(
+    "timeout", ("{nope: 1}", "{read: soon}", "{connect: 0}", "{read: -1}")
+)
+def test_invalid_timeout(tmp_path, timeout):
+    path = tmp_path / "collection.yaml"
+    path.write_text(
+        f"g:\n  r:\n    method: get\n    url: /\n    timeout: {timeout}"
+    )
+    with pytest.raises(CollectionError):
+        Requestor(str(path))
+
+
+@pytest.mark.parametrize(
+    "param, value",
+    [
+        ("compress", "lzma"),
+        ("mock", "{error_rate: 2}"),
+        ("retry", "{nope: 1}"),
+    ],
+)
+def test_invalid_param(tmp_path, param, value):
+    path = tmp_path / "collection.yaml"
+    path.write_text(
+        f"g:\n  r:\n    method: get\n    url: /\n    {param}: {value}"
+    )
+    with pytest.raises(CollectionError) as excinfo:
+        Requestor(str(path))
+    assert excinfo.value.path[:3] == ["g", "r", param]
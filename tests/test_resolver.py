@@ -0,0 +1,142 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from restcli import resolver
+from restcli.requestor import Requestor
+from restcli.resolver import DNSCache, ResolvingAdapter
+
+COLLECTION = """\
+users:
+    get:
+        method: get
+        url: "{{ server }}/users/{{ user_id }}"
+    me:
+        method: get
+        url: "https://api.example.org:8443/me"
+    local:
+        method: get
+        url: "/local"
+"""
+
+
+def getaddrinfo(host, port, *args, **kwargs):
+    if host.endswith(".invalid"):
+        raise socket.gaierror("unknown host")
+    address = (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", port))
+    return [address, address]
+
+
+@pytest.fixture
+def lookup(mocker):
+    """Patch the system resolver to resolve every host to 127.0.0.1, except
+    ``.invalid`` ones."""
+    return mocker.patch("socket.getaddrinfo", side_effect=getaddrinfo)
+
+
+@pytest.fixture
+def server():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body = self.headers["Host"].encode()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(
+        target=httpd.serve_forever, args=(0.01,), daemon=True
+    )
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_resolve(lookup, mocker):
+    mocker.patch.object(resolver, "dns", None)
+    now = [0.0]
+    cache = DNSCache(ttl=10, clock=lambda: now[0])
+
+    assert cache.resolve("Example.org") == [(socket.AF_INET, "127.0.0.1")]
+    assert cache.resolve("example.org") == [(socket.AF_INET, "127.0.0.1")]
+    assert (cache.hits, cache.misses, lookup.call_count) == (1, 1, 1)
+    assert cache.take_elapsed() > 0
+    assert cache.take_elapsed() == 0
+
+    # Entries expire after their TTL.
+    now[0] = 10
+    cache.resolve("example.org")
+    assert lookup.call_count == 2
+
+    # Addresses aren't looked up.
+    assert cache.resolve("::1") == [(socket.AF_INET6, "::1")]
+    assert lookup.call_count == 2
+
+    # Failures aren't cached.
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            cache.resolve("example.invalid")
+    assert cache.misses == 4
+
+
+def test_prefetch(lookup, mocker):
+    mocker.patch.object(resolver, "dns", None)
+    cache = DNSCache()
+    errors = cache.prefetch(["a.example", "b.example", "bad.invalid"])
+    assert list(errors) == ["bad.invalid"]
+    assert set(cache.entries) == {"a.example", "b.example"}
+
+
+def test_adapter(lookup, mocker, server):
+    mocker.patch.object(resolver, "dns", None)
+    cache = DNSCache()
+    session = requests.Session()
+    session.mount("http://", ResolvingAdapter(cache))
+
+    for _ in range(2):
+        response = session.get(f"http://api.example.test:{server}/")
+        # The host name is still sent, even though its address was cached.
+        assert response.text == f"api.example.test:{server}"
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # New connections hit the cache.
+    session.close()
+    session = requests.Session()
+    session.mount("http://", ResolvingAdapter(cache))
+    session.get(f"http://api.example.test:{server}/")
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    with pytest.raises(requests.ConnectionError):
+        session.get(f"http://api.example.invalid:{server}/")
+
+
+def test_request_dns_cache(tmp_path, lookup, mocker, server):
+    mocker.patch.object(resolver, "dns", None)
+    collection = tmp_path / "collection.yaml"
+    collection.write_text(COLLECTION)
+    env = tmp_path / "env.yaml"
+    env.write_text(f"server: http://api.example.test:{server}\nuser_id: 1\n")
+    requestor = Requestor(str(collection), str(env))
+    requestor.dns_cache = DNSCache()
+
+    assert requestor.collection_hosts() == {
+        "api.example.test",
+        "api.example.org",
+    }
+
+    response = requestor.request("users", "get")
+    assert response.text == f"api.example.test:{server}"
+    assert response.resolve_time > 0
+    response = requestor.request("users", "get")
+    assert response.resolve_time == 0
+    assert (requestor.dns_cache.hits, requestor.dns_cache.misses) == (0, 1)
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+import requests
+
+from restcli import json_utils
+from restcli.response import Response
+
+
+def make_response(content, content_type="application/json"):
+    raw = requests.Response()
+    raw._content = content  # pylint: disable=protected-access
+    raw.status_code = 200
+    if content_type:
+        raw.headers["Content-Type"] = content_type
+    raw.encoding = requests.utils.get_encoding_from_headers(raw.headers)
+    return raw
+
+
+def test_json_decoded_once(mocker):
+    loads = mocker.spy(json_utils, "loads")
+    apparent = mocker.patch.object(
+        requests.Response,
+        "apparent_encoding",
+        new_callable=mocker.PropertyMock,
+    )
+    response = Response(make_response(b'{"name": "caf\\u00e9", "n": 1}'))
+
+    assert response.json() is response.json()
+    assert response.json() == {"name": "café", "n": 1}
+    assert response.text is response.text
+    assert loads.call_count == 1
+    # JSON without a charset is UTF-8; there's no need to guess.
+    assert response.encoding == "utf-8"
+    assert not apparent.called
+
+
+def test_json_invalid():
+    response = Response(make_response(b"<html>"))
+    for _ in range(2):
+        with pytest.raises(json.JSONDecodeError):
+            response.json()
+    assert response.text == "<html>"
+
+
+@pytest.mark.parametrize(
+    "content, charset, text",
+    [
+        ('{"a": "é"}'.encode("latin-1"), "latin-1", '{"a": "é"}'),
+        ('{"a": "é"}'.encode("utf-16"), "utf-16", '{"a": "é"}'),
+        (b'{"a": "\\u00e9"}', "bogus", '{"a": "\\u00e9"}'),
+    ],
+)
+def test_encodings(content, charset, text):
+    content_type = f"application/json; charset={charset}"
+    response = Response(make_response(content, content_type))
+    assert response.json() == {"a": "é"}
+    assert response.text == text
+
+
+def test_attributes():
+    raw = make_response(b"", content_type=None)
+    response = Response(raw, transfer="transfer")
+    assert response.status_code == 200
+    assert response.raw is raw.raw
+    assert response.transfer == "transfer"
+    assert response.download is None
+    assert response.text == ""
+    assert repr(response) == "<Response [200]>"
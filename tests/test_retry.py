@@ -0,0 +1,247 @@
+import pytest
+import requests
+
+from restcli import retry
+from restcli.exceptions import CircuitOpenError, DeadlineError, InputError
+from restcli.requestor import Requestor
+from restcli.retry import CircuitBreaker, RetryPolicy
+
+COLLECTION = """\
+items:
+    get:
+        method: get
+        url: "http://example.org/items"
+        retry:
+            attempts: 3
+            backoff: 0
+"""
+
+
+def make_response(mocker, status, headers=None):
+    response = mocker.Mock(
+        status_code=status,
+        reason="",
+        headers=headers or {},
+        encoding=None,
+        content=b"",
+    )
+    response.raw.stream.return_value = iter([])
+    return response
+
+
+def make_sender(mocker, *outcomes):
+    """Return a mock that sends a Request once, with each outcome in turn:
+    a status code, or an exception to raise."""
+
+    def send_once(kwargs):
+        outcome = next(results)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return make_response(mocker, *outcome)
+
+    results = iter(
+        o if isinstance(o, (Exception, tuple)) else (o,) for o in outcomes
+    )
+    return mocker.Mock(side_effect=send_once)
+
+
+KWARGS = {"method": "GET", "url": "http://example.org/items"}
+
+
+def test_compile_retry():
+    policy = retry.compile_retry(
+        {"attempts": 5, "statuses": [500], "errors": ["timeout"]}
+    )
+    assert policy == RetryPolicy(
+        attempts=5, statuses=(500,), errors=("timeout",)
+    )
+    assert policy.exceptions == (requests.Timeout,)
+
+    for spec in (
+        {"tries": 2},
+        {"attempts": 0},
+        {"attempts": True},
+        {"backoff": -1},
+        {"statuses": ["502"]},
+        {"errors": ["dns"]},
+    ):
+        with pytest.raises(InputError):
+            retry.compile_retry(spec)
+
+
+def test_parse_retry_after():
+    assert retry.parse_retry_after("2.5") == 2.5
+    assert retry.parse_retry_after("-1") == 0
+    now = 784111777.0
+    date = "Sun, 06 Nov 1994 08:49:37 GMT"
+    assert retry.parse_retry_after(date, now=now - 10) == 10
+    assert retry.parse_retry_after(date, now=now + 10) == 0
+    assert retry.parse_retry_after("soon") is None
+    assert retry.parse_retry_after(None) is None
+
+
+def test_delay(mocker):
+    policy = RetryPolicy(backoff=1, max_backoff=5)
+    uniform = mocker.patch("random.uniform", side_effect=lambda a, b: b)
+    assert [policy.delay(n) for n in range(1, 5)] == [1, 2, 4, 5]
+    assert uniform.call_args_list[0] == mocker.call(0, 1)
+    assert policy.delay(1, retry_after=3) == 3
+    assert policy.delay(1, retry_after=60) == 5
+
+
+def test_send(mocker):
+    policy = RetryPolicy(attempts=4)
+    sleep = mocker.Mock()
+    send_once = make_sender(
+        mocker,
+        502,
+        requests.ConnectionError(),
+        (503, {"Retry-After": "7"}),
+        200,
+    )
+    response, attempts = retry.send(KWARGS, send_once, policy, sleep=sleep)
+    assert (response.status_code, attempts) == (200, 4)
+    assert sleep.call_count == 3
+    assert sleep.call_args_list[-1] == mocker.call(7)
+
+
+def test_send_gives_up(mocker):
+    policy = RetryPolicy(attempts=2)
+    sleep = mocker.Mock()
+
+    send_once = make_sender(mocker, 502, 502)
+    response, attempts = retry.send(KWARGS, send_once, policy, sleep=sleep)
+    assert (response.status_code, attempts) == (502, 2)
+
+    send_once = make_sender(mocker, 502, requests.Timeout())
+    with pytest.raises(requests.Timeout):
+        retry.send(KWARGS, send_once, policy, sleep=sleep)
+
+    # Errors that aren't retried are raised at once.
+    send_once = make_sender(mocker, requests.TooManyRedirects())
+    with pytest.raises(requests.TooManyRedirects):
+        retry.send(KWARGS, send_once, policy, sleep=sleep)
+
+
+def test_send_idempotent(mocker):
+    sleep = mocker.Mock()
+    post = {**KWARGS, "method": "post"}
+
+    send_once = make_sender(mocker, 502, 200)
+    response, attempts = retry.send(post, send_once, RetryPolicy(), sleep)
+    assert (response.status_code, attempts) == (502, 1)
+
+    send_once = make_sender(mocker, 502, 200)
+    policy = RetryPolicy(any_method=True)
+    response, attempts = retry.send(post, send_once, policy, sleep=sleep)
+    assert (response.status_code, attempts) == (200, 2)
+
+
+def test_circuit_breaker(mocker):
+    now = [0.0]
+    breaker = CircuitBreaker(clock=lambda: now[0])
+    policy = RetryPolicy(
+        attempts=2, breaker_threshold=2, breaker_cooldown=10
+    )
+    sleep = mocker.Mock()
+
+    def send(*outcomes):
+        send_once = make_sender(mocker, *outcomes)
+        return retry.send(KWARGS, send_once, policy, breaker, sleep)
+
+    # Retries of one Request count as one failure.
+    send(502, 502)
+    send(502, 200)
+    send(502, 502)
+    send(502, 502)
+    with pytest.raises(CircuitOpenError) as exc_info:
+        send(200)
+    assert exc_info.value.host == "example.org"
+
+    # Other hosts aren't affected.
+    send_once = make_sender(mocker, 200)
+    other = {**KWARGS, "url": "http://example.com/"}
+    retry.send(other, send_once, policy, breaker, sleep)
+
+    # After the cooldown, one trial Request is let through.
+    now[0] = 10
+    breaker.before("example.org", policy)
+    with pytest.raises(CircuitOpenError):
+        breaker.before("example.org", policy)
+    breaker.record("example.org", policy, failed=True)
+    with pytest.raises(CircuitOpenError):
+        send(200)
+
+    now[0] = 20
+    send(200)
+    send(200)
+
+
+def test_circuit_breaker_trial(mocker):
+    now = [0.0]
+    breaker = CircuitBreaker(clock=lambda: now[0])
+    policy = RetryPolicy(breaker_threshold=1, breaker_cooldown=10)
+    sleep = mocker.Mock()
+
+    def send(*outcomes):
+        send_once = make_sender(mocker, *outcomes)
+        return retry.send(KWARGS, send_once, policy, breaker, sleep)
+
+    send(502, 502, 502)
+    now[0] = 10
+    # The trial's own retries aren't stopped by its circuit.
+    response, attempts = send(requests.ConnectionError(), 200)
+    assert (response.status_code, attempts) == (200, 2)
+    assert not breaker.hosts
+    send(200)
+
+    # A trial that ends with an error that isn't retried lets another one
+    # through.
+    send(502, 502, 502)
+    now[0] = 20
+    with pytest.raises(requests.TooManyRedirects):
+        send(requests.TooManyRedirects())
+    with pytest.raises(requests.TooManyRedirects):
+        send(502, requests.TooManyRedirects())
+    send(200)
+    assert not breaker.hosts
+
+
+def test_request_retry(tmp_path, mocker):
+    path = tmp_path / "collection.yaml"
+    path.write_text(COLLECTION)
+    requestor = Requestor(str(path))
+    mocker.patch("time.sleep")
+    statuses = iter([502, 503, 200])
+    mock = mocker.patch(
+        "requests.request",
+        side_effect=lambda **kwargs: make_response(mocker, next(statuses)),
+    )
+
+    response = requestor.request("items", "get")
+
+    assert mock.call_count == 3
+    assert response.status_code == 200
+    assert response.attempts == 3
+
+
+def test_request_retry_deadline(tmp_path, mocker):
+    path = tmp_path / "collection.yaml"
+    path.write_text(COLLECTION)
+    requestor = Requestor(str(path))
+    sleep = mocker.patch("time.sleep")
+    mocker.patch("time.time", return_value=100.0)
+    requestor.deadline = 110.0
+    responses = iter(
+        [(503, {"Retry-After": "3"}), (503, {"Retry-After": "30"})]
+    )
+    mock = mocker.patch(
+        "requests.request",
+        side_effect=lambda **kwargs: make_response(mocker, *next(responses)),
+    )
+
+    # Retries that would be sent after the deadline aren't waited for.
+    with pytest.raises(DeadlineError):
+        requestor.request("items", "get")
+    assert mock.call_count == 2
+    assert sleep.call_args_list == [mocker.call(3)]
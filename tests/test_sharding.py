@@ -0,0 +1,120 @@
+import json
+import multiprocessing
+
+import pytest
+
+from restcli import sharding
+from restcli.app import App
+
+COLLECTION = """\
+items:
+    get:
+        method: get
+        url: "{{ server }}/items/{{ item_id }}"
+        script: |
+            env["last_item"] = response.json()["url"]
+            env["count"] = env.get("count", 0) + 1
+    delete:
+        method: delete
+        url: "{{ server }}/items/{{ item_id }}"
+        script: |
+            del env["item_id"]
+"""
+
+
+@pytest.fixture
+def app(tmp_path):
+    collection = tmp_path / "collection.yaml"
+    collection.write_text(COLLECTION)
+    env = tmp_path / "env.yaml"
+    env.write_text("server: http://example.org\nitem_id: 1\n")
+    return App(str(collection), str(env), quiet=True)
+
+
+def mock_request(mocker):
+    def request(**kwargs):
+        body = json.dumps({"url": kwargs["url"]}).encode()
+        response = mocker.Mock(
+            status_code=200,
+            reason="OK",
+            headers={"Content-Type": "application/json"},
+            encoding=None,
+            content=body,
+        )
+        response.raw.stream.return_value = iter([body])
+        return response
+
+    return mocker.patch("requests.request", side_effect=request)
+
+
+def job(group, request, *env_args):
+    line = " ".join([group, request] + [f"-o {arg}" for arg in env_args])
+    kwargs = dict(group_name=group, request_name=request, env_args=env_args)
+    return sharding.ExecJob(line, kwargs)
+
+
+def test_env_changes():
+    initial = {"a": 1, "b": [1], "c": 3}
+    env = {"a": 1, "b": [1, 2], "d": 4}
+    changes = sharding.env_changes(env, initial)
+    assert changes == ({"b": [1, 2], "d": 4}, ["c"])
+
+
+def test_run_job(app, mocker):
+    mock_request(mocker)
+    initial = app.r.env.data
+    app_kwargs = dict(
+        collection_file=app.r.collection.source, env_file=None, quiet=True
+    )
+    sharding._init_worker(App, app_kwargs, initial)
+
+    result = sharding._run_job(job("items", "get", "item_id:2"))
+    assert not result.error
+    assert result.set_env == {
+        "last_item": "http://example.org/items/2",
+        "count": 1,
+    }
+    # The next job starts from the initial Environment again.
+    result = sharding._run_job(job("items", "delete"))
+    assert result.set_env == {}
+    assert result.del_env == ["item_id"]
+    assert dict(sharding._worker["app"].r.env) == dict(initial)
+
+    result = sharding._run_job(job("items", "get", "not-an-env-arg"))
+    assert result.error.startswith("Error: ")
+
+    error = sharding.ExecJob("items", error="Error: Missing argument")
+    assert sharding._run_job(error).error == "Error: Missing argument"
+
+
+def test_run_job_deadline(app, mocker):
+    mock = mock_request(mocker)
+    app_kwargs = dict(
+        collection_file=app.r.collection.source, env_file=None, quiet=True
+    )
+    sharding._init_worker(App, app_kwargs, app.r.env.data, deadline=0)
+
+    result = sharding._run_job(job("items", "get"))
+    assert result.skipped
+    assert (result.error, result.set_env) == ("", {})
+    assert not mock.called
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="workers must inherit the mocked requests",
+)
+def test_sharded_exec(app, mocker):
+    mock_request(mocker)
+    jobs = [job("items", "get", f"item_id:{i}") for i in range(6)]
+    jobs.append(job("items", "delete"))
+
+    results = list(sharding.ShardedExec(app, workers=3).run(jobs))
+
+    assert [result.line for result in results] == [job.line for job in jobs]
+    assert not any(result.error for result in results)
+    # Every line started from the same Environment, and the changes were
+    # merged in order.
+    assert app.r.env["last_item"] == "http://example.org/items/5"
+    assert app.r.env["count"] == 1
+    assert "item_id" not in app.r.env
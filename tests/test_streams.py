@@ -0,0 +1,88 @@
+import gzip
+
+import pytest
+
+from restcli.streams import FileBody, read_response, save_response
+
+
+@pytest.fixture
+def body_path(tmp_path):
+    path = tmp_path / "body.txt"
+    path.write_bytes(b"0123456789" * 10)
+    return path
+
+
+def test_file_body(body_path):
+    body = FileBody(str(body_path), chunk_size=30)
+    chunks = [bytes(chunk) for chunk in body]
+    assert [len(chunk) for chunk in chunks] == [30, 30, 30, 10]
+    assert b"".join(chunks) == body_path.read_bytes()
+    assert len(body) == 100
+    assert body.headers == {}
+    assert body.default_headers == {"Content-Type": "text/plain"}
+
+
+def test_file_body_empty(tmp_path):
+    path = tmp_path / "empty.bin"
+    path.write_bytes(b"")
+    body = FileBody(str(path))
+    assert list(body) == []
+    assert bool(body) is True
+
+
+def test_file_body_chunked(body_path):
+    body = FileBody(str(body_path), chunked=True)
+    assert len(body) == 0
+    assert b"".join(bytes(chunk) for chunk in body) == body_path.read_bytes()
+
+
+def test_file_body_gzip(body_path):
+    body = FileBody(str(body_path), encoding="gzip", chunk_size=7)
+    assert len(body) == 0
+    assert body.headers == {"Content-Encoding": "gzip"}
+    assert gzip.decompress(b"".join(body)) == body_path.read_bytes()
+
+
+def test_file_body_multipart(body_path):
+    body = FileBody(str(body_path), multipart="upload")
+    data = b"".join(bytes(chunk) for chunk in body)
+    content_type = body.headers["Content-Type"]
+    assert content_type == f"multipart/form-data; boundary={body.boundary}"
+    assert len(body) == len(data)
+    assert data == (
+        f"--{body.boundary}\r\n"
+        'Content-Disposition: form-data; name="upload";'
+        ' filename="body.txt"\r\n'
+        "Content-Type: text/plain\r\n\r\n"
+        f"{'0123456789' * 10}\r\n"
+        f"--{body.boundary}--\r\n"
+    ).encode()
+
+
+def test_file_body_reiterable(body_path):
+    body = FileBody(str(body_path))
+    first = b"".join(bytes(chunk) for chunk in body)
+    second = b"".join(bytes(chunk) for chunk in body)
+    assert first == second == body_path.read_bytes()
+
+
+def test_save_response_closes(tmp_path, mocker):
+    response = mocker.Mock(headers={})
+    response.raw.stream.side_effect = OSError("connection reset")
+    with pytest.raises(OSError):
+        save_response(response, str(tmp_path / "body.bin"))
+    assert response.close.call_count == 1
+
+    # The body can't be written to a directory.
+    response = mocker.Mock(headers={})
+    with pytest.raises(OSError):
+        save_response(response, str(tmp_path))
+    assert response.close.call_count == 1
+
+
+def test_read_response_closes(mocker):
+    response = mocker.Mock(headers={})
+    response.raw.stream.side_effect = OSError("connection reset")
+    with pytest.raises(OSError):
+        read_response(response)
+    assert response.close.call_count == 1
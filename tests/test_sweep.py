@@ -0,0 +1,189 @@
+import io
+import json
+import threading
+import time
+
+import pytest
+import requests
+import urllib3
+
+from restcli import sweep
+from restcli.exceptions import InputError
+from restcli.requestor import Requestor
+
+TEST_GROUPS_PATH = "tests/resources/test_collection.yaml"
+TEST_ENV_PATH = "tests/resources/test_env.yaml"
+
+
+@pytest.fixture
+def requestor():
+    return Requestor(TEST_GROUPS_PATH, TEST_ENV_PATH)
+
+
+@pytest.mark.parametrize(
+    "path, data_format",
+    [
+        ("rows.csv", "csv"),
+        ("ROWS.CSV", "csv"),
+        ("rows.jsonl", "jsonl"),
+        (None, "jsonl"),
+    ],
+)
+def test_guess_format(path, data_format):
+    assert sweep.guess_format(path) == data_format
+
+
+def test_read_rows_csv():
+    handle = io.StringIO("book_id,title\n1,Dune\n2,Emma\n")
+    assert list(sweep.read_rows(handle, sweep.FORMATS.csv)) == [
+        (1, {"book_id": "1", "title": "Dune"}),
+        (2, {"book_id": "2", "title": "Emma"}),
+    ]
+
+
+def test_read_rows_jsonl():
+    handle = io.StringIO('{"book_id": 1}\n\n{"book_id": 2, "x": [1]}\n')
+    assert list(sweep.read_rows(handle, sweep.FORMATS.jsonl)) == [
+        (1, {"book_id": 1}),
+        (2, {"book_id": 2, "x": [1]}),
+    ]
+
+
+@pytest.mark.parametrize("line", ["{", "[1, 2]"])
+def test_read_rows_jsonl_invalid(line):
+    rows = sweep.read_rows(io.StringIO(line), sweep.FORMATS.jsonl)
+    with pytest.raises(InputError):
+        list(rows)
+
+
+def mock_response(mocker, **kwargs):
+    body = json.dumps(kwargs).encode()
+    response = mocker.Mock(
+        status_code=200,
+        reason="OK",
+        headers={"Content-Type": "application/json"},
+        encoding=None,
+        content=body,
+    )
+    response.raw.stream.return_value = iter([body])
+    return response
+
+
+def test_sweep(requestor, mocker):
+    def request(**kwargs):
+        return mock_response(mocker, url=kwargs["url"])
+
+    mock = mocker.patch("requests.request", side_effect=request)
+    env = dict(requestor.env)
+    rows = sweep.read_rows(io.StringIO("book_id\n7\n8\n"), sweep.FORMATS.csv)
+    results = list(sweep.Sweep(requestor, "books", "edit").run(rows))
+
+    assert mock.call_count == 2
+    assert [(r["row"], r["status"], r["body"]) for r in results] == [
+        (1, 200, {"url": "http://foobar.org/books/7"}),
+        (2, 200, {"url": "http://foobar.org/books/8"}),
+    ]
+    # Rows never leak into the Environment.
+    assert dict(requestor.env) == env
+
+
+def test_sweep_script(requestor, mocker):
+    mocker.patch(
+        "requests.request", side_effect=lambda **kw: mock_response(mocker)
+    )
+    save = mocker.patch.object(type(requestor.env), "save")
+    requestor.collection["books"]["edit"]["script"] = (
+        "env['seen'] = env['book_id']\n"
+        "del env['foo']\n"
+        "env.save()\n"
+    )
+    env = dict(requestor.env)
+    runner = sweep.Sweep(requestor, "books", "edit")
+    (result,) = runner.run([(1, {"book_id": 7})])
+
+    assert "error" not in result
+    # Scripts get an Environment, whose changes stay in the row.
+    save.assert_called_once_with()
+    assert dict(requestor.env) == env
+
+
+def test_sweep_concurrent(requestor, mocker):
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def request(**kwargs):
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.01)
+        with lock:
+            active.pop()
+        return mock_response(mocker)
+
+    mocker.patch("requests.request", side_effect=request)
+    consumed = []
+
+    def rows():
+        for i in range(1, 21):
+            consumed.append(i)
+            yield i, {"book_id": i}
+
+    runner = sweep.Sweep(requestor, "books", "edit", workers=3)
+    results = runner.run(rows())
+    first = next(results)
+    # Rows are read lazily, at most one window ahead.
+    assert len(consumed) <= 7
+    results = [first, *results]
+
+    assert sorted(r["row"] for r in results) == list(range(1, 21))
+    assert max(peak) <= 3
+
+
+def test_sweep_error(requestor, mocker):
+    mocker.patch.object(
+        Requestor,
+        "request",
+        side_effect=InputError(value="x", msg="broken"),
+    )
+    runner = sweep.Sweep(requestor, "books", "edit")
+    (result,) = runner.run([(1, {"book_id": 1})])
+    assert result == {"row": 1, "error": "Invalid input 'x': broken"}
+
+
+def test_sweep_broken_body(requestor, mocker):
+    def request(**kwargs):
+        response = mock_response(mocker)
+        if kwargs["url"].endswith("/1"):
+            response.raw.stream.side_effect = urllib3.exceptions.ProtocolError(
+                "Connection broken"
+            )
+        return response
+
+    mocker.patch("requests.request", side_effect=request)
+    rows = [(i, {"book_id": i}) for i in (1, 2)]
+    results = list(sweep.Sweep(requestor, "books", "edit").run(rows))
+
+    assert results[0] == {"row": 1, "error": "Connection broken"}
+    assert results[1]["status"] == 200
+
+
+def test_sweep_deadline(requestor, mocker):
+    def request(**kwargs):
+        if kwargs["url"].endswith("/2"):
+            raise requests.ReadTimeout()
+        requestor.deadline = 0
+        return mock_response(mocker)
+
+    requestor.deadline = time.time() + 60
+    mocker.patch("requests.request", side_effect=request)
+    rows = [(i, {"book_id": i}) for i in (2, 1, 3)]
+    results = list(sweep.Sweep(requestor, "books", "edit").run(rows))
+
+    assert results[0]["timeout"] == "read"
+    assert results[1]["status"] == 200
+    assert results[2] == {
+        "row": 3,
+        "error": "Deadline passed",
+        "skipped": True,
+    }
@@ -0,0 +1,52 @@
+from collections import ChainMap
+
+from restcli import templates
+
+
+def test_render():
+    env = {"name": "world", "items": [1, 2]}
+    assert templates.render("Hello {{ name }}!", env) == "Hello world!"
+    assert templates.render("{{ items | length }}", env) == "2"
+    # Template globals are still available.
+    assert templates.render("{{ range(3) | list }}", env) == "[0, 1, 2]"
+
+
+def test_compile_template():
+    source = "{{ a }}"
+    assert templates.compile_template(source) is templates.compile_template(
+        source
+    )
+
+
+def test_template_vars():
+    source = "{% set x = 1 %}{{ a }}{{ b.c }}{% for i in items %}{% endfor %}"
+    assert templates.template_vars(source) == {"a", "b", "items"}
+
+
+def test_overlay_renderer(mocker):
+    spy = mocker.spy(templates, "render")
+    renderer = templates.OverlayRenderer()
+    base = {"server": "http://example.org", "id": 0}
+
+    for i in range(3):
+        env = ChainMap({"id": i}, base)
+        assert renderer("{{ server }}", env) == "http://example.org"
+        output = renderer("{{ server }}/{{ id }}", env)
+        assert output == f"http://example.org/{i}"
+    assert spy.call_count == 4
+
+    # Overriding a variable that was shared before bypasses the cache.
+    env = ChainMap({"server": "http://other.org"}, base)
+    assert renderer("{{ server }}", env) == "http://other.org"
+
+    # Random templates are rendered in every overlay.
+    spy.reset_mock()
+    for i in range(3):
+        renderer("{{ [1, 2, 3] | random }}", ChainMap({"id": i}, base))
+    assert spy.call_count == 3
+
+
+def test_is_deterministic():
+    assert templates.is_deterministic("{{ a }}{{ range(3) | list }}")
+    assert not templates.is_deterministic("{{ [1, 2] | random }}")
+    assert not templates.is_deterministic("{{ lipsum(1) }}")
@@ -74,3 +74,27 @@ def test_is_ascii():
     assert utils.is_ascii(gen.alphanum(50)) is True
     assert utils.is_ascii(gen.alphanum(50)) is True
     assert utils.is_ascii(gen.alphanum(50)) is True
+
+
+def test_fmt_size():
+    assert utils.fmt_size(0) == "0 B"
+    assert utils.fmt_size(1023) == "1023 B"
+    assert utils.fmt_size(1536) == "1.5 KiB"
+    assert utils.fmt_size(5 * 1024 ** 3) == "5.0 GiB"
+    assert utils.fmt_size(5 * 1024 ** 4) == "5120.0 GiB"
+
+
+def test_lru_cache():
+    cache = utils.LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+    assert (cache.hits, cache.misses) == (3, 1)
+    cache.clear()
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (0, 0)
@@ -0,0 +1,298 @@
+import os
+import threading
+
+import pytest
+
+from restcli import yaml_utils as yaml
+from restcli.exceptions import EnvError
+from restcli.workspace import (
+    EnvOverlay,
+    Environment,
+    SqliteEnvironment,
+    open_env,
+)
+
+
+@pytest.fixture
+def env_path(tmp_path):
+    path = tmp_path / "env.yaml"
+    path.write_text("server: http://foobar.org\ntoken: abc\n")
+    return path
+
+
+def test_env_dirty(env_path):
+    env = Environment(str(env_path))
+    assert not env.dirty
+    env["token"] = "xyz"
+    assert env.dirty
+    env["token"] = "abc"
+    assert not env.dirty
+
+    env["nested"] = {"a": 1}
+    env.save()
+    assert not env.dirty
+    env["nested"]["a"] = 2
+    assert env.dirty
+
+
+def test_env_save(env_path, mocker):
+    env = Environment(str(env_path))
+    spy = mocker.spy(yaml, "dump")
+
+    env.save()
+    assert spy.call_count == 0
+
+    env["token"] = "xyz"
+    env.save()
+    assert spy.call_count == 1
+    assert yaml.load(env_path.read_text())["token"] == "xyz"
+    assert [p.name for p in env_path.parent.iterdir()] == ["env.yaml"]
+
+
+def test_env_save_atomic(env_path, mocker):
+    env = Environment(str(env_path))
+    original = env_path.read_text()
+    env["token"] = "xyz"
+    mocker.patch.object(yaml, "dump", side_effect=RuntimeError)
+
+    with pytest.raises(RuntimeError):
+        env.save()
+    assert env_path.read_text() == original
+    assert [p.name for p in env_path.parent.iterdir()] == ["env.yaml"]
+    assert env.dirty
+
+
+def test_env_save_keeps_mode(env_path):
+    os.chmod(env_path, 0o600)
+    env = Environment(str(env_path))
+    env["token"] = "xyz"
+    env.save()
+    assert os.stat(env_path).st_mode & 0o777 == 0o600
+
+
+def test_env_batch(env_path, mocker):
+    env = Environment(str(env_path))
+    spy = mocker.spy(yaml, "dump")
+
+    with env.batch():
+        for i in range(10):
+            env["count"] = i
+            env.save()
+        # The first save is written right away, the rest are held back.
+        assert spy.call_count == 1
+        with env.batch():
+            env["count"] = 10
+            env.save()
+        assert spy.call_count == 1
+
+    assert spy.call_count == 2
+    assert yaml.load(env_path.read_text())["count"] == 10
+
+
+def test_env_batch_interval(env_path, mocker):
+    env = Environment(str(env_path))
+    spy = mocker.spy(yaml, "dump")
+    clock = mocker.patch("time.monotonic", return_value=100.0)
+
+    with env.batch():
+        env["count"] = 1
+        env.save()
+        env["count"] = 2
+        env.save()
+        clock.return_value += env.SAVE_INTERVAL
+        env["count"] = 3
+        env.save()
+        assert spy.call_count == 2
+
+    assert spy.call_count == 2
+
+
+def test_env_concurrent_saves(env_path):
+    env = Environment(str(env_path))
+
+    def work(name):
+        for i in range(10):
+            env[f"{name}{i}"] = i
+            env.save()
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in "abcd"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # No save was lost, nor overwritten by an older one.
+    saved = yaml.load(env_path.read_text())
+    assert all(f"{n}{i}" in saved for n in "abcd" for i in range(10))
+    assert not env.dirty
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / "env.db"
+    path.touch()
+    return str(path)
+
+
+def test_open_env(env_path, db_path):
+    assert isinstance(open_env(str(env_path)), Environment)
+    assert isinstance(open_env(db_path), SqliteEnvironment)
+    assert isinstance(open_env(None), Environment)
+
+
+def test_sqlite_env(db_path):
+    env = SqliteEnvironment(db_path)
+    assert list(env) == ["__rando__"]
+    assert not env.dirty
+
+    env["token"] = "abc"
+    env["nested"] = {"a": [1, 2]}
+    assert env.dirty
+    env.save()
+    assert not env.dirty
+
+    other = SqliteEnvironment(db_path)
+    assert other["token"] == "abc"
+    assert other["nested"] == {"a": [1, 2]}
+    assert list(other) == ["token", "nested", "__rando__"]
+    assert other["__rando__"] != env["__rando__"]
+
+    del other["token"]
+    assert "token" not in other
+    with pytest.raises(KeyError):
+        del other["token"]
+    other.save()
+    env.load()
+    assert "token" not in env
+    assert [(key, value) for key, value, *_ in env.history()] == [
+        ("token", "abc"),
+        ("nested", {"a": [1, 2]}),
+        ("token", None),
+    ]
+
+
+def test_sqlite_env_in_place_change(db_path):
+    env = SqliteEnvironment(db_path)
+    env["nested"] = {"a": 1}
+    env.save()
+
+    env = SqliteEnvironment(db_path)
+    env["nested"]["a"] = 2
+    assert env.dirty
+    env.save()
+    assert SqliteEnvironment(db_path)["nested"] == {"a": 2}
+
+
+def test_sqlite_env_shared(db_path):
+    """Processes sharing a database only overwrite the vars they changed."""
+    first = SqliteEnvironment(db_path)
+    second = SqliteEnvironment(db_path)
+    first["a"] = 1
+    second["b"] = 2
+    first.save()
+    second.save()
+
+    env = SqliteEnvironment(db_path)
+    assert (env["a"], env["b"]) == (1, 2)
+
+
+def test_sqlite_env_lazy(db_path, mocker):
+    env = SqliteEnvironment(db_path)
+    env.update({f"var{i}": i for i in range(100)})
+    env.save()
+
+    env = SqliteEnvironment(db_path)
+    spy = mocker.spy(yaml, "load")
+    assert env["var42"] == 42
+    assert env["var42"] == 42
+    assert spy.call_count == 1
+
+
+def test_sqlite_env_invalid(tmp_path):
+    path = tmp_path / "env.db"
+    path.write_text("not a database" * 100)
+    with pytest.raises(EnvError):
+        SqliteEnvironment(str(path))
+
+
+def test_env_overlay(env_path):
+    env = Environment(str(env_path))
+    overlay = EnvOverlay(
+        env, {"token": "xyz", "extra": 1, "gone": 2}, ["server", "gone"]
+    )
+    assert overlay["token"] == "xyz"
+    assert dict(overlay) == {
+        "token": "xyz",
+        "extra": 1,
+        "__rando__": env["__rando__"],
+    }
+    assert "server" not in overlay
+
+    overlay["server"] = "http://other.org"
+    del overlay["token"]
+    overlay.remove("__rando__")
+    assert dict(overlay) == {"extra": 1, "server": "http://other.org"}
+    assert overlay.shadowed == {
+        "extra",
+        "server",
+        "token",
+        "gone",
+        "__rando__",
+    }
+    with pytest.raises(KeyError):
+        del overlay["token"]
+    # Other Environment methods are passed on.
+    assert overlay.save == env.save
+
+    assert env["token"] == "abc"
+    assert not env.dirty
+
+
+@pytest.mark.parametrize("env_type", ["yaml", "sqlite"])
+def test_env_versions(env_type, env_path, db_path):
+    if env_type == "yaml":
+        env = Environment(str(env_path))
+    else:
+        env = SqliteEnvironment(db_path)
+        env.update(server="http://foobar.org", token="abc")
+    keys = frozenset(("server", "token"))
+    token = env.versions(keys)
+    assert env.versions(keys) == token
+    assert env.versions(frozenset(("server",))) != token
+
+    env["other"] = 1
+    assert env.versions(keys) == token
+    env["token"] = "abc"
+    assert env.versions(keys) != token
+    token = env.versions(keys)
+    env.remove("token")
+    assert env.versions(keys) != token
+    token = env.versions(keys)
+    env.load()
+    assert env.versions(keys) != token
+
+    env["token"] = ["mutable"]
+    assert env.versions(keys) is None
+
+
+def test_env_overlay_versions(env_path):
+    env = Environment(str(env_path))
+    keys = frozenset(("server", "token"))
+    overlay = EnvOverlay(env, {"token": "xyz"}, ["server"])
+    token = overlay.versions(keys)
+    same = EnvOverlay(env, {"token": "xyz"}, ["server"])
+    assert same.versions(keys) == token
+    other = EnvOverlay(env, {"token": "uvw"}, ["server"])
+    assert other.versions(keys) != token
+    assert EnvOverlay(env, {"token": "xyz"}).versions(keys) != token
+
+    # Vars that the overlay shadows can change freely.
+    env["token"] = "abc"
+    env["server"] = "http://other.org"
+    assert overlay.versions(keys) == token
+    overlay = EnvOverlay(env, {"token": "xyz"})
+    token = overlay.versions(keys)
+    env["server"] = "http://foobar.org"
+    assert overlay.versions(keys) != token
+    assert EnvOverlay(env, {"token": [1]}).versions(keys) is None
+    assert EnvOverlay({}, {"token": "xyz"}).versions(keys) is None